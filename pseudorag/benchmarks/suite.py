@@ -0,0 +1,279 @@
+"""
+Бенчмарки движка расширения PseudoRAG
+Скорость expand_query на глубинах 1-4, стоимость оценки релевантности,
+память на вопрос, скорость и размер экспорта. Результаты сохраняются в
+JSON как базовая линия; сравнение с ней показывает регрессии в числах.
+
+Запуск:
+    python -m pseudorag.benchmarks.suite
+    python -m pseudorag.benchmarks.suite --save pseudorag/benchmarks/baselines/baseline.json
+    python -m pseudorag.benchmarks.suite --compare pseudorag/benchmarks/baselines/baseline.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from pseudorag.core.archetypes import ARCHETYPES
+from pseudorag.core.centroids import CentroidScorer
+from pseudorag.core.compact import CompactQuestions
+from pseudorag.core.export import write_ndjson
+from pseudorag.core.query_expander import QueryExpander
+from pseudorag.core.scoring import ArchetypeScorer
+
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+DEFAULT_TOLERANCE = 0.25
+
+FIXED_TOPICS = ["Города Европы", "Транспортные системы", "Животные Африки"]
+
+# Глубина -> (лимиты уровней, число тем); глубина 4 без лимита - ~250 тысяч вопросов на тему
+DEPTH_PLAN = {
+    1: (None, 50),
+    2: (None, 20),
+    3: (None, 3),
+    4: ([None, None, None, 50000], 1),
+}
+
+
+def generated_topics(count: int, seed: int = 42) -> List[str]:
+    """Детерминированные темы из ключевых слов архетипов"""
+    rng = random.Random(seed)
+    words = sorted({kw for arch in ARCHETYPES for kw in arch.keywords_ru})
+    return [
+        f"{rng.choice(words).capitalize()} и {rng.choice(words)}"
+        for _ in range(count)
+    ]
+
+
+def topic_corpus(count: int) -> List[str]:
+    """Фиксированные темы, дополненные сгенерированными до count"""
+    topics = FIXED_TOPICS[:count]
+    return topics + generated_topics(max(0, count - len(topics)))
+
+
+def best_of(func: Callable[[], object], repeat: int) -> Tuple[float, object]:
+    """Лучшее время из repeat запусков и результат последнего"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+# --- Бенчмарки ---
+
+def bench_expansion(expander: QueryExpander, repeat: int) -> Dict:
+    results = {}
+    for depth, (limits, topic_count) in DEPTH_PLAN.items():
+        topics = topic_corpus(topic_count)
+
+        def run():
+            return sum(
+                len(expander.expand_query(t, depth=depth, level_limits=limits, verbose=False).questions)
+                for t in topics
+            )
+
+        seconds, questions = best_of(run, 1 if depth >= 3 else repeat)
+        results[f"depth_{depth}"] = {
+            'topics': len(topics),
+            'questions': questions,
+            'time_s': seconds,
+            'questions_per_s': questions / seconds,
+            'topics_per_s': len(topics) / seconds
+        }
+    return results
+
+
+def bench_scoring(expander: QueryExpander, repeat: int) -> Dict:
+    topics = topic_corpus(500)
+    scorer = ArchetypeScorer()
+    centroid = CentroidScorer(cache_dir=None)
+
+    def loop():
+        for t in topics:
+            data = expander.parse_topic(t)
+            for arch in ARCHETYPES:
+                expander.calculate_archetype_relevance(arch, data)
+
+    loop_s, _ = best_of(loop, repeat)
+    vector_s, _ = best_of(lambda: scorer.score_queries(topics), repeat)
+    parse_s, _ = best_of(lambda: [expander.parse_topic(t) for t in topics], repeat)
+    centroid_s, _ = best_of(lambda: centroid.score_queries(topics), repeat)
+
+    return {
+        'topics': len(topics),
+        'parse_topic_us': parse_s / len(topics) * 1e6,
+        'loop_per_topic_us': loop_s / len(topics) * 1e6,
+        'vector_per_topic_us': vector_s / len(topics) * 1e6,
+        'vector_speedup': loop_s / vector_s,
+        'centroid_per_topic_us': centroid_s / len(topics) * 1e6
+    }
+
+
+def bench_memory(expander: QueryExpander) -> Dict:
+    topic = FIXED_TOPICS[0]
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tree = expander.expand_query(topic, depth=2, verbose=False)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    tree_bytes = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    compact = CompactQuestions(topic, tree.questions)
+    return {
+        'questions': len(tree.questions),
+        'question_bytes': tree_bytes / len(tree.questions),
+        'compact_question_bytes': compact.nbytes() / len(compact)
+    }
+
+
+def bench_export(expander: QueryExpander, repeat: int) -> Dict:
+    tree = expander.expand_query(FIXED_TOPICS[0], depth=2, verbose=False)
+    results = {'questions': len(tree.questions)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exports = {
+            'json': lambda path: tree.to_json(path),
+            'markdown': lambda path: tree.to_markdown(path),
+            'ndjson': lambda path: write_ndjson(path, tree.topic, tree.questions),
+            'ndjson_gz': lambda path: write_ndjson(path, tree.topic, tree.questions, compression="gzip"),
+        }
+        for name, export in exports.items():
+            path = str(Path(tmp) / f"tree.{name}")
+            seconds, _ = best_of(lambda: export(path), repeat)
+            results[name] = {
+                'time_s': seconds,
+                'size_bytes': Path(path).stat().st_size,
+                'questions_per_s': len(tree.questions) / seconds
+            }
+    return results
+
+
+def run_suite(repeat: int = 7) -> Dict:
+    """Все бенчмарки; результат - словарь для JSON"""
+    expander = QueryExpander()
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeat': repeat
+        },
+        'results': {
+            'expansion': bench_expansion(expander, repeat),
+            'scoring': bench_scoring(expander, repeat),
+            'memory': bench_memory(expander),
+            'export': bench_export(expander, repeat)
+        }
+    }
+
+
+# --- Сравнение с базовой линией ---
+
+def _flatten(data: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Tuple[str, float, float, str]]:
+    """
+    Сравнить результаты с базовой линией
+
+    Метрики *_per_s и *_speedup - чем больше, тем лучше; *_s, *_us,
+    *_bytes - чем меньше, тем лучше; остальные (число вопросов, тем)
+    должны совпадать точно - их изменение значит, что изменился вывод.
+
+    Returns:
+        (метрика, было, стало, статус) для каждой общей метрики;
+        статус - "ok", "better", "worse" или "changed"
+    """
+    old = _flatten(baseline['results'])
+    new = _flatten(current['results'])
+    rows = []
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        leaf = name.rsplit('.', 1)[-1]
+        if leaf.endswith(('_per_s', '_speedup')):
+            ratio = after / before if before else 1.0
+        elif leaf.endswith(('_s', '_us', '_bytes')):
+            ratio = before / after if after else 1.0
+        else:
+            rows.append((name, before, after, "ok" if before == after else "changed"))
+            continue
+
+        if ratio < 1 - tolerance:
+            status = "worse"
+        elif ratio > 1 + tolerance:
+            status = "better"
+        else:
+            status = "ok"
+        rows.append((name, before, after, status))
+    return rows
+
+
+def print_results(results: Dict):
+    for name, value in _flatten(results['results']).items():
+        print(f"  {name:45s} {value:14.3f}" if isinstance(value, float) else f"  {name:45s} {value:14d}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки PseudoRAG")
+    parser.add_argument('--repeat', type=int, default=7, help='Повторов (берётся лучшее время)')
+    parser.add_argument('--save', help='Сохранить результаты как базовую линию (JSON)')
+    parser.add_argument('--compare', help='Сравнить с базовой линией (JSON)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Допустимое отклонение скорости (по умолчанию: {DEFAULT_TOLERANCE})')
+    args = parser.parse_args(argv)
+
+    print("⏱️  Бенчмарки PseudoRAG...")
+    results = run_suite(repeat=args.repeat)
+    print_results(results)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Базовая линия сохранена: {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.tolerance)
+        print(f"\n📊 Сравнение с {args.compare} ({baseline['meta']['date']}):")
+        for name, before, after, status in rows:
+            if status != "ok":
+                mark = {"better": "🟢", "worse": "🔴", "changed": "🟡"}[status]
+                print(f"  {mark} {name:45s} {before:12.3f} → {after:12.3f}")
+        problems = [r for r in rows if r[3] in ("worse", "changed")]
+        if problems:
+            print(f"\n❌ Регрессий: {len(problems)}")
+            return 1
+        print("\n✅ Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
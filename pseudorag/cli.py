@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Потоковый CLI PseudoRAG
+Темы на входе (строки или JSONL), вопросы на выходе (NDJSON, один вопрос
+на строку). Без input() и без файлов в examples/ - для конвейеров:
+
+    cat topics.txt | python -m pseudorag.cli --depth 2 -w 4 > questions.ndjson
+    python -m pseudorag.cli topics.jsonl -o questions.ndjson.gz
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.export import open_text_reader, open_text_writer
+from pseudorag.core.query_expander import QueryExpander, bounded_map, question_to_dict
+from pseudorag.core.centroids import SCORERS
+
+
+# Поля JSONL-записи, которые переопределяют флаги для одной темы, и их типы
+RECORD_OPTIONS = {'depth': int, 'min_relevance': float, 'max_interactions': int}
+
+
+def _record_option(key: str, value):
+    """
+    Значение поля записи нужного типа ("2" -> 2 для depth)
+
+    Raises:
+        ValueError: Значение не приводится к типу или вне допустимых
+    """
+    if key == 'max_interactions' and value is None:
+        return None
+    kind = RECORD_OPTIONS[key]
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{key}: ожидается число, получено {value!r}")
+    try:
+        number = float(value)
+        result = kind(number)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{key}: ожидается число, получено {value!r}") from None
+    if result != number or (key == 'depth' and result < 1) or (kind is int and result < 0):
+        raise ValueError(f"{key}: недопустимое значение {value!r}")
+    return result
+
+
+def parse_record(line: str) -> Optional[Tuple[str, Dict]]:
+    """
+    Тема и её параметры из строки входа
+
+    Строка, начинающаяся с "{", - JSON с полем "topic" (или "query") и
+    необязательными depth, min_relevance, max_interactions; иначе вся
+    строка - тема.
+
+    Returns:
+        (тема, параметры) или None для пустой строки
+
+    Raises:
+        ValueError: Некорректный JSON, запись без темы или параметр
+                    неверного типа
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if not line.startswith("{"):
+        return line, {}
+
+    record = json.loads(line)
+    topic = record.get('topic') or record.get('query')
+    if not topic or not isinstance(topic, str):
+        raise ValueError("в записи нет поля topic")
+    return topic, {key: _record_option(key, record[key]) for key in RECORD_OPTIONS if key in record}
+
+
+def read_topics(lines: Iterable[str], errors: TextIO = sys.stderr) -> Iterator[Tuple[str, Dict]]:
+    """Записи входа; ошибочные строки пропускаются с сообщением в errors"""
+    for number, line in enumerate(lines, 1):
+        try:
+            record = parse_record(line)
+        except ValueError as e:
+            errors.write(f"⚠️  Строка {number}: {e}\n")
+            continue
+        if record is not None:
+            yield record
+
+
+# Состояние процесса пула
+_expander: Optional[QueryExpander] = None
+_options: Dict = {}
+
+
+def _init(options: Dict, scorer: str = 'vector'):
+    global _expander, _options
+    _expander = QueryExpander(scorer=scorer)
+    _options = options
+
+
+def expand_to_ndjson(records: List[Tuple[str, Dict]]) -> Tuple[str, int]:
+    """
+    Расширить пачку тем в готовый текст NDJSON
+
+    Сериализация идёт в процессе пула, поэтому главный процесс только
+    пишет строки.
+
+    Returns:
+        (текст, число вопросов)
+    """
+    lines = []
+    for topic, overrides in records:
+        options = {**_options, **overrides}
+        for question in _expander.iter_questions(topic, **options):
+            data = {'topic': topic, **question_to_dict(question)}
+            lines.append(json.dumps(data, ensure_ascii=False))
+    return ("\n".join(lines) + "\n" if lines else ""), len(lines)
+
+
+def run(records: Iterable[Tuple[str, Dict]], output: TextIO, options: Dict,
+        workers: Optional[int] = None, chunksize: int = 64, scorer: str = 'vector') -> Dict:
+    """
+    Потоковое расширение тем в NDJSON
+
+    Вход читается пачками по chunksize; в работе не больше 2 x workers
+    пачек, так что медленный потребитель выхода притормаживает чтение
+    (обратное давление), а память не зависит от длины входа. scorer -
+    имя оценщика релевантности из centroids.SCORERS.
+
+    Returns:
+        Статистика {'topics', 'questions', 'time_s'}
+    """
+    stats = {'topics': 0, 'questions': 0}
+
+    def counted(items):
+        for item in items:
+            stats['topics'] += 1
+            yield item
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init(options, scorer)
+        batches = (expand_to_ndjson([record]) for record in counted(records))
+        for text, count in batches:
+            output.write(text)
+            stats['questions'] += count
+    else:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init,
+                                 initargs=(options, scorer)) as executor:
+            for text, count in bounded_map(executor, expand_to_ndjson, counted(records),
+                                           chunksize, 2 * workers):
+                output.write(text)
+                stats['questions'] += count
+
+    stats['time_s'] = time.perf_counter() - start
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Расширение тем в вопросы: строки/JSONL на входе, NDJSON на выходе"
+    )
+    parser.add_argument(
+        'input',
+        nargs='?',
+        default='-',
+        help='Файл тем (строки или JSONL, можно .gz/.zst); по умолчанию stdin'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        default='-',
+        help='Файл NDJSON (.gz/.zst - со сжатием); по умолчанию stdout'
+    )
+    parser.add_argument(
+        '--depth',
+        type=int,
+        default=1,
+        help='Глубина расширения (по умолчанию: 1)'
+    )
+    parser.add_argument(
+        '--min-relevance',
+        type=float,
+        default=0.3,
+        help='Минимальная релевантность архетипа (по умолчанию: 0.3)'
+    )
+    parser.add_argument(
+        '--max-interactions',
+        type=int,
+        help='Вопросов о взаимодействиях на тему (по умолчанию: 20 при depth >= 2)'
+    )
+    parser.add_argument(
+        '--scorer',
+        choices=SCORERS,
+        default='vector',
+        help='Оценка релевантности: loop/vector - ключевые слова, '
+             'centroid - центроиды эмбеддингов из PSEUDORAG_CENTROID_EMBEDDINGS '
+             '(по умолчанию: vector)'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Процессов (по умолчанию: число CPU, 1 - без пула)'
+    )
+    parser.add_argument(
+        '--chunksize',
+        type=int,
+        default=64,
+        help='Тем на одну передачу в процесс (по умолчанию: 64)'
+    )
+    parser.add_argument(
+        '-q', '--quiet',
+        action='store_true',
+        help='Не печатать статистику в stderr'
+    )
+    args = parser.parse_args(argv)
+
+    options = {
+        'depth': args.depth,
+        'min_relevance': args.min_relevance,
+        'max_interactions': args.max_interactions
+    }
+
+    source = sys.stdin if args.input == '-' else open_text_reader(args.input)
+    output = sys.stdout if args.output == '-' else open_text_writer(args.output)
+    try:
+        stats = run(read_topics(source), output, options, args.workers,
+                    args.chunksize, args.scorer)
+        output.flush()
+    except BrokenPipeError:
+        # Потребитель закрыл канал (например, | head) - это не ошибка
+        sys.stderr.close()
+        return 0
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    if not args.quiet:
+        rate = stats['questions'] / stats['time_s'] if stats['time_s'] > 0 else 0.0
+        sys.stderr.write(
+            f"✅ Тем: {stats['topics']}, вопросов: {stats['questions']}, "
+            f"{stats['time_s']:.2f} с ({rate:.0f} вопр/с)\n"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,15 @@ Core modules for PseudoRAG system
 
 from .archetypes import ARCHETYPES, Archetype, get_archetype
 from .query_expander import QueryExpander, QuestionTree, Question
+from .compact import CompactQuestions, QuestionView
+from .export import write_ndjson, read_ndjson, write_markdown
+from .scoring import ArchetypeScorer
+from .centroids import CentroidScorer, create_centroid_scorer, create_scorer
+from .matcher import KeywordMatcher, KEYWORD_MATCHER
+from .cache import ExpansionCache
+from .interactions import INTERACTION_TYPE, INTERACTION_STRENGTH, top_interactions
+from .answer_store import AnswerStore
+from .dedup import QuestionPruner
 
 __all__ = [
     'ARCHETYPES',
@@ -12,4 +21,21 @@ __all__ = [
     'QueryExpander',
     'QuestionTree',
     'Question',
+    'CompactQuestions',
+    'QuestionView',
+    'write_ndjson',
+    'read_ndjson',
+    'write_markdown',
+    'ArchetypeScorer',
+    'CentroidScorer',
+    'create_centroid_scorer',
+    'create_scorer',
+    'KeywordMatcher',
+    'KEYWORD_MATCHER',
+    'ExpansionCache',
+    'INTERACTION_TYPE',
+    'INTERACTION_STRENGTH',
+    'top_interactions',
+    'AnswerStore',
+    'QuestionPruner',
 ]
@@ -0,0 +1,403 @@
+"""
+Хранилище ответов Уровня 3
+Темы, вопросы, ответы, фрагменты-доказательства и хэши источников во
+встроенной SQLite; при изменении источников устаревшими помечаются только
+ответы, опиравшиеся на изменённые фрагменты
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .query_expander import Question, question_to_dict
+
+
+DEFAULT_STORE_PATH = Path(__file__).parent.parent / "data" / "answers.db"
+
+FRESH = "fresh"
+STALE = "stale"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS topics (
+    id            INTEGER PRIMARY KEY,
+    name          TEXT NOT NULL UNIQUE,
+    root_question TEXT NOT NULL,
+    metadata      TEXT NOT NULL DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS questions (
+    topic_id       INTEGER NOT NULL REFERENCES topics(id),
+    question_id    TEXT NOT NULL,
+    archetype_code TEXT NOT NULL,
+    depth          INTEGER NOT NULL,
+    priority       INTEGER NOT NULL,
+    data           TEXT NOT NULL,
+    PRIMARY KEY (topic_id, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS questions_archetype ON questions(topic_id, archetype_code);
+CREATE INDEX IF NOT EXISTS questions_depth ON questions(topic_id, depth);
+
+CREATE TABLE IF NOT EXISTS answers (
+    topic_id    INTEGER NOT NULL,
+    question_id TEXT NOT NULL,
+    answer      TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'fresh',
+    answered_at REAL NOT NULL,
+    PRIMARY KEY (topic_id, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS answers_status ON answers(topic_id, status);
+
+CREATE TABLE IF NOT EXISTS evidence (
+    topic_id    INTEGER NOT NULL,
+    question_id TEXT NOT NULL,
+    chunk_id    TEXT NOT NULL,
+    rank        INTEGER NOT NULL,
+    PRIMARY KEY (topic_id, question_id, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS evidence_chunk ON evidence(chunk_id);
+
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    source   TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source);
+
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    hash   TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- Текущие фрагменты изменённого источника (update_sources): без списка
+-- параметров NOT IN (...), который упирается в лимит переменных SQLite
+CREATE TEMP TABLE IF NOT EXISTS kept_chunks (
+    chunk_id TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+def file_hash(path) -> str:
+    """SHA-256 содержимого файла-источника"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AnswerStore:
+    """
+    Индексированное хранилище ответов
+
+    Доказательство ответа - список идентификаторов фрагментов (chunk_id)
+    с их источниками. Хэши источников запоминаются при записи ответов;
+    update_sources сравнивает их с текущими и помечает устаревшими ответы
+    на изменённых фрагментах.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        """
+        Args:
+            path: Файл базы (":memory:" - в памяти)
+        """
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def transaction(self):
+        """Группа записей одной транзакцией (для массовой загрузки)"""
+        with self.conn:
+            yield self
+
+    # --- Запись ---
+
+    def _topic_id(self, topic: str) -> Optional[int]:
+        row = self.conn.execute("SELECT id FROM topics WHERE name = ?", (topic,)).fetchone()
+        return row[0] if row else None
+
+    def _require_topic(self, topic: str) -> int:
+        topic_id = self._topic_id(topic)
+        if topic_id is None:
+            raise KeyError(f"Тема не найдена: {topic}")
+        return topic_id
+
+    def add_topic(self, topic: str, questions: Iterable,
+                  root_question: Optional[str] = None,
+                  metadata: Optional[Dict] = None) -> int:
+        """
+        Добавить тему с вопросами (Question или QuestionView)
+
+        Повторное добавление обновляет вопросы, ответы сохраняются.
+
+        Returns:
+            Количество записанных вопросов
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO topics(name, root_question, metadata) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET root_question = excluded.root_question, "
+                "metadata = excluded.metadata",
+                (topic, root_question or topic, json.dumps(metadata or {}, ensure_ascii=False))
+            )
+            topic_id = self._topic_id(topic)
+            rows = (
+                (topic_id, q.id, q.archetype_code, q.depth, q.priority,
+                 json.dumps(question_to_dict(q), ensure_ascii=False))
+                for q in questions
+            )
+            cursor = self.conn.executemany(
+                "INSERT OR REPLACE INTO questions VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+        return cursor.rowcount
+
+    def put_answer(self, topic: str, question_id: str, answer: str,
+                   evidence: Sequence[Tuple[str, str]] = (),
+                   source_hashes: Optional[Dict[str, str]] = None):
+        """
+        Записать (или заменить) ответ на вопрос
+
+        Args:
+            topic: Тема
+            question_id: ID вопроса
+            answer: Текст ответа
+            evidence: Фрагменты по рангу: (chunk_id, источник)
+            source_hashes: Хэши источников на момент ответа
+        """
+        topic_id = self._require_topic(topic)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (topic_id, question_id, answer, FRESH, time.time())
+            )
+            self.conn.execute(
+                "DELETE FROM evidence WHERE topic_id = ? AND question_id = ?",
+                (topic_id, question_id)
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO evidence VALUES (?, ?, ?, ?)",
+                [(topic_id, question_id, chunk_id, rank)
+                 for rank, (chunk_id, _) in enumerate(evidence, 1)]
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO chunks VALUES (?, ?)", list(evidence)
+            )
+            if source_hashes:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO sources VALUES (?, ?)", source_hashes.items()
+                )
+
+    def update_sources(self, source_hashes: Dict[str, str],
+                       current_chunks: Optional[Dict[str, Iterable[str]]] = None) -> int:
+        """
+        Сравнить хэши источников и пометить затронутые ответы устаревшими
+
+        Для изменённого источника устаревают ответы, опиравшиеся на его
+        фрагменты. Если известны текущие фрагменты источника
+        (current_chunks), устаревают только ответы на фрагментах, которых
+        больше нет: неизменённый текст сохраняет свой chunk_id.
+
+        Args:
+            source_hashes: Источник -> текущий хэш (file_hash)
+            current_chunks: Источник -> chunk_id его текущих фрагментов
+
+        Returns:
+            Количество ответов, помеченных устаревшими
+        """
+        stored = dict(self.conn.execute("SELECT source, hash FROM sources"))
+        changed = [s for s, h in source_hashes.items() if s in stored and stored[s] != h]
+
+        marked = 0
+        with self.conn:
+            for source in changed:
+                condition = ""
+                if current_chunks is not None and source in current_chunks:
+                    self.conn.execute("DELETE FROM temp.kept_chunks")
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO temp.kept_chunks VALUES (?)",
+                        ((chunk_id,) for chunk_id in current_chunks[source])
+                    )
+                    condition = " AND c.chunk_id NOT IN (SELECT chunk_id FROM temp.kept_chunks)"
+                cursor = self.conn.execute(
+                    "UPDATE answers SET status = ? WHERE status = ? AND (topic_id, question_id) IN ("
+                    " SELECT e.topic_id, e.question_id FROM evidence e"
+                    " JOIN chunks c ON c.chunk_id = e.chunk_id"
+                    f" WHERE c.source = ?{condition})",
+                    (STALE, FRESH, source)
+                )
+                marked += cursor.rowcount
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?)", source_hashes.items()
+            )
+        return marked
+
+    def refresh_sources(self, current_chunks: Optional[Dict[str, Iterable[str]]] = None) -> int:
+        """
+        update_sources по текущему содержимому известных источников
+
+        Удалённый файл считается изменённым.
+
+        Args:
+            current_chunks: Источник -> chunk_id его фрагментов в текущем
+                            индексе (без них устаревают все ответы на
+                            изменённом файле)
+
+        Returns:
+            Количество ответов, помеченных устаревшими
+        """
+        hashes = {
+            source: file_hash(source) if Path(source).exists() else ""
+            for (source,) in self.conn.execute("SELECT source FROM sources")
+        }
+        return self.update_sources(hashes, current_chunks)
+
+    # --- Чтение ---
+
+    def questions(self, topic: str, archetype_code: Optional[str] = None,
+                  depth: Optional[int] = None) -> List[Question]:
+        """Вопросы темы с фильтром по архетипу и глубине"""
+        topic_id = self._require_topic(topic)
+        sql = "SELECT data FROM questions WHERE topic_id = ?"
+        params = [topic_id]
+        if archetype_code is not None:
+            sql += " AND archetype_code = ?"
+            params.append(archetype_code)
+        if depth is not None:
+            sql += " AND depth = ?"
+            params.append(depth)
+        return [Question(**json.loads(data)) for (data,) in self.conn.execute(sql, params)]
+
+    def answers(self, topic: str, archetype_code: Optional[str] = None,
+                depth: Optional[int] = None, status: Optional[str] = None) -> List[Dict]:
+        """
+        Ответы темы с фильтром по архетипу, глубине и статусу
+
+        Returns:
+            Словари {question_id, archetype_code, depth, answer, status,
+            answered_at, evidence: [chunk_id, ...]}
+        """
+        topic_id = self._require_topic(topic)
+        # Один запрос: доказательства - строки LEFT JOIN, по рангу
+        sql = (
+            "SELECT q.question_id, q.archetype_code, q.depth, a.answer, a.status, a.answered_at, "
+            "e.chunk_id "
+            "FROM questions q JOIN answers a "
+            "ON a.topic_id = q.topic_id AND a.question_id = q.question_id "
+            "LEFT JOIN evidence e "
+            "ON e.topic_id = a.topic_id AND e.question_id = a.question_id "
+            "WHERE q.topic_id = ?"
+        )
+        params = [topic_id]
+        if archetype_code is not None:
+            sql += " AND q.archetype_code = ?"
+            params.append(archetype_code)
+        if depth is not None:
+            sql += " AND q.depth = ?"
+            params.append(depth)
+        if status is not None:
+            sql += " AND a.status = ?"
+            params.append(status)
+        sql += " ORDER BY q.question_id, e.rank"
+
+        result = []
+        for question_id, code, q_depth, answer, a_status, answered_at, chunk_id in self.conn.execute(sql, params):
+            if not result or result[-1]['question_id'] != question_id:
+                result.append({
+                    'question_id': question_id,
+                    'archetype_code': code,
+                    'depth': q_depth,
+                    'answer': answer,
+                    'status': a_status,
+                    'answered_at': answered_at,
+                    'evidence': []
+                })
+            if chunk_id is not None:
+                result[-1]['evidence'].append(chunk_id)
+        return result
+
+    def pending_questions(self, topic: str) -> List[Question]:
+        """Вопросы без ответа или с устаревшим ответом - их нужно (пере)ответить"""
+        topic_id = self._require_topic(topic)
+        rows = self.conn.execute(
+            "SELECT q.data FROM questions q LEFT JOIN answers a "
+            "ON a.topic_id = q.topic_id AND a.question_id = q.question_id "
+            "WHERE q.topic_id = ? AND (a.status IS NULL OR a.status = ?)",
+            (topic_id, STALE)
+        )
+        return [Question(**json.loads(data)) for (data,) in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Число строк в таблицах и устаревших ответов"""
+        counts = {
+            table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("topics", "questions", "answers", "evidence", "chunks", "sources")
+        }
+        counts['stale'] = self.conn.execute(
+            "SELECT COUNT(*) FROM answers WHERE status = ?", (STALE,)
+        ).fetchone()[0]
+        return counts
+
+
+if __name__ == "__main__":
+    # Демонстрация: 200 тем x ~1100 вопросов, выборка по архетипу и пометка устаревших
+    import tempfile
+    from .query_expander import QueryExpander
+
+    expander = QueryExpander()
+    tree = expander.expand_query("Города Европы", depth=2, verbose=False)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnswerStore(Path(tmp) / "answers.db")
+
+        start = time.perf_counter()
+        with store.transaction():
+            for t in range(200):
+                topic = f"{tree.topic} #{t}"
+                store.add_topic(topic, tree.questions)
+                topic_id = store._topic_id(topic)
+                store.conn.executemany(
+                    "INSERT INTO answers VALUES (?, ?, ?, ?, ?)",
+                    ((topic_id, q.id, f"Ответ на {q.id}", FRESH, 0.0) for q in tree.questions)
+                )
+                store.conn.executemany(
+                    "INSERT INTO evidence VALUES (?, ?, ?, ?)",
+                    ((topic_id, q.id, f"doc{i % 40}.md#{i % 997}", 1)
+                     for i, q in enumerate(tree.questions))
+                )
+            store.conn.executemany(
+                "INSERT OR IGNORE INTO chunks VALUES (?, ?)",
+                ((f"doc{i % 40}.md#{i % 997}", f"doc{i % 40}.md") for i in range(40 * 997))
+            )
+            store.conn.executemany(
+                "INSERT INTO sources VALUES (?, ?)", ((f"doc{i}.md", "v1") for i in range(40))
+            )
+        print(f"Загрузка: {time.perf_counter() - start:.1f} с, {store.stats()}")
+
+        start = time.perf_counter()
+        answers = store.answers(f"{tree.topic} #100", archetype_code="ASCF")
+        print(f"ASCF для одной темы: {len(answers)} ответов за {(time.perf_counter() - start) * 1000:.1f} мс")
+
+        # В doc7.md изменились 10 фрагментов из 997, остальные сохранили chunk_id
+        kept = [f"doc7.md#{i % 997}" for i in range(7, 40 * 997, 40)][10:]
+        start = time.perf_counter()
+        marked = store.update_sources({"doc7.md": "v2"}, current_chunks={"doc7.md": kept})
+        print(f"Изменён doc7.md: устарело {marked} ответов за {(time.perf_counter() - start) * 1000:.0f} мс")
+        print(f"К переответу в одной теме: {len(store.pending_questions(f'{tree.topic} #100'))}")
+
+        store.close()
@@ -252,6 +252,24 @@ def get_archetype(code: str) -> Archetype:
     return ARCHETYPE_INDEX.get(code)
 
 
+def archetype_bits(archetype: Archetype) -> int:
+    """
+    4-битный код архетипа по осям: M/A, S/D, E/C, O/F
+
+    Первая буква каждой оси - 0, вторая - 1 (MSEO = 0b0000, ADCF = 0b1111)
+    """
+    return (
+        (archetype.materiality == "A") << 3 |
+        (archetype.dynamics == "D") << 2 |
+        (archetype.scale == "C") << 1 |
+        (archetype.structure == "F")
+    )
+
+
+# Архетипы по 4-битному коду
+ARCHETYPES_BY_BITS: List[Archetype] = sorted(ARCHETYPES, key=archetype_bits)
+
+
 def get_all_codes() -> List[str]:
     """Получить все коды архетипов"""
     return list(ARCHETYPE_INDEX.keys())
@@ -0,0 +1,171 @@
+"""
+Кэш расширений запросов
+LRU в памяти плюс сжатые деревья на диске; ключ - нормализованный запрос,
+параметры расширения и версия шаблонов
+"""
+
+import gzip
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .archetypes import ARCHETYPES
+from .domains import DOMAIN_BONUS, DOMAIN_STEMS
+from .interactions import (
+    INTERACTION_QUESTIONS, INTERACTION_STRENGTH, INTERACTION_TYPE, UNDIRECTED_TYPES
+)
+from .query_expander import Question, QuestionTree, QueryExpander, question_to_dict
+
+
+CACHE_FORMAT = 2
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache" / "expansions"
+
+
+def normalize_query(query: str) -> str:
+    """Запрос без различий в регистре и пробелах"""
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+def template_version() -> str:
+    """
+    Отпечаток всего, от чего зависит дерево вопросов
+
+    Меняется при правке QUESTION_TEMPLATES, ASPECTS, ARCHETYPES, доменов
+    или матрицы взаимодействий, поэтому старые записи кэша перестают
+    находиться.
+    """
+    payload = {
+        'format': CACHE_FORMAT,
+        'templates': QueryExpander.QUESTION_TEMPLATES,
+        'aspects': QueryExpander.ASPECTS,
+        'archetypes': [asdict(arch) for arch in ARCHETYPES],
+        'domain_stems': DOMAIN_STEMS,
+        'domain_bonus': DOMAIN_BONUS,
+        'interactions': [
+            INTERACTION_TYPE.tolist(), INTERACTION_STRENGTH.tolist(), INTERACTION_QUESTIONS,
+            sorted(UNDIRECTED_TYPES)
+        ]
+    }
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class ExpansionCache:
+    """Кэширующая обёртка над QueryExpander.expand_query"""
+
+    def __init__(self, expander: Optional[QueryExpander] = None,
+                 cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+                 max_entries: int = 128):
+        """
+        Args:
+            expander: Расширитель (по умолчанию - новый QueryExpander)
+            cache_dir: Каталог дискового кэша (None - только память)
+            max_entries: Размер LRU в памяти
+        """
+        self.expander = expander or QueryExpander()
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_entries = max_entries
+        self.version = template_version()
+        self._memory: "OrderedDict[str, QuestionTree]" = OrderedDict()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def key(self, query: str, depth: int = 1, min_relevance: float = 0.3,
+            level_limits: Optional[Sequence[Optional[int]]] = None,
+            max_interactions: Optional[int] = None) -> str:
+        data = json.dumps([
+            normalize_query(query), depth, min_relevance,
+            list(level_limits) if level_limits else None,
+            self.expander._interaction_cap(depth, max_interactions), self.version,
+            # Оценщики с другими оценками (CentroidScorer) дают другие деревья
+            getattr(self.expander.scorer, 'fingerprint', None)
+        ], ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json.gz"
+
+    def _remember(self, key: str, tree: QuestionTree):
+        self._memory[key] = tree
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[QuestionTree]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Повреждённая запись - просто пересчитать
+            return None
+        return QuestionTree(
+            topic=data['topic'],
+            root_question=data['root_question'],
+            questions=[Question(**q) for q in data['questions']],
+            metadata=data['metadata']
+        )
+
+    def _store(self, key: str, tree: QuestionTree):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({
+                'topic': tree.topic,
+                'root_question': tree.root_question,
+                'questions': [question_to_dict(q) for q in tree.questions],
+                'metadata': tree.metadata
+            }, f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+    def expand_query(self, query: str, depth: int = 1, min_relevance: float = 0.3,
+                     level_limits: Optional[Sequence[Optional[int]]] = None,
+                     verbose: bool = True,
+                     max_interactions: Optional[int] = None) -> QuestionTree:
+        """
+        expand_query с кэшем
+
+        Возвращаемое дерево общее для всех попаданий - не изменяйте его.
+        Запросы, отличающиеся только регистром и пробелами, получают
+        дерево первого из них.
+        """
+        key = self.key(query, depth, min_relevance, level_limits, max_interactions)
+
+        tree = self._memory.get(key)
+        if tree is not None:
+            self.stats['memory_hits'] += 1
+            self._memory.move_to_end(key)
+        elif self.cache_dir is not None:
+            tree = self._load(key)
+            if tree is not None:
+                self.stats['disk_hits'] += 1
+                self._remember(key, tree)
+
+        if tree is not None:
+            if verbose:
+                print(f"💾 Из кэша: '{query}' ({len(tree.questions)} вопросов)")
+            return tree
+
+        self.stats['misses'] += 1
+        tree = self.expander.expand_query(
+            query, depth=depth, min_relevance=min_relevance,
+            level_limits=level_limits, verbose=verbose,
+            max_interactions=max_interactions
+        )
+        self._remember(key, tree)
+        if self.cache_dir is not None:
+            self._store(key, tree)
+        return tree
+
+    def clear(self, disk: bool = False):
+        """Очистить кэш в памяти (и на диске)"""
+        self._memory.clear()
+        if disk and self.cache_dir is not None and self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.json.gz"):
+                path.unlink()
@@ -0,0 +1,337 @@
+"""
+Оценка релевантности архетипов по центроидам эмбеддингов
+Каждый архетип один раз кодируется по описанию, названиям, ключевым словам
+и примерам в центроид; матрица 16 x d хранится на диске. Релевантность
+запроса - одно умножение матрицы на вектор, пачки запросов - одно
+умножение матриц. По умолчанию (без внешних моделей) используются
+хэшированные символьные n-граммы: в отличие от подстрок ключевых слов они
+ловят словоформы ("городской" ~ "город"), но не смысл. Модель эмбеддингов
+rag/ выбирается через PSEUDORAG_CENTROID_EMBEDDINGS=rag.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from dataclasses import asdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .archetypes import ARCHETYPES, Archetype
+
+if TYPE_CHECKING:
+    from .scoring import ArchetypeScorer
+
+
+DEFAULT_CENTROID_DIR = Path(__file__).parent.parent / ".cache" / "centroids"
+
+HASHED_MODEL = "hashed-ngrams"
+HASHED_DIM = 4096
+NGRAM_RANGE = (3, 4)
+
+# Эмбеддинги центроидов: "hashed" - n-граммы, "rag" - модель из rag/config.py
+CENTROID_EMBEDDINGS = os.getenv("PSEUDORAG_CENTROID_EMBEDDINGS", "hashed")
+CENTROID_EMBEDDING_KINDS = ("hashed", "rag")
+
+# Калибровка косинуса (нижняя, верхняя граница): ниже нижней - 0, выше
+# верхней - 1, между ними линейно. Для n-грамм: бессмысленные запросы
+# ("qwerty zzz") дают косинус до ~0.05, запрос со словом архетипа - 0.3 и
+# выше. Для моделей предложений несвязанные тексты дают ~0.15
+HASHED_CALIBRATION = (0.05, 0.30)
+EMBEDDING_CALIBRATION = (0.15, 0.60)
+
+# Доля оценки от приоритета архетипа: только разбивает равные сходства
+PRIORITY_TIEBREAK = 0.01
+
+EmbedFunction = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def hashed_ngram_embed(texts: List[str], dim: int = HASHED_DIM) -> np.ndarray:
+    """
+    Эмбеддинги без модели: хэшированные символьные n-граммы, L2-норма
+
+    Returns:
+        (N, dim) матрица float32
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    low, high = NGRAM_RANGE
+    for row, text in enumerate(texts):
+        text = " " + re.sub(r"\s+", " ", text.lower()).strip() + " "
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                # crc32 одинаков во всех процессах, в отличие от hash()
+                vectors[row, zlib.crc32(text[i:i + n].encode('utf-8')) % dim] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def rag_embeddings() -> Tuple[EmbedFunction, str]:
+    """
+    Модель эмбеддингов rag/ (EMBEDDING_BACKEND, EMBEDDING_MODEL из rag/config.py)
+
+    Returns:
+        (embed, model_name) для CentroidScorer
+    """
+    try:
+        from rag.config import EMBEDDING_BACKEND, EMBEDDING_MODEL
+        from rag.scripts.embeddings import create_embeddings
+    except ImportError:
+        raise ImportError(
+            "Для центроидов на модели rag/ установите зависимости: pip install -r rag/requirements.txt"
+        ) from None
+    return create_embeddings().embed_documents, f"{EMBEDDING_BACKEND}-{EMBEDDING_MODEL}"
+
+
+def archetype_texts(archetype: Archetype) -> List[str]:
+    """Тексты, из которых строится центроид архетипа"""
+    return (
+        [f"{archetype.name_ru} {archetype.name_en}", archetype.description]
+        + archetype.keywords_ru + archetype.keywords_en + archetype.examples
+    )
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=-1, keepdims=True), 1e-12)
+
+
+class CentroidScorer:
+    """
+    Релевантность архетипов по косинусу с центроидами
+
+    Косинус переводится в [0, 1] фиксированной калибровкой модели (low, high):
+    (косинус - low) / (high - low) с обрезкой. Шкала абсолютная, поэтому
+    порог min_relevance отсекает несвязанные архетипы, а запрос ни о чём не
+    выбирает ни одного; в пределах (low, high) порядок архетипов - порядок
+    косинусов. Приоритет архетипа добавляет не больше PRIORITY_TIEBREAK и
+    только разбивает равенства.
+    Интерфейс - как у ArchetypeScorer, поэтому он подставляется в
+    QueryExpander(scorer=...).
+    """
+
+    def __init__(self, embed: Optional[EmbedFunction] = None,
+                 model_name: Optional[str] = None,
+                 cache_dir: Optional[Path] = DEFAULT_CENTROID_DIR,
+                 archetypes: Sequence[Archetype] = ARCHETYPES,
+                 calibration: Optional[Tuple[float, float]] = None):
+        """
+        Args:
+            embed: Функция текстов в векторы (по умолчанию - хэшированные
+                   n-граммы); для пула процессов должна сериализоваться pickle
+            model_name: Имя модели embed - входит в ключ дискового кэша;
+                        обязательно вместе с embed
+            cache_dir: Каталог матриц центроидов (None - не сохранять)
+            archetypes: Архетипы (столбцы результата)
+            calibration: Косинусы (low, high), дающие оценки 0 и 1; по
+                         умолчанию HASHED_CALIBRATION для n-грамм и
+                         EMBEDDING_CALIBRATION для моделей
+        """
+        if embed is not None and model_name is None:
+            raise ValueError("Для embed нужно model_name: по нему кэшируются центроиды")
+        if calibration is None:
+            calibration = HASHED_CALIBRATION if embed is None else EMBEDDING_CALIBRATION
+        low, high = calibration
+        if not low < high:
+            raise ValueError(f"Калибровка должна задавать low < high: {calibration}")
+        self.calibration = (float(low), float(high))
+        self.embed = embed or hashed_ngram_embed
+        self.model_name = model_name = model_name or HASHED_MODEL
+        self.archetypes = list(archetypes)
+        priority = np.array([a.default_priority for a in self.archetypes], dtype=np.float64) / 5.0
+        self.tiebreak = PRIORITY_TIEBREAK * priority
+
+        # Отпечаток входит и в ключ QuestionCache, поэтому учитывает шкалу оценок
+        payload = json.dumps(
+            [model_name, self.calibration, PRIORITY_TIEBREAK, [asdict(a) for a in self.archetypes]],
+            ensure_ascii=False, sort_keys=True
+        )
+        self.fingerprint = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+        self.cache_path = None
+        if cache_dir is not None:
+            safe_name = re.sub(r'[^\w.-]+', '_', model_name)
+            self.cache_path = Path(cache_dir) / f"{safe_name}-{self.fingerprint}.npy"
+        self.centroids = self._load_or_build()
+
+    def _load_or_build(self) -> np.ndarray:
+        """
+        (16, d) нормированные центроиды: с диска или через embed
+
+        Кэш с размерностью, отличной от размерности embed, строится заново.
+        """
+        if self.cache_path is not None and self.cache_path.exists():
+            try:
+                centroids = np.load(self.cache_path)
+            except (OSError, ValueError):
+                centroids = None  # Повреждённый файл - построить заново
+            dim = len(self.embed([self.archetypes[0].name_en])[0])
+            if centroids is not None and centroids.shape == (len(self.archetypes), dim):
+                return centroids
+
+        texts, owners = [], []
+        for column, archetype in enumerate(self.archetypes):
+            for text in archetype_texts(archetype):
+                texts.append(text)
+                owners.append(column)
+        vectors = _normalize(self.embed(texts))
+
+        centroids = np.zeros((len(self.archetypes), vectors.shape[1]), dtype=np.float32)
+        np.add.at(centroids, np.array(owners), vectors)
+        centroids = _normalize(centroids)
+
+        if self.cache_path is not None:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp.npy")
+            np.save(tmp_path, centroids)
+            tmp_path.replace(self.cache_path)
+        return centroids
+
+    def similarities(self, queries: Sequence[str]) -> np.ndarray:
+        """(N, 16) косинусы запросов с центроидами - одно умножение матриц"""
+        if not queries:
+            return np.zeros((0, len(self.archetypes)), dtype=np.float32)
+        return _normalize(self.embed(list(queries))) @ self.centroids.T
+
+    def _score(self, similarities: np.ndarray) -> np.ndarray:
+        low, high = self.calibration
+        calibrated = np.clip((similarities - low) / (high - low), 0.0, 1.0)
+        # Обрезка - только от погрешности float32 на верхней границе
+        return np.minimum((1 - PRIORITY_TIEBREAK) * calibrated + self.tiebreak, 1.0)
+
+    def score_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Релевантность для сырых запросов
+
+        Returns:
+            (N, 16) матрица оценок
+        """
+        return self._score(self.similarities(queries))
+
+    def score_topics(self, topics: Sequence[Dict]) -> np.ndarray:
+        """Релевантность для результатов QueryExpander.parse_topic"""
+        return self.score_queries([t['query'] for t in topics])
+
+    def rank(self, topic_data: Dict) -> List[Tuple[Archetype, float]]:
+        """Замена QueryExpander.rank_archetypes: архетипы по убыванию оценки"""
+        scores = self.score_topics([topic_data])[0]
+        ranked = [(arch, float(score)) for arch, score in zip(self.archetypes, scores)]
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        return ranked
+
+
+# Имена оценщиков для QueryExpander(scorer="...") и CLI
+SCORERS = ('loop', 'vector', 'centroid')
+
+
+def create_centroid_scorer(embeddings: str = CENTROID_EMBEDDINGS) -> CentroidScorer:
+    """
+    CentroidScorer на выбранных эмбеддингах
+
+    Args:
+        embeddings: "hashed" - n-граммы без модели, "rag" - модель rag/
+                    (по умолчанию - PSEUDORAG_CENTROID_EMBEDDINGS)
+    """
+    if embeddings == 'hashed':
+        return CentroidScorer()
+    if embeddings == 'rag':
+        embed, model_name = rag_embeddings()
+        return CentroidScorer(embed=embed, model_name=model_name)
+    raise ValueError(
+        f"Неизвестные эмбеддинги центроидов: {embeddings} "
+        f"(доступны: {', '.join(CENTROID_EMBEDDING_KINDS)})"
+    )
+
+
+def create_scorer(name: str) -> Union[None, "ArchetypeScorer", CentroidScorer]:
+    """
+    Оценщик по имени
+
+    "loop" - цикл calculate_archetype_relevance (None), "vector" -
+    ArchetypeScorer (те же оценки быстрее), "centroid" - CentroidScorer на
+    эмбеддингах из PSEUDORAG_CENTROID_EMBEDDINGS
+    """
+    from .scoring import ArchetypeScorer
+
+    if name == 'loop':
+        return None
+    if name == 'vector':
+        return ArchetypeScorer()
+    if name == 'centroid':
+        return create_centroid_scorer()
+    raise ValueError(f"Неизвестный оценщик: {name} (доступны: {', '.join(SCORERS)})")
+
+
+def agreement_report(queries: Sequence[str], candidate=None, baseline=None,
+                     min_relevance: float = 0.3, top: int = 3) -> Dict:
+    """
+    Сравнение оценщиков: задержка и согласие рангов
+
+    Args:
+        queries: Запросы
+        candidate: Проверяемый оценщик (по умолчанию - create_centroid_scorer())
+        baseline: Эталон (по умолчанию - ArchetypeScorer по ключевым словам)
+        min_relevance: Порог отбора архетипов, как в expand_query
+        top: Размер верхушки рейтинга для пересечения
+
+    Returns:
+        Словарь: задержки на запрос (мкс), совпадение лучшего архетипа,
+        пересечение верхних top, ранговая корреляция Спирмена и согласие
+        отбора по min_relevance (доля архетипов с одинаковым решением)
+    """
+    from .scoring import ArchetypeScorer
+
+    candidate = candidate or create_centroid_scorer()
+    baseline = baseline or ArchetypeScorer()
+    queries = list(queries)
+
+    timings = {}
+    scores = {}
+    for name, scorer in (('baseline', baseline), ('candidate', candidate)):
+        start = time.perf_counter()
+        scores[name] = scorer.score_queries(queries)
+        timings[name] = (time.perf_counter() - start) / max(len(queries), 1) * 1e6
+
+    old, new = scores['baseline'], scores['candidate']
+    top_old = np.argsort(-old, axis=1, kind='stable')[:, :top]
+    top_new = np.argsort(-new, axis=1, kind='stable')[:, :top]
+    overlap = np.mean([len(set(a) & set(b)) / top for a, b in zip(top_old, top_new)])
+
+    ranks_old = np.argsort(np.argsort(-old, axis=1, kind='stable'), axis=1)
+    ranks_new = np.argsort(np.argsort(-new, axis=1, kind='stable'), axis=1)
+    n = old.shape[1]
+    spearman = 1 - 6 * ((ranks_old - ranks_new) ** 2).sum(axis=1) / (n * (n * n - 1))
+
+    return {
+        'queries': len(queries),
+        'baseline_us': timings['baseline'],
+        'candidate_us': timings['candidate'],
+        'top1_agreement': float(np.mean(top_old[:, 0] == top_new[:, 0])),
+        f'top{top}_overlap': float(overlap),
+        'spearman': float(np.mean(spearman)),
+        'selection_agreement': float(np.mean((old >= min_relevance) == (new >= min_relevance)))
+    }
+
+
+if __name__ == "__main__":
+    topics = ["Города Европы", "Транспортные системы", "Животные Африки",
+              "Культура Японии", "Renewable energy", "Machine learning models",
+              "Городская архитектура", "Химические вещества", "История религий",
+              "Экономические кризисы", "Программное обеспечение", "Языки мира"]
+
+    start = time.perf_counter()
+    scorer = CentroidScorer(cache_dir=None)
+    print(f"Центроиды: {scorer.centroids.shape}, построены за "
+          f"{(time.perf_counter() - start) * 1000:.1f} мс")
+
+    for topic in topics[:4] + ["qwerty zzz"]:
+        ranked = scorer.rank({'query': topic})
+        print(f"  {topic}: " + ", ".join(f"{a.code} {s:.2f}" for a, s in ranked[:3]))
+
+    report = agreement_report(topics * 100, candidate=scorer)
+    print("\nСравнение с ArchetypeScorer:")
+    for key, value in report.items():
+        print(f"  {key:20s} {value:.3f}" if isinstance(value, float) else f"  {key:20s} {value}")
@@ -0,0 +1,234 @@
+"""
+Компактное хранение вопросов (колоночный формат)
+Вопросы дерева хранятся в параллельных массивах, тексты и ID
+восстанавливаются по шаблонам при обращении
+"""
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .archetypes import ARCHETYPES_BY_BITS, archetype_bits, get_archetype
+from .query_expander import Question, QueryExpander
+
+
+ANSWER_TYPES = ("list", "number", "text", "boolean")
+
+# Интернированные наборы ключевых слов: один кортеж на архетип
+_KEYWORDS: Tuple[Tuple[str, ...], ...] = tuple(
+    tuple(arch.keywords_ru) for arch in ARCHETYPES_BY_BITS
+)
+
+
+class QuestionView:
+    """Вопрос компактного дерева (только чтение, поля Question)"""
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store: "CompactQuestions", index: int):
+        self._store = store
+        self._index = index
+
+    @property
+    def id(self) -> str:
+        return self._store.question_id(self._index)
+
+    @property
+    def text(self) -> str:
+        return self._store.question_text(self._index)
+
+    @property
+    def archetype_code(self) -> str:
+        return ARCHETYPES_BY_BITS[self._store.archetypes[self._index]].code
+
+    @property
+    def priority(self) -> int:
+        return self._store.priorities[self._index]
+
+    @property
+    def keywords(self) -> Tuple[str, ...]:
+        extra = self._store.extra.get(self._index)
+        if extra and 'keywords' in extra:
+            return extra['keywords']
+        return _KEYWORDS[self._store.archetypes[self._index]]
+
+    @property
+    def expected_answer_type(self) -> str:
+        return ANSWER_TYPES[self._store.answer_types[self._index]]
+
+    @property
+    def parent_id(self) -> Optional[str]:
+        parent = self._store.parents[self._index]
+        return None if parent < 0 else self._store.question_id(parent)
+
+    @property
+    def depth(self) -> int:
+        return self._store.depths[self._index]
+
+    @property
+    def related_archetype(self) -> Optional[str]:
+        return self._store.extra.get(self._index, {}).get('related_archetype')
+
+    @property
+    def interaction_type(self) -> Optional[str]:
+        return self._store.extra.get(self._index, {}).get('interaction_type')
+
+    def to_dict(self) -> Dict:
+        """Словарь в формате asdict(Question)"""
+        return {
+            'id': self.id,
+            'text': self.text,
+            'archetype_code': self.archetype_code,
+            'priority': self.priority,
+            'keywords': list(self.keywords),
+            'expected_answer_type': self.expected_answer_type,
+            'parent_id': self.parent_id,
+            'depth': self.depth,
+            'related_archetype': self.related_archetype,
+            'interaction_type': self.interaction_type
+        }
+
+    def to_question(self) -> Question:
+        """Полноценный объект Question"""
+        return Question(**self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"QuestionView(id={self.id!r}, text={self.text!r})"
+
+
+class CompactQuestions:
+    """
+    Последовательность вопросов в параллельных массивах
+
+    На вопрос хранится ~10 байт: архетип (4-битный код), приоритет,
+    глубина, тип ответа, номер среди соседей и индекс родителя. Текст и ID
+    восстанавливаются по шаблонам QueryExpander: вопрос уровня 1 - шаблон
+    архетипа, вопрос уровня 2+ - текст родителя и аспект архетипа.
+    Вопросы, которые не восстанавливаются по шаблонам, хранят отличающиеся
+    поля в extra.
+    """
+
+    def __init__(self, topic: str, questions: Iterable[Question] = ()):
+        self.topic = topic
+        self.archetypes = array('B')
+        self.priorities = array('B')
+        self.depths = array('B')
+        self.answer_types = array('B')
+        self.ordinals = array('H')
+        self.parents = array('i')
+        self.extra: Dict[int, Dict] = {}
+
+        # Путь от корня до последнего добавленного вопроса (обход в глубину):
+        # индексы и (ID, текст) вопросов
+        self._path: List[int] = []
+        self._path_texts: List[Tuple[str, str]] = []
+        self._id_index: Optional[Dict[str, int]] = None
+
+        for question in questions:
+            self.append(question)
+
+    def _find_parent(self, parent_id: Optional[str], depth: int) -> int:
+        if parent_id is None:
+            return -1
+        # Быстрый путь: вопросы идут в порядке обхода в глубину
+        if depth - 2 < len(self._path):
+            candidate = self._path[depth - 2]
+            if self._path_texts[depth - 2][0] == parent_id:
+                return candidate
+        if self._id_index is None:
+            self._id_index = {self.question_id(i): i for i in range(len(self))}
+        return self._id_index[parent_id]
+
+    def _make_text(self, code: str, ordinal: int, parent_text: Optional[str]) -> str:
+        if parent_text is None:
+            templates = QueryExpander.QUESTION_TEMPLATES.get(code, [])
+            if not 1 <= ordinal <= len(templates):
+                return ""
+            return templates[ordinal - 1].format(topic=self.topic)
+        return f"{parent_text} — {QueryExpander.ASPECTS[code]}"
+
+    def append(self, question: Question):
+        """Добавить вопрос (родитель должен быть добавлен раньше)"""
+        index = len(self)
+        archetype = get_archetype(question.archetype_code)
+        bits = archetype_bits(archetype)
+        depth = question.depth
+        parent = self._find_parent(question.parent_id, depth)
+        ordinal = int(question.id.rsplit(".", 1)[-1]) if question.id[-1:].isdigit() else 0
+
+        self.archetypes.append(bits)
+        self.priorities.append(question.priority)
+        self.depths.append(depth)
+        self.answer_types.append(ANSWER_TYPES.index(question.expected_answer_type))
+        self.ordinals.append(ordinal)
+        self.parents.append(parent)
+
+        # Ожидаемые ID и текст: от родителя на текущем пути, без рекурсии
+        if parent < 0:
+            parent_id = parent_text = None
+        elif depth - 2 < len(self._path) and self._path[depth - 2] == parent:
+            parent_id, parent_text = self._path_texts[depth - 2]
+        else:
+            parent_id, parent_text = self.question_id(parent), self.question_text(parent)
+        expected_id = f"{parent_id or archetype.code}.{ordinal}"
+        expected_text = self._make_text(archetype.code, ordinal, parent_text)
+
+        # Поля, не совпадающие с восстановленными, сохраняются явно
+        extra = {}
+        if expected_id != question.id:
+            extra['id'] = question.id
+        if expected_text != question.text:
+            extra['text'] = question.text
+        if tuple(question.keywords) != _KEYWORDS[bits]:
+            extra['keywords'] = tuple(question.keywords)
+        if question.interaction_type:
+            extra['related_archetype'] = question.related_archetype
+            extra['interaction_type'] = question.interaction_type
+        if extra:
+            self.extra[index] = extra
+
+        del self._path[depth - 1:]
+        del self._path_texts[depth - 1:]
+        self._path.append(index)
+        self._path_texts.append((question.id, question.text))
+        if self._id_index is not None:
+            self._id_index[question.id] = index
+
+    def question_id(self, index: int) -> str:
+        extra = self.extra.get(index)
+        if extra and 'id' in extra:
+            return extra['id']
+        parent = self.parents[index]
+        if parent < 0:
+            prefix = ARCHETYPES_BY_BITS[self.archetypes[index]].code
+        else:
+            prefix = self.question_id(parent)
+        return f"{prefix}.{self.ordinals[index]}"
+
+    def question_text(self, index: int) -> str:
+        extra = self.extra.get(index)
+        if extra and 'text' in extra:
+            return extra['text']
+        code = ARCHETYPES_BY_BITS[self.archetypes[index]].code
+        parent = self.parents[index]
+        parent_text = None if parent < 0 else self.question_text(parent)
+        return self._make_text(code, self.ordinals[index], parent_text)
+
+    def nbytes(self) -> int:
+        """Размер массивов в байтах (без extra)"""
+        columns = (self.archetypes, self.priorities, self.depths,
+                   self.answer_types, self.ordinals, self.parents)
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def __len__(self) -> int:
+        return len(self.archetypes)
+
+    def __getitem__(self, index: int) -> QuestionView:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return QuestionView(self, index)
+
+    def __iter__(self) -> Iterator[QuestionView]:
+        for index in range(len(self)):
+            yield QuestionView(self, index)
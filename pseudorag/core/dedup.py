@@ -0,0 +1,270 @@
+"""
+Удаление почти одинаковых вопросов
+Шаблоны разных архетипов дают похожие вопросы ("Какие традиции связаны
+с {topic}?" и "Какие традиции и обычаи существуют?"), а на глубине 2+
+каждый такой дубль размножается подвопросами. Каждый лишний вопрос - это
+лишний поиск и вызов LLM.
+"""
+
+import math
+import re
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .query_expander import Question, QuestionTree
+
+
+# Вопросительные и служебные слова
+STOP_WORDS = {
+    'какие', 'какой', 'какая', 'каков', 'какова', 'каково', 'каковы', 'как', 'что',
+    'чем', 'где', 'когда', 'сколько', 'этот', 'такое', 'для', 'или', 'при',
+    'what', 'which', 'how', 'the', 'and', 'are', 'does', 'with', 'for'
+}
+
+# Основы глаголов-связок шаблонов: "связаны с", "характерна для", ...
+FRAME_STEMS = {
+    'связа', 'сущес', 'харак', 'испол', 'приме', 'прояв', 'разви', 'опред',
+    'предс', 'проис', 'функц'
+}
+
+DEFAULT_THRESHOLD = 0.6
+CALLS_PER_QUESTION = 2  # поиск + LLM
+
+_WORD = re.compile(r'[а-яёa-z0-9]{2,}')
+# Окончания прилагательных: "транспортные", "цифровые", "технические"
+_ADJECTIVE = re.compile(r'(?:н|к|ов|ев)(?:ые|ый|ий|ая|ое|ой|ие|ых|ую|ого)$')
+
+
+def content_stems(text: str, ignore: Set[str] = frozenset()) -> Set[str]:
+    """
+    Основы (первые 5 букв) содержательных слов вопроса
+
+    Основа прилагательного помечается "~": "Какой транспорт" и "Какие
+    транспортные системы" спрашивают о разном, хотя корень общий.
+    """
+    stems = set()
+    for word in _WORD.findall(text.lower()):
+        if len(word) < 3 and word != 'it':
+            continue
+        stem = word[:5]
+        if word in STOP_WORDS or stem in FRAME_STEMS or stem in ignore:
+            continue
+        stems.add(stem + "~" if _ADJECTIVE.search(word) else stem)
+    return stems
+
+
+@dataclass
+class PruneReport:
+    """Итог удаления дублей"""
+    original: int
+    kept: int
+    merged: Dict[str, List[str]] = field(default_factory=dict)   # оставленный ID -> удалённые
+    calls_per_question: int = CALLS_PER_QUESTION
+
+    @property
+    def removed(self) -> int:
+        return self.original - self.kept
+
+    @property
+    def saved_calls(self) -> int:
+        return self.removed * self.calls_per_question
+
+    def summary(self) -> str:
+        share = self.removed / self.original if self.original else 0.0
+        return (f"Вопросов: {self.original} → {self.kept} (-{self.removed}, {share:.1%}); "
+                f"сэкономлено вызовов: {self.saved_calls}")
+
+
+class QuestionPruner:
+    """
+    Слияние почти одинаковых вопросов дерева
+
+    Вопросы уровня 1 сравниваются лексически: основы содержательных слов
+    (без слов темы, вопросительных слов и связок шаблонов), взвешенные по
+    IDF внутри дерева, мера Дайса. Вместо этого можно передать embed -
+    функцию текстов в векторы; тогда сходство - косинус, а векторы
+    кэшируются по тексту.
+
+    Сливаются только вопросы одного архетипа. Вопрос глубже 1 - дубль,
+    если его родитель слит и у оставленного родителя есть подвопрос с тем
+    же аспектом; иначе он переносится под оставленного родителя и получает
+    следующий номер и текст от него (вместе со своими подвопросами).
+    Вопросы о взаимодействиях не трогаются.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD,
+                 embed: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None,
+                 calls_per_question: int = CALLS_PER_QUESTION):
+        """
+        Args:
+            threshold: Минимальное сходство для слияния
+            embed: Функция эмбеддингов (по умолчанию - лексическое сходство)
+            calls_per_question: Вызовов на вопрос для отчёта
+        """
+        self.threshold = threshold
+        self.embed = embed
+        self.calls_per_question = calls_per_question
+        self._embeddings: Dict[str, np.ndarray] = {}
+
+    # --- Сходство ---
+
+    def _lexical_pairs(self, texts: List[str], topic: str) -> Dict[int, List[Tuple[int, float]]]:
+        ignore = {word[:5] for word in _WORD.findall(topic.lower())}
+        stems = [content_stems(text, ignore) for text in texts]
+
+        postings: Dict[str, List[int]] = {}
+        for i, s in enumerate(stems):
+            for stem in s:
+                postings.setdefault(stem, []).append(i)
+        idf = {stem: math.log(len(texts) / len(ids)) + 0.1 for stem, ids in postings.items()}
+        weight = [sum(idf[stem] for stem in s) for s in stems]
+
+        # Кандидаты - только пары с общей основой (инвертированный индекс)
+        shared: Dict[Tuple[int, int], float] = {}
+        for stem, ids in postings.items():
+            for a in range(len(ids)):
+                for b in range(a + 1, len(ids)):
+                    key = (ids[a], ids[b])
+                    shared[key] = shared.get(key, 0.0) + idf[stem]
+
+        pairs: Dict[int, List[Tuple[int, float]]] = {}
+        for (i, j), common in shared.items():
+            similarity = 2 * common / (weight[i] + weight[j])
+            if similarity >= self.threshold:
+                pairs.setdefault(i, []).append((j, similarity))
+                pairs.setdefault(j, []).append((i, similarity))
+        return pairs
+
+    def _embedding_pairs(self, texts: List[str]) -> Dict[int, List[Tuple[int, float]]]:
+        missing = [t for t in dict.fromkeys(texts) if t not in self._embeddings]
+        if missing:
+            for text, vector in zip(missing, self.embed(missing)):
+                vector = np.asarray(vector, dtype=np.float32)
+                self._embeddings[text] = vector / (np.linalg.norm(vector) or 1.0)
+
+        matrix = np.stack([self._embeddings[t] for t in texts])
+        similarity = np.triu(matrix @ matrix.T, 1)
+        pairs: Dict[int, List[Tuple[int, float]]] = {}
+        for i, j in zip(*np.nonzero(similarity >= self.threshold)):
+            pairs.setdefault(int(i), []).append((int(j), float(similarity[i, j])))
+            pairs.setdefault(int(j), []).append((int(i), float(similarity[i, j])))
+        return pairs
+
+    # --- Слияние ---
+
+    def prune_questions(self, questions: Iterable, topic: str = "") -> Tuple[List[Question], PruneReport]:
+        """
+        Удалить дубли из списка вопросов (Question или QuestionView)
+
+        Returns:
+            (оставшиеся вопросы в исходном порядке, отчёт)
+        """
+        questions = [q.to_question() if hasattr(q, 'to_question') else q for q in questions]
+        report = PruneReport(original=len(questions), kept=0,
+                             calls_per_question=self.calls_per_question)
+
+        top = [i for i, q in enumerate(questions) if q.depth == 1 and not q.interaction_type]
+        texts = [questions[i].text for i in top]
+        if self.embed is not None and texts:
+            pairs = self._embedding_pairs(texts)
+        else:
+            pairs = self._lexical_pairs(texts, topic)
+
+        kept: Dict[int, Question] = {}       # индекс -> оставленный (с объединёнными полями)
+        merged_into: Dict[str, str] = {}     # удалённый ID -> оставленный ID
+        index_of = {q.id: i for i, q in enumerate(questions)}
+
+        # Уровень 1: сначала более приоритетные, при равенстве - более ранние
+        order = sorted(range(len(top)), key=lambda k: (-questions[top[k]].priority, top[k]))
+        kept_top: Set[int] = set()
+        for k in order:
+            i = top[k]
+            candidates = [
+                (s, j) for j, s in pairs.get(k, [])
+                if j in kept_top and questions[top[j]].archetype_code == questions[i].archetype_code
+            ]
+            if candidates:
+                _, j = max(candidates)
+                self._merge(kept, merged_into, report, top[j], questions[i])
+            else:
+                kept_top.add(k)
+                kept[i] = questions[i]
+
+        # Вопросы о взаимодействиях не сливаются
+        for i, q in enumerate(questions):
+            if q.interaction_type:
+                kept[i] = q
+
+        # Глубже - по уровням, через родителей; сначала дети оставленных
+        siblings: Dict[Tuple[str, str], int] = {}   # (родитель, аспект) -> индекс
+        renamed: Dict[str, str] = {}                # старый ID перенесённого -> новый
+        texts = {q.id: q.text for q in kept.values()}
+        last_child: Dict[str, int] = {}             # родитель -> последний номер подвопроса
+        deeper = sorted(
+            (q.depth, q.parent_id in merged_into, i)
+            for i, q in enumerate(questions) if q.depth > 1 and not q.interaction_type
+        )
+        for _, _, i in deeper:
+            q = questions[i]
+            parent_id = merged_into.get(q.parent_id, q.parent_id)
+            parent_id = renamed.get(parent_id, parent_id)
+            aspect = self._aspect(q, questions, index_of)
+            key = (parent_id, aspect)
+            if key in siblings:
+                self._merge(kept, merged_into, report, siblings[key], q)
+                continue
+            if parent_id != q.parent_id:
+                # Перенесённый вопрос нумеруется и формулируется от нового родителя
+                number = last_child.get(parent_id, 0) + 1
+                text = texts[parent_id] + aspect if aspect != q.text else q.text
+                renamed[q.id] = f"{parent_id}.{number}"
+                q = replace(q, id=renamed[q.id], text=text, parent_id=parent_id)
+            else:
+                number = int(q.id.rsplit(".", 1)[-1])
+            last_child[parent_id] = max(last_child.get(parent_id, 0), number)
+            texts[q.id] = q.text
+            siblings[key] = i
+            kept[i] = q
+
+        result = [kept[i] for i in sorted(kept)]
+        report.kept = len(result)
+        return result, report
+
+    @staticmethod
+    def _aspect(question: Question, questions: List[Question], index_of: Dict[str, int]) -> str:
+        """Текст подвопроса после текста родителя ("— аспект")"""
+        parent = index_of.get(question.parent_id)
+        if parent is not None and question.text.startswith(questions[parent].text):
+            return question.text[len(questions[parent].text):]
+        return question.text
+
+    @staticmethod
+    def _merge(kept: Dict[int, Question], merged_into: Dict[str, str],
+               report: PruneReport, target: int, duplicate: Question):
+        """Слить duplicate в kept[target]: приоритет - максимум, ключевые слова - объединение"""
+        keeper = kept[target]
+        keywords = list(dict.fromkeys(keeper.keywords + duplicate.keywords))
+        kept[target] = replace(keeper, keywords=keywords,
+                               priority=max(keeper.priority, duplicate.priority))
+        merged_into[duplicate.id] = keeper.id
+        report.merged.setdefault(keeper.id, []).append(duplicate.id)
+
+    def prune(self, tree: QuestionTree) -> Tuple[QuestionTree, PruneReport]:
+        """
+        Новое дерево без дублей
+
+        Returns:
+            (дерево, отчёт); в metadata дерева - число удалённых вопросов
+        """
+        questions, report = self.prune_questions(tree.questions, tree.topic)
+        metadata = dict(tree.metadata)
+        metadata['total_questions'] = len(questions)
+        metadata['pruned_questions'] = report.removed
+        return QuestionTree(
+            topic=tree.topic,
+            root_question=tree.root_question,
+            questions=questions,
+            metadata=metadata
+        ), report
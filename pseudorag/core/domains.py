@@ -0,0 +1,36 @@
+"""
+Предметные домены запросов
+Основы слов для классификации домена и бонусы релевантности архетипов
+"""
+
+from typing import Dict, List
+
+
+# Основы слов доменов (порядок важен: побеждает первый совпавший домен)
+DOMAIN_STEMS: Dict[str, List[str]] = {
+    'урбанистика': ['город', 'горо', 'столиц', 'мегаполис'],
+    'биология': ['животн', 'растен', 'организм', 'вид'],
+    'техника': ['машин', 'транспорт', 'устройств'],
+    'география': ['стран', 'территор', 'регион', 'континент'],
+    'культура': ['искусств', 'культур', 'традиц']
+}
+
+DEFAULT_DOMAIN = 'общее'
+
+# Все домены, DEFAULT_DOMAIN - последний
+DOMAINS: List[str] = list(DOMAIN_STEMS) + [DEFAULT_DOMAIN]
+
+# Бонус релевантности архетипов по домену
+DOMAIN_BONUS: Dict[str, Dict[str, float]] = {
+    'урбанистика': {
+        'MSCO': 0.3, 'MDCO': 0.3, 'MDCF': 0.3, 'ASCF': 0.2,
+        'ADCF': 0.3, 'ASEO': 0.2, 'MDEF': 0.2
+    },
+    'биология': {
+        'MDEF': 0.4, 'MSCF': 0.3, 'ASEO': 0.2, 'ASCO': 0.2
+    },
+    'техника': {
+        'MDCO': 0.4, 'MDEO': 0.3, 'ADCO': 0.3, 'ASEO': 0.2
+    }
+}
+
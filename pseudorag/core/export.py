@@ -0,0 +1,187 @@
+"""
+Потоковый экспорт вопросников
+NDJSON и Markdown пишутся по одному вопросу прямо из итератора
+(QueryExpander.iter_questions), с опциональным сжатием gzip/zstd
+"""
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from .archetypes import get_archetype
+from .query_expander import Question, question_to_dict
+
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "Для сжатия zstd установите пакет: pip install zstandard"
+        ) from None
+    return zstandard
+
+
+def _resolve_compression(path: Path, compression: Optional[str]) -> str:
+    """None - по расширению файла (.gz, .zst)"""
+    if compression is None:
+        return _SUFFIXES.get(path.suffix, "none")
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Неизвестное сжатие: {compression} (доступны: {', '.join(COMPRESSIONS)})"
+        )
+    return compression
+
+
+def open_text_writer(filepath: str, compression: Optional[str] = None,
+                     level: Optional[int] = None) -> io.TextIOBase:
+    """
+    Открыть текстовый файл на запись с опциональным сжатием
+
+    Args:
+        filepath: Путь к файлу
+        compression: "none", "gzip", "zstd" или None (по расширению)
+        level: Уровень сжатия (по умолчанию - уровень библиотеки)
+    """
+    path = Path(filepath)
+    compression = _resolve_compression(path, compression)
+
+    if compression == "gzip":
+        return gzip.open(path, 'wt', encoding='utf-8',
+                         compresslevel=9 if level is None else level)
+    if compression == "zstd":
+        zstandard = _zstandard()
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        stream = compressor.stream_writer(open(path, 'wb'), closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def open_text_reader(filepath: str) -> io.TextIOBase:
+    """Открыть текстовый файл на чтение; сжатие определяется по сигнатуре"""
+    path = Path(filepath)
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if magic == _ZSTD_MAGIC:
+        zstandard = _zstandard()
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def write_ndjson(filepath: str, topic: str, questions: Iterable,
+                 root_question: Optional[str] = None,
+                 metadata: Optional[Dict] = None,
+                 compression: Optional[str] = None) -> int:
+    """
+    Записать вопросник в NDJSON (одна строка на вопрос)
+
+    Первая строка - заголовок {"topic", "root_question", "metadata"}.
+    В памяти одновременно только текущий вопрос.
+
+    Args:
+        filepath: Путь к файлу (.ndjson, .ndjson.gz, .ndjson.zst)
+        topic: Тема
+        questions: Итератор Question или QuestionView
+        root_question: Исходный вопрос (по умолчанию - тема)
+        metadata: Метаданные заголовка
+        compression: "none", "gzip", "zstd" или None (по расширению)
+
+    Returns:
+        Количество записанных вопросов
+    """
+    count = 0
+    with open_text_writer(filepath, compression) as f:
+        header = {
+            'topic': topic,
+            'root_question': root_question or topic,
+            'metadata': metadata or {}
+        }
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for question in questions:
+            f.write(json.dumps(question_to_dict(question), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_ndjson(filepath: str) -> Tuple[Dict, Iterator[Question]]:
+    """
+    Потоковое чтение NDJSON вопросника
+
+    Returns:
+        (заголовок, итератор Question); файл закрывается,
+        когда итератор исчерпан
+    """
+    def records() -> Iterator[Dict]:
+        with open_text_reader(filepath) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    stream = records()
+    header = next(stream, None)
+    if header is None:
+        raise ValueError(f"Пустой файл вопросника: {filepath}")
+
+    return header, (Question(**record) for record in stream)
+
+
+def write_markdown(filepath: str, topic: str, questions: Iterable,
+                   root_question: Optional[str] = None,
+                   compression: Optional[str] = None) -> int:
+    """
+    Записать вопросник в Markdown по секциям
+
+    Новая секция начинается с каждым вопросом уровня 1 другого архетипа,
+    поэтому вопросы в порядке обхода в глубину (iter_questions по
+    умолчанию) не требуют группировки в памяти. Общее число вопросов
+    пишется в конце файла.
+
+    Returns:
+        Количество записанных вопросов
+    """
+    count = 0
+    section = None
+    with open_text_writer(filepath, compression) as f:
+        f.write(f"# Вопросник: {topic}\n\n")
+        f.write(f"**Исходный запрос:** {root_question or topic}\n\n")
+        f.write("---\n\n")
+
+        for q in questions:
+            if q.interaction_type:
+                if section != "interactions":
+                    if section is not None:
+                        f.write("\n")
+                    section = "interactions"
+                    f.write("## Взаимодействия\n\n")
+                f.write(f"**{q.id}** ({q.interaction_type}). {q.text}\n")
+                f.write(f"  *Тип ответа: {q.expected_answer_type}*\n\n")
+                count += 1
+                continue
+
+            if q.depth == 1 and q.archetype_code != section:
+                if section is not None:
+                    f.write("\n")
+                section = q.archetype_code
+                arch = get_archetype(section)
+                f.write(f"## {arch.code} - {arch.name_ru}\n\n")
+
+            indent = "  " * (q.depth - 1)
+            f.write(f"{indent}**{q.id}.** {q.text}\n")
+            f.write(f"{indent}  *Тип ответа: {q.expected_answer_type}*\n\n")
+            count += 1
+
+        f.write(f"\n---\n\n**Всего вопросов:** {count}\n")
+    return count
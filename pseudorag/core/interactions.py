@@ -0,0 +1,177 @@
+"""
+Матрица взаимодействий архетипов (16×16)
+Типы взаимодействий и их сила из docs/51 в виде массивов NumPy;
+выбор самых сильных пар архетипов для темы
+"""
+
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+from .archetypes import ARCHETYPES, Archetype
+
+
+# 12 базовых типов взаимодействий (индекс - код типа в матрице)
+INTERACTION_TYPES = ["CR", "DS", "TR", "CN", "UT", "CT", "EX", "SY", "IN", "LR", "EV", "RS"]
+
+INTERACTION_NAMES_RU = {
+    "CR": "Создание", "DS": "Разрушение", "TR": "Трансформация",
+    "CN": "Содержание", "UT": "Использование", "CT": "Управление",
+    "EX": "Обмен", "SY": "Синтез", "IN": "Влияние",
+    "LR": "Обучение", "EV": "Эволюция", "RS": "Резонанс"
+}
+
+# Вопрос о паре (первое -> второе) для каждого типа
+INTERACTION_QUESTIONS = {
+    "CR": "как первое порождает второе?",
+    "DS": "как первое разрушает второе?",
+    "TR": "как первое превращается во второе?",
+    "CN": "как первое вмещает второе?",
+    "UT": "как первое использует второе?",
+    "CT": "как первое управляет вторым?",
+    "EX": "чем они обмениваются?",
+    "SY": "что возникает при их соединении?",
+    "IN": "как первое влияет на второе?",
+    "LR": "чему первое учится у второго?",
+    "EV": "как они развиваются вместе?",
+    "RS": "в чём они созвучны?"
+}
+
+# Матрица из docs/51 (строка -> столбец), порядок MSEO ... ADCF
+_MATRIX_CODES = ["MSEO", "MSEF", "MSCO", "MSCF", "MDEO", "MDEF", "MDCO", "MDCF",
+                 "ASEO", "ASEF", "ASCO", "ASCF", "ADEO", "ADEF", "ADCO", "ADCF"]
+_MATRIX_ROWS = [
+    "SY SY CN CN UT UT UT CN CR IN CR IN UT IN UT IN",
+    "SY EX CN CN UT UT UT EV CR IN CR IN UT IN UT EV",
+    "CN CN SY CN CN CN CN CN CR IN CR IN UT IN UT IN",
+    "CN EV CN EV CN CN CN EV IN RS IN RS IN RS IN EV",
+    "UT UT CR TR SY TR SY TR CR IN CR IN CR IN CR TR",
+    "UT UT CR EV UT EV CR EV LR RS LR RS LR RS LR EV",
+    "UT UT CR TR CN CN SY CR UT IN UT IN CT IN CT CR",
+    "UT EV CN EV CN CN CN EV CR RS CR RS CR RS CR EV",
+    "CR CR CR IN CR LR CT IN SY IN SY IN CR IN CR IN",
+    "IN IN IN RS IN RS IN RS IN RS IN RS IN RS IN RS",
+    "CR CR CR IN CR LR CT IN SY IN SY IN CR IN CR IN",
+    "IN IN IN RS IN RS IN RS IN RS IN RS IN RS IN RS",
+    "UT UT CT TR CR TR CR TR UT IN UT IN SY IN SY TR",
+    "IN IN CR RS CR RS CR RS CR RS CR RS CR RS CR RS",
+    "UT UT CT CT CT CT CT CT UT IN UT IN CN IN SY CT",
+    "IN EV IN EV TR EV TR EV IN RS IN RS TR RS CT EV",
+]
+
+# Сила взаимодействия: по умолчанию, ключевые пары docs/51 и оценки
+# совместимости (звёзды / 5, симметрично)
+DEFAULT_STRENGTH = 0.6
+KEY_PAIR_STRENGTH = 0.8
+KEY_PAIRS = [
+    ("MSEO", "MDCO"), ("MSCO", "MDEF"), ("MSCF", "MDEF"), ("MDEO", "MDCO"),
+    ("MDCO", "MDCF"), ("ASEO", "MSEO"), ("ASCO", "MSCO"), ("MDEF", "ASEF"),
+    ("ADCO", "MDCO"), ("MDCF", "ADCF"), ("ASEO", "ADEO"), ("ASCO", "ADCO"),
+    ("ASEF", "ADEF"), ("ASCF", "ADCF"), ("ADEO", "ADCO"), ("ADCO", "ADCF")
+]
+COMPATIBILITY_STARS = {
+    5: [("ASEO", "ASCO"), ("MDEO", "MDCO"), ("ADEF", "ADCO")],
+    4: [("MSEO", "MDCO"), ("ASCO", "ADCO"), ("MDEF", "MSCF")],
+    3: [("MSCO", "ASCF"), ("MDEO", "ADEF")],
+    2: [("MSEF", "ASEF"), ("ASEO", "MDCF")],
+    1: [("MSEO", "ADCF"), ("ASEF", "MDCO")]
+}
+
+
+def _build_matrix(archetypes: Sequence[Archetype] = ARCHETYPES):
+    """Типы (uint8) и сила (float32) взаимодействий в порядке archetypes"""
+    index = {arch.code: i for i, arch in enumerate(archetypes)}
+    type_index = {code: i for i, code in enumerate(INTERACTION_TYPES)}
+    size = len(archetypes)
+
+    types = np.zeros((size, size), dtype=np.uint8)
+    for row_code, row in zip(_MATRIX_CODES, _MATRIX_ROWS):
+        for col_code, code in zip(_MATRIX_CODES, row.split()):
+            types[index[row_code], index[col_code]] = type_index[code]
+
+    strength = np.full((size, size), DEFAULT_STRENGTH, dtype=np.float32)
+    for a, b in KEY_PAIRS:
+        strength[index[a], index[b]] = strength[index[b], index[a]] = KEY_PAIR_STRENGTH
+    for stars, pairs in COMPATIBILITY_STARS.items():
+        for a, b in pairs:
+            strength[index[a], index[b]] = strength[index[b], index[a]] = stars / 5
+    # Взаимодействие архетипа с самим собой - не вопрос о паре
+    np.fill_diagonal(strength, 0)
+
+    return types, strength
+
+
+# Ненаправленные типы: вопрос о паре не зависит от порядка архетипов
+UNDIRECTED_TYPES = {"EX", "SY", "EV", "RS"}
+
+
+def _pair_mask(types: np.ndarray) -> np.ndarray:
+    """
+    Упорядоченные пары, о которых задаётся вопрос
+
+    Матрица типов несимметрична, поэтому A -> B и B -> A - разные вопросы.
+    Исключаются диагональ и обратная копия пары, у которой тип в обе
+    стороны один и тот же и ненаправленный.
+    """
+    undirected = np.isin(types, [INTERACTION_TYPES.index(code) for code in UNDIRECTED_TYPES])
+    duplicate = np.tril(undirected & (types == types.T), -1).astype(bool)
+    mask = ~duplicate
+    np.fill_diagonal(mask, False)
+    return mask
+
+
+# Загружается один раз при импорте
+INTERACTION_TYPE, INTERACTION_STRENGTH = _build_matrix()
+_PAIR_MASK = _pair_mask(INTERACTION_TYPE)
+
+
+class Interaction(NamedTuple):
+    """Пара архетипов: source -> target"""
+    source: Archetype
+    target: Archetype
+    type: str                         # "CR", "IN", ...
+    weight: float                     # релевантность source * target * сила
+
+
+def top_interactions(scores: Sequence[float], k: int,
+                     min_relevance: float = 0.0) -> List[Interaction]:
+    """
+    Самые сильные пары архетипов для темы
+
+    Вес пары - внешнее произведение векторов релевантности, умноженное на
+    силу взаимодействия. Пары упорядочены: тип берётся из строки source, и
+    A -> B и B -> A с разными типами - разные пары с одинаковым весом
+    (сила симметрична). Пара с одним ненаправленным типом в обе стороны
+    берётся один раз (source раньше target в ARCHETYPES).
+
+    Args:
+        scores: Релевантность архетипов (в порядке ARCHETYPES)
+        k: Максимум пар
+        min_relevance: Архетипы ниже порога не участвуют
+
+    Returns:
+        Пары по убыванию веса
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    scores = np.where(scores >= min_relevance, scores, 0)
+
+    weights = np.where(_PAIR_MASK, np.outer(scores, scores) * INTERACTION_STRENGTH, 0)
+
+    flat = weights.ravel()
+    k = min(k, int(np.count_nonzero(flat)))
+    if k <= 0:
+        return []
+    top = np.argpartition(-flat, k - 1)[:k]
+    # Равные веса - в порядке ARCHETYPES (source, затем target)
+    top = top[np.lexsort((top, -flat[top]))]
+
+    result = []
+    for i, j in zip(*np.unravel_index(top, weights.shape)):
+        result.append(Interaction(
+            source=ARCHETYPES[i],
+            target=ARCHETYPES[j],
+            type=INTERACTION_TYPES[INTERACTION_TYPE[i, j]],
+            weight=float(weights[i, j])
+        ))
+    return result
+
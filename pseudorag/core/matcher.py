@@ -0,0 +1,158 @@
+"""
+Многошаблонный поиск ключевых слов (автомат Ахо-Корасик)
+Один проход по тексту находит все ключевые слова архетипов и основы
+доменов вместе с их владельцами
+"""
+
+from collections import Counter, deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from .archetypes import ARCHETYPES
+from .domains import DOMAIN_STEMS
+
+
+class Owner(NamedTuple):
+    """Владелец шаблона: архетип (с языком ключевого слова) или домен"""
+    kind: str                         # "archetype" или "domain"
+    name: str                         # "MSCO" или "урбанистика"
+    language: Optional[str] = None    # "ru"/"en" для архетипов
+
+
+class Match(NamedTuple):
+    """Вхождение шаблона в текст (позиции - в text.lower())"""
+    start: int
+    end: int
+    pattern: str
+    owners: Tuple[Owner, ...]
+
+
+class KeywordMatcher:
+    """
+    Автомат Ахо-Корасик над набором шаблонов без учёта регистра
+
+    Поиск - один проход по тексту, O(длина текста + число вхождений)
+    независимо от числа шаблонов. Шаблоны совпадают как подстроки,
+    так же как проверка `keyword in text`.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Owner]]):
+        """
+        Args:
+            patterns: Пары (шаблон, владелец); один шаблон может иметь
+                      несколько владельцев (и повторяться у одного владельца)
+        """
+        self.patterns: List[str] = []
+        self.owners: List[Tuple[Owner, ...]] = []
+        pattern_ids: Dict[str, int] = {}
+        owners: List[List[Owner]] = []
+
+        for pattern, owner in patterns:
+            pattern = pattern.lower()
+            if not pattern:
+                continue
+            if pattern not in pattern_ids:
+                pattern_ids[pattern] = len(self.patterns)
+                self.patterns.append(pattern)
+                owners.append([])
+            owners[pattern_ids[pattern]].append(owner)
+        self.owners = [tuple(o) for o in owners]
+
+        # Бор
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[int]] = [[]]
+        for pid, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                if ch not in self._goto[state]:
+                    self._goto[state][ch] = len(self._goto)
+                    self._goto.append({})
+                    self._output.append([])
+                state = self._goto[state][ch]
+            self._output[state].append(pid)
+
+        # Суффиксные ссылки (обход в ширину); выходы наследуются по ссылкам
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child].extend(self._output[self._fail[child]])
+
+    def iter_pattern_ids(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(позиция конца, id шаблона) для каждого вхождения"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, ch in enumerate(text.lower()):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in output[state]:
+                yield i + 1, pid
+
+    def iter_matches(self, text: str) -> Iterator[Match]:
+        """Все вхождения шаблонов по порядку конца (подходит для длинных документов)"""
+        for end, pid in self.iter_pattern_ids(text):
+            pattern = self.patterns[pid]
+            yield Match(end - len(pattern), end, pattern, self.owners[pid])
+
+    def find_all(self, text: str) -> List[Match]:
+        return list(self.iter_matches(text))
+
+    def matched_patterns(self, text: str) -> Set[int]:
+        """id шаблонов, встречающихся в тексте хотя бы раз"""
+        return {pid for _, pid in self.iter_pattern_ids(text)}
+
+    def count_owners(self, text: str) -> Counter:
+        """Число вхождений по владельцам (для разметки фрагментов корпуса)"""
+        counts = Counter()
+        for _, pid in self.iter_pattern_ids(text):
+            counts.update(self.owners[pid])
+        return counts
+
+
+def build_keyword_matcher() -> KeywordMatcher:
+    """Автомат по ключевым словам всех архетипов и основам доменов"""
+    patterns = []
+    for arch in ARCHETYPES:
+        patterns += [(kw, Owner("archetype", arch.code, "ru")) for kw in arch.keywords_ru]
+        patterns += [(kw, Owner("archetype", arch.code, "en")) for kw in arch.keywords_en]
+    for domain, stems in DOMAIN_STEMS.items():
+        patterns += [(stem, Owner("domain", domain)) for stem in stems]
+    return KeywordMatcher(patterns)
+
+
+# Строится один раз при импорте
+KEYWORD_MATCHER = build_keyword_matcher()
+
+
+def analyze_keywords(text: str, matcher: KeywordMatcher = KEYWORD_MATCHER) -> Dict:
+    """
+    Ключевые слова запроса за один проход
+
+    Returns:
+        {'domain': первый по порядку DOMAIN_STEMS совпавший домен или None,
+         'keyword_hits': {(код архетипа, язык): число совпавших ключевых слов}}
+
+    Как и в calculate_archetype_relevance, ключевое слово считается один
+    раз, сколько бы раз оно ни встретилось.
+    """
+    domain_order = {domain: i for i, domain in enumerate(DOMAIN_STEMS)}
+    domain = None
+    keyword_hits: Dict[Tuple[str, str], int] = {}
+
+    for pid in matcher.matched_patterns(text):
+        for owner in matcher.owners[pid]:
+            if owner.kind == "domain":
+                if domain is None or domain_order[owner.name] < domain_order[domain]:
+                    domain = owner.name
+            else:
+                key = (owner.name, owner.language)
+                keyword_hits[key] = keyword_hits.get(key, 0) + 1
+
+    return {'domain': domain, 'keyword_hits': keyword_hits}
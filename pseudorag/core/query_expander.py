@@ -3,11 +3,22 @@
 Превращает простой вопрос в структурированный вопросник по 16 архетипам
 """
 
+import itertools
 import json
+import os
 import re
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
 from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional
+from typing import AbstractSet, Callable, List, Dict, FrozenSet, Optional, Iterable, Iterator, Sequence, Tuple
 from .archetypes import ARCHETYPES, Archetype, get_archetype
+from .domains import DOMAIN_BONUS, DEFAULT_DOMAIN
+from .matcher import analyze_keywords
+from .interactions import INTERACTION_QUESTIONS, top_interactions
+
+
+# Вопросов о взаимодействиях на тему по умолчанию (при depth >= 2)
+DEFAULT_MAX_INTERACTIONS = 20
 
 
 @dataclass
@@ -21,6 +32,15 @@ class Question:
     expected_answer_type: str         # "list", "number", "text", "boolean"
     parent_id: Optional[str] = None   # ID родительского вопроса
     depth: int = 1                    # Глубина в дереве
+    related_archetype: Optional[str] = None   # Второй архетип пары (взаимодействия)
+    interaction_type: Optional[str] = None    # Тип взаимодействия: "CR", "IN", ...
+
+
+def question_to_dict(question) -> Dict:
+    """Словарь вопроса: Question или QuestionView компактного дерева"""
+    if isinstance(question, Question):
+        return asdict(question)
+    return question.to_dict()
 
 
 @dataclass
@@ -28,7 +48,7 @@ class QuestionTree:
     """Дерево вопросов"""
     topic: str                        # "Города Европы"
     root_question: str                # Исходный вопрос
-    questions: List[Question]         # Все вопросы
+    questions: List[Question]         # Все вопросы (или CompactQuestions)
     metadata: Dict                    # Метаданные
 
     def to_json(self, filepath: str):
@@ -36,12 +56,18 @@ class QuestionTree:
         data = {
             'topic': self.topic,
             'root_question': self.root_question,
-            'questions': [asdict(q) for q in self.questions],
+            'questions': [question_to_dict(q) for q in self.questions],
             'metadata': self.metadata
         }
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
+    def to_ndjson(self, filepath: str, compression: Optional[str] = None) -> int:
+        """Сохранить в NDJSON (потоково, сжатие gzip/zstd по расширению)"""
+        from .export import write_ndjson
+        return write_ndjson(filepath, self.topic, self.questions,
+                            self.root_question, self.metadata, compression)
+
     def to_markdown(self, filepath: str):
         """Экспортировать в Markdown"""
         with open(filepath, 'w', encoding='utf-8') as f:
@@ -52,7 +78,11 @@ class QuestionTree:
 
             # Группировка по архетипам
             by_archetype = {}
+            interactions = []
             for q in self.questions:
+                if q.interaction_type:
+                    interactions.append(q)
+                    continue
                 if q.archetype_code not in by_archetype:
                     by_archetype[q.archetype_code] = []
                 by_archetype[q.archetype_code].append(q)
@@ -70,6 +100,12 @@ class QuestionTree:
 
                     f.write("\n")
 
+            if interactions:
+                f.write(f"## Взаимодействия ({len(interactions)} вопросов)\n\n")
+                for q in interactions:
+                    f.write(f"**{q.id}** ({q.interaction_type}). {q.text}\n")
+                    f.write(f"  *Тип ответа: {q.expected_answer_type}*\n\n")
+
 
 class QueryExpander:
     """Расширитель запросов"""
@@ -180,20 +216,54 @@ class QueryExpander:
         ]
     }
 
-    def __init__(self):
-        self.questions = []
-        self.question_counter = 0
+    # Аспекты архетипов для рекурсивной декомпозиции (уровни 2+):
+    # каждый вопрос раскладывается на подвопросы по релевантным архетипам
+    ASPECTS = {
+        "MSEO": "материалы и элементы",
+        "MSEF": "сыпучие и неупорядоченные составляющие",
+        "MSCO": "сооружения и структуры",
+        "MSCF": "природная среда и ландшафт",
+        "MDEO": "механизмы и устройства",
+        "MDEF": "живые участники",
+        "MDCO": "техника и транспорт",
+        "MDCF": "динамика и потоки",
+        "ASEO": "ключевые показатели и факты",
+        "ASEF": "символы и образы",
+        "ASCO": "теории и модели",
+        "ASCF": "культура и традиции",
+        "ADEO": "процедуры и методы",
+        "ADEF": "атмосфера и идеи",
+        "ADCO": "программы и цифровые системы",
+        "ADCF": "социальные процессы"
+    }
+
+    def __init__(self, scorer=None):
+        """
+        Args:
+            scorer: ArchetypeScorer для векторизованной оценки релевантности,
+                    CentroidScorer для оценки по эмбеддингам или имя из
+                    centroids.SCORERS ("loop", "vector", "centroid");
+                    None - цикл по calculate_archetype_relevance
+        """
+        if isinstance(scorer, str):
+            from .centroids import create_scorer
+            scorer = create_scorer(scorer)
+        self.scorer = scorer
 
     def parse_topic(self, query: str) -> Dict:
         """Парсинг темы запроса"""
         # Простой парсинг (в реальной системе - NLP)
         entities = self._extract_entities(query)
 
+        # Домен и ключевые слова архетипов - за один проход автомата
+        keywords = analyze_keywords(query)
+
         return {
             'query': query,
             'entities': entities,
-            'domain': self._classify_domain(query),
-            'language': self._detect_language(query)
+            'domain': keywords['domain'] or DEFAULT_DOMAIN,
+            'language': self._detect_language(query),
+            'keyword_hits': keywords['keyword_hits']
         }
 
     def _extract_entities(self, text: str) -> List[str]:
@@ -205,20 +275,7 @@ class QueryExpander:
     def _classify_domain(self, query: str) -> str:
         """Классификация домена"""
         # Упрощенная классификация
-        domains = {
-            'урбанистика': ['город', 'горо', 'столиц', 'мегаполис'],
-            'биология': ['животн', 'растен', 'организм', 'вид'],
-            'техника': ['машин', 'транспорт', 'устройств'],
-            'география': ['стран', 'территор', 'регион', 'континент'],
-            'культура': ['искусств', 'культур', 'традиц']
-        }
-
-        query_lower = query.lower()
-        for domain, keywords in domains.items():
-            if any(kw in query_lower for kw in keywords):
-                return domain
-
-        return 'общее'
+        return analyze_keywords(query)['domain'] or DEFAULT_DOMAIN
 
     def _detect_language(self, text: str) -> str:
         """Определение языка"""
@@ -236,106 +293,296 @@ class QueryExpander:
         relevance = archetype.default_priority / 5.0
 
         # Бонус за совпадение ключевых слов
-        keywords = archetype.keywords_ru if topic_data['language'] == 'ru' else archetype.keywords_en
-        keyword_matches = sum(1 for kw in keywords if kw.lower() in query)
+        language = 'ru' if topic_data['language'] == 'ru' else 'en'
+        if 'keyword_hits' in topic_data:
+            keyword_matches = topic_data['keyword_hits'].get((archetype.code, language), 0)
+        else:
+            keywords = archetype.keywords_ru if language == 'ru' else archetype.keywords_en
+            keyword_matches = sum(1 for kw in keywords if kw.lower() in query)
         relevance += keyword_matches * 0.1
 
         # Бонус по домену
-        domain_bonus = {
-            'урбанистика': {
-                'MSCO': 0.3, 'MDCO': 0.3, 'MDCF': 0.3, 'ASCF': 0.2,
-                'ADCF': 0.3, 'ASEO': 0.2, 'MDEF': 0.2
-            },
-            'биология': {
-                'MDEF': 0.4, 'MSCF': 0.3, 'ASEO': 0.2, 'ASCO': 0.2
-            },
-            'техника': {
-                'MDCO': 0.4, 'MDEO': 0.3, 'ADCO': 0.3, 'ASEO': 0.2
-            }
-        }.get(domain, {})
-
+        domain_bonus = DOMAIN_BONUS.get(domain, {})
         relevance += domain_bonus.get(archetype.code, 0)
 
         return min(relevance, 1.0)
 
+    @staticmethod
+    def _detect_answer_type(question_text: str) -> str:
+        """Определение типа ожидаемого ответа"""
+        text = question_text.lower()
+        if "какие" in text or "какой" in text:
+            return "list"
+        elif "сколько" in text or "количество" in text:
+            return "number"
+        elif "как" in text:
+            return "text"
+        else:
+            return "text"
+
     def generate_base_questions(self, topic: str, archetype: Archetype) -> List[Question]:
         """Генерация базовых вопросов для архетипа"""
+        # Без изменения состояния экземпляра: расширение потокобезопасно
         templates = self.QUESTION_TEMPLATES.get(archetype.code, [])
         questions = []
 
         for i, template in enumerate(templates, 1):
-            self.question_counter += 1
             question_text = template.format(topic=topic)
 
-            # Определение типа ожидаемого ответа
-            if "какие" in question_text.lower() or "какой" in question_text.lower():
-                answer_type = "list"
-            elif "сколько" in question_text.lower() or "количество" in question_text.lower():
-                answer_type = "number"
-            elif "как" in question_text.lower():
-                answer_type = "text"
-            else:
-                answer_type = "text"
-
             question = Question(
                 id=f"{archetype.code}.{i}",
                 text=question_text,
                 archetype_code=archetype.code,
                 priority=archetype.default_priority,
                 keywords=archetype.keywords_ru,
-                expected_answer_type=answer_type,
+                expected_answer_type=self._detect_answer_type(question_text),
                 depth=1
             )
             questions.append(question)
 
         return questions
 
-    def expand_query(self, query: str, depth: int = 1, min_relevance: float = 0.3) -> QuestionTree:
+    def generate_sub_questions(self, parent: Question, archetypes: Sequence[Archetype],
+                               used: Optional[AbstractSet[str]] = None) -> Iterator[Question]:
+        """
+        Декомпозиция вопроса на подвопросы по аспектам архетипов
+
+        Аспекты, уже использованные на пути от корня (used - коды
+        архетипов родителя и его предков; по умолчанию - только родителя),
+        пропускаются. Подвопрос №n получает иерархический ID "<id родителя>.n"
+        """
+        if used is None:
+            used = {parent.archetype_code}
+        archetypes = [arch for arch in archetypes if arch.code not in used]
+        for i, archetype in enumerate(archetypes, 1):
+            question_text = f"{parent.text} — {self.ASPECTS[archetype.code]}"
+            yield Question(
+                id=f"{parent.id}.{i}",
+                text=question_text,
+                archetype_code=archetype.code,
+                priority=archetype.default_priority,
+                keywords=archetype.keywords_ru,
+                expected_answer_type=self._detect_answer_type(question_text),
+                parent_id=parent.id,
+                depth=parent.depth + 1
+            )
+
+    def rank_archetypes(self, topic_data: Dict) -> List[Tuple[Archetype, float]]:
+        """Релевантность всех архетипов, по убыванию"""
+        if self.scorer is not None:
+            return self.scorer.rank(topic_data)
+
+        archetype_scores = []
+        for arch in ARCHETYPES:
+            score = self.calculate_archetype_relevance(arch, topic_data)
+            archetype_scores.append((arch, score))
+
+        archetype_scores.sort(key=lambda x: x[1], reverse=True)
+        return archetype_scores
+
+    def generate_interaction_questions(self, topic: str,
+                                       archetype_scores: List[Tuple[Archetype, float]],
+                                       max_pairs: int,
+                                       min_relevance: float = 0.3) -> List[Question]:
+        """
+        Вопросы о взаимодействиях самых сильных пар архетипов (docs/52, шаг 5)
+
+        Вопрос о паре стоит вне иерархии: ID "<source>-<target>" (например,
+        "MSCO-MDEF"), depth = 1 и parent_id = None при любой глубине дерева;
+        от корневых вопросов его отличают interaction_type и related_archetype.
+
+        Args:
+            topic: Тема
+            archetype_scores: Результат rank_archetypes
+            max_pairs: Максимум вопросов (пар)
+            min_relevance: Архетипы ниже порога не участвуют
+        """
+        by_code = dict((arch.code, score) for arch, score in archetype_scores)
+        scores = [by_code.get(arch.code, 0.0) for arch in ARCHETYPES]
+
+        questions = []
+        for pair in top_interactions(scores, max_pairs, min_relevance):
+            source, target = pair.source, pair.target
+            question_text = (
+                f"{topic}: {self.ASPECTS[source.code]} → {self.ASPECTS[target.code]} — "
+                f"{INTERACTION_QUESTIONS[pair.type]}"
+            )
+            questions.append(Question(
+                id=f"{source.code}-{target.code}",
+                text=question_text,
+                archetype_code=source.code,
+                priority=max(source.default_priority, target.default_priority),
+                keywords=source.keywords_ru + target.keywords_ru,
+                expected_answer_type="text",
+                related_archetype=target.code,
+                interaction_type=pair.type
+            ))
+        return questions
+
+    @staticmethod
+    def _interaction_cap(depth: int, max_interactions: Optional[int]) -> int:
+        if max_interactions is None:
+            return DEFAULT_MAX_INTERACTIONS if depth >= 2 else 0
+        return max_interactions
+
+    def _walk(self, topic: str, archetypes: Sequence[Archetype], parent: Optional[Question],
+              max_depth: int, limits: List[Optional[int]], counts: List[int],
+              target: Optional[int], used: FrozenSet[str] = frozenset()) -> Iterator[Question]:
+        """
+        Обход дерева в глубину ниже parent
+
+        Выдаёт вопросы уровня target (или всех уровней, если target=None).
+        counts[level] - сколько вопросов уровня уже принято; вопрос сверх
+        лимита уровня отбрасывается вместе с поддеревом. used - архетипы
+        parent и его предков, их аспекты ниже не повторяются.
+        """
+        level = 1 if parent is None else parent.depth + 1
+        limit = limits[level - 1]
+
+        if parent is None:
+            children = (q for arch in archetypes for q in self.generate_base_questions(topic, arch))
+        else:
+            children = self.generate_sub_questions(parent, archetypes, used)
+
+        for question in children:
+            if limit is not None and counts[level] >= limit:
+                return
+            counts[level] += 1
+
+            if target is None or level == target:
+                yield question
+            if level < max_depth and (target is None or level < target):
+                yield from self._walk(topic, archetypes, question, max_depth, limits, counts, target,
+                                      used | {question.archetype_code})
+
+    def iter_tree(self, topic: str, archetypes: Sequence[Archetype], depth: int = 1,
+                  order: str = "dfs",
+                  level_limits: Optional[Sequence[Optional[int]]] = None) -> Iterator[Question]:
+        """
+        Ленивая генерация дерева вопросов
+
+        Args:
+            topic: Тема
+            archetypes: Архетипы для декомпозиции (по убыванию релевантности)
+            depth: Глубина дерева (1-4)
+            order: "dfs" - в глубину (иерархический порядок),
+                   "bfs" - по уровням
+            level_limits: Максимум вопросов на каждом уровне
+                          (level_limits[0] - уровень 1, None - без лимита)
+
+        Yields:
+            Question - в памяти одновременно только путь от корня
+
+        Оба порядка выдают одно и то же множество вопросов: внутри уровня
+        порядок обхода в глубину совпадает с порядком по уровням. Обход по
+        уровням заново порождает предков (итеративное углубление) вместо
+        хранения фронта.
+        """
+        limits = list(level_limits or [])[:depth]
+        limits += [None] * (depth - len(limits))
+
+        if order == "dfs":
+            yield from self._walk(topic, archetypes, None, depth, limits, [0] * (depth + 1), None)
+        elif order == "bfs":
+            for level in range(1, depth + 1):
+                yield from self._walk(topic, archetypes, None, level, limits, [0] * (depth + 1), level)
+        else:
+            raise ValueError(f"Неизвестный порядок обхода: {order} (dfs или bfs)")
+
+    def iter_questions(self, query: str, depth: int = 1, min_relevance: float = 0.3,
+                       order: str = "dfs",
+                       level_limits: Optional[Sequence[Optional[int]]] = None,
+                       max_interactions: Optional[int] = None) -> Iterator[Question]:
+        """
+        Потоковое расширение запроса (без построения QuestionTree)
+
+        Args: см. expand_query и iter_tree
+
+        Вопросы о взаимодействиях идут последними.
+        """
+        topic_data = self.parse_topic(query)
+        archetype_scores = self.rank_archetypes(topic_data)
+        archetypes = [arch for arch, score in archetype_scores if score >= min_relevance]
+        yield from self.iter_tree(query, archetypes, depth, order, level_limits)
+
+        max_pairs = self._interaction_cap(depth, max_interactions)
+        if max_pairs > 0:
+            yield from self.generate_interaction_questions(
+                query, archetype_scores, max_pairs, min_relevance
+            )
+
+    def expand_query(self, query: str, depth: int = 1, min_relevance: float = 0.3,
+                     level_limits: Optional[Sequence[Optional[int]]] = None,
+                     compact: bool = False, verbose: bool = True,
+                     max_interactions: Optional[int] = None) -> QuestionTree:
         """
         Основной метод: расширение запроса в вопросник
 
         Args:
             query: Исходный запрос
-            depth: Глубина декомпозиции (1-3)
+            depth: Глубина декомпозиции (1-4)
             min_relevance: Минимальная релевантность архетипа
+            level_limits: Максимум вопросов на каждом уровне
+            compact: Хранить вопросы в CompactQuestions (для depth 3-4)
+            verbose: Печатать ход расширения (False - тихий режим)
+            max_interactions: Максимум вопросов о взаимодействиях пар
+                              архетипов (None - 20 при depth >= 2, иначе 0)
 
         Returns:
-            QuestionTree с вопросами
+            QuestionTree с вопросами (в иерархическом порядке)
         """
-        print(f"🔍 Расширение запроса: '{query}'")
-        print(f"   Глубина: {depth}, Мин. релевантность: {min_relevance}\n")
+        log = print if verbose else _silent
+
+        log(f"🔍 Расширение запроса: '{query}'")
+        log(f"   Глубина: {depth}, Мин. релевантность: {min_relevance}\n")
 
         # Парсинг темы
         topic_data = self.parse_topic(query)
-        print(f"📊 Домен: {topic_data['domain']}")
-        print(f"🌐 Язык: {topic_data['language']}\n")
-
-        # Оценка релевантности архетипов
-        archetype_scores = []
-        for arch in ARCHETYPES:
-            score = self.calculate_archetype_relevance(arch, topic_data)
-            archetype_scores.append((arch, score))
+        log(f"📊 Домен: {topic_data['domain']}")
+        log(f"🌐 Язык: {topic_data['language']}\n")
 
-        # Сортировка по релевантности
-        archetype_scores.sort(key=lambda x: x[1], reverse=True)
+        # Оценка релевантности архетипов (по убыванию)
+        archetype_scores = self.rank_archetypes(topic_data)
 
-        print("📈 Релевантность архетипов:")
-        for arch, score in archetype_scores:
-            if score >= min_relevance:
-                stars = "★" * int(score * 5)
-                print(f"   {arch.code} ({arch.name_ru}): {score:.2f} {stars}")
+        if verbose:
+            print("📈 Релевантность архетипов:")
+            for arch, score in archetype_scores:
+                if score >= min_relevance:
+                    stars = "★" * int(score * 5)
+                    print(f"   {arch.code} ({arch.name_ru}): {score:.2f} {stars}")
 
-        print()
+            print()
 
         # Генерация вопросов
-        all_questions = []
-        for arch, score in archetype_scores:
-            if score >= min_relevance:
-                questions = self.generate_base_questions(query, arch)
-                all_questions.extend(questions)
-                print(f"✅ {arch.code}: сгенерировано {len(questions)} вопросов")
-
-        print(f"\n🎯 Всего сгенерировано вопросов: {len(all_questions)}")
+        relevant = [arch for arch, score in archetype_scores if score >= min_relevance]
+        questions = self.iter_tree(query, relevant, depth, "dfs", level_limits)
+        max_pairs = self._interaction_cap(depth, max_interactions)
+        if max_pairs > 0:
+            interactions = self.generate_interaction_questions(
+                query, archetype_scores, max_pairs, min_relevance
+            )
+            questions = itertools.chain(questions, interactions)
+        if compact:
+            from .compact import CompactQuestions
+            all_questions = CompactQuestions(query, questions)
+        else:
+            all_questions = list(questions)
+
+        if verbose:
+            per_archetype = {}
+            interaction_count = 0
+            for q in all_questions:
+                if q.interaction_type:
+                    interaction_count += 1
+                    continue
+                per_archetype[q.archetype_code] = per_archetype.get(q.archetype_code, 0) + 1
+            for arch in relevant:
+                if arch.code in per_archetype:
+                    print(f"✅ {arch.code}: сгенерировано {per_archetype[arch.code]} вопросов")
+            if interaction_count:
+                print(f"🔗 Взаимодействия: сгенерировано {interaction_count} вопросов")
+
+            print(f"\n🎯 Всего сгенерировано вопросов: {len(all_questions)}")
 
         # Создание дерева вопросов
         tree = QuestionTree(
@@ -347,12 +594,108 @@ class QueryExpander:
                 'depth': depth,
                 'domain': topic_data['domain'],
                 'language': topic_data['language'],
-                'archetypes_used': len([s for _, s in archetype_scores if s >= min_relevance])
+                'archetypes_used': len(relevant)
             }
         )
 
         return tree
 
+    def expand_many(self, queries: Iterable[str], depth: int = 1, min_relevance: float = 0.3,
+                    level_limits: Optional[Sequence[Optional[int]]] = None,
+                    compact: bool = False, workers: Optional[int] = None,
+                    chunksize: int = 16, stream: bool = False,
+                    max_interactions: Optional[int] = None):
+        """
+        Пакетное расширение многих запросов в пуле процессов
+
+        Args:
+            queries: Запросы
+            depth, min_relevance, level_limits, compact,
+            max_interactions: см. expand_query
+            workers: Число процессов (None - по числу ядер, 1 - без пула)
+            chunksize: Запросов на одну передачу в процесс
+            stream: Вернуть итератор вместо списка
+
+        Returns:
+            Список QuestionTree (или итератор) в порядке запросов
+
+        Каждый процесс создаёт свой QueryExpander (с тем же scorer) и
+        расширяет в тихом режиме.
+        """
+        options = {
+            'depth': depth,
+            'min_relevance': min_relevance,
+            'level_limits': level_limits,
+            'compact': compact,
+            'verbose': False,
+            'max_interactions': max_interactions
+        }
+        trees = self._expand_many(queries, options, workers, chunksize)
+        return trees if stream else list(trees)
+
+    def _expand_many(self, queries: Iterable[str], options: Dict,
+                     workers: Optional[int], chunksize: int) -> Iterator[QuestionTree]:
+        if workers == 1:
+            for query in queries:
+                yield self.expand_query(query, **options)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.scorer, options)
+        ) as executor:
+            for trees in bounded_map(executor, _expand_batch_in_worker, queries,
+                                     chunksize, 2 * (workers or os.cpu_count() or 1)):
+                yield from trees
+
+
+def bounded_map(executor: Executor, func: Callable[[List], object], items: Iterable,
+                chunksize: int, max_pending: int) -> Iterator:
+    """
+    Executor.map с обратным давлением
+
+    Executor.map сразу читает весь вход; здесь вход читается пачками по
+    chunksize, и в работе не больше max_pending пачек. Пока потребитель не
+    забрал результат, новые пачки не отправляются - память ограничена при
+    входе любой длины.
+
+    Args:
+        func: Функция от списка элементов (пачки)
+
+    Yields:
+        func(пачка) в порядке входа
+    """
+    items = iter(items)
+    pending = deque()
+    while True:
+        batch = list(itertools.islice(items, chunksize))
+        if batch:
+            pending.append(executor.submit(func, batch))
+        if pending and (not batch or len(pending) >= max_pending):
+            yield pending.popleft().result()
+        elif not batch:
+            return
+
+
+def _silent(*args, **kwargs):
+    pass
+
+
+# Состояние процесса пула expand_many
+_worker_expander: Optional[QueryExpander] = None
+_worker_options: Dict = {}
+
+
+def _init_worker(scorer, options: Dict):
+    global _worker_expander, _worker_options
+    _worker_expander = QueryExpander(scorer=scorer)
+    _worker_options = options
+
+
+def _expand_batch_in_worker(queries: List[str]) -> List[QuestionTree]:
+    return [_worker_expander.expand_query(query, **_worker_options) for query in queries]
+
 
 if __name__ == "__main__":
     # Тестирование
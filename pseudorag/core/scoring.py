@@ -0,0 +1,139 @@
+"""
+Векторизованная оценка релевантности архетипов
+Приоритеты и бонусы доменов собраны в таблицы NumPy, ключевые слова
+находит автомат KEYWORD_MATCHER; релевантность N запросов x 16 архетипов
+считается за один проход
+"""
+
+import re
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .archetypes import ARCHETYPES, Archetype, archetype_bits
+from .domains import DOMAIN_BONUS, DOMAINS, DEFAULT_DOMAIN
+from .matcher import analyze_keywords
+
+
+KEYWORD_WEIGHT = 0.1
+AXIS_CODES = 16  # 4 оси -> 4-битный код архетипа
+
+
+class ArchetypeScorer:
+    """
+    Предкомпилированная модель релевантности
+
+    Даёт те же оценки, что QueryExpander.calculate_archetype_relevance:
+    приоритет / 5 + 0.1 за каждое ключевое слово в запросе + бонус домена,
+    не больше 1.0. Таблицы (приоритеты, ключевые слова, бонусы доменов)
+    индексируются 4-битным кодом архетипа по осям (archetype_bits), оценки
+    считаются по всем 16 кодам и собираются в столбцы по bits. Столбцы
+    результата - архетипы в порядке archetypes.
+    """
+
+    def __init__(self, archetypes: Sequence[Archetype] = ARCHETYPES):
+        self.archetypes = list(archetypes)
+        self.bits = np.array([archetype_bits(a) for a in self.archetypes], dtype=np.intp)
+        self.priorities = np.array([a.default_priority for a in self.archetypes], dtype=np.float64)
+
+        # Базовая оценка по коду (коды вне archetypes не попадают в результат)
+        self.base = np.zeros(AXIS_CODES, dtype=np.float64)
+        self.base[self.bits] = self.priorities / 5.0
+
+        self.column = {a.code: int(bits) for a, bits in zip(self.archetypes, self.bits)}
+
+        # Бонусы доменов (домен x код архетипа)
+        self.domain_index = {domain: i for i, domain in enumerate(DOMAINS)}
+        self.domain_bonus = np.zeros((len(DOMAINS), AXIS_CODES), dtype=np.float64)
+        for domain, bonuses in DOMAIN_BONUS.items():
+            for archetype, bits in zip(self.archetypes, self.bits):
+                self.domain_bonus[self.domain_index[domain], bits] = bonuses.get(archetype.code, 0)
+
+    def _keyword_matrix(self, keyword_hits: Sequence[Dict], languages: Sequence[str]) -> np.ndarray:
+        """(N, 16) число совпавших ключевых слов языка запроса по коду архетипа"""
+        matches = np.zeros((len(keyword_hits), AXIS_CODES), dtype=np.float64)
+        for row, (hits, language) in enumerate(zip(keyword_hits, languages)):
+            language = 'ru' if language == 'ru' else 'en'
+            for (code, hit_language), count in hits.items():
+                if hit_language == language and code in self.column:
+                    matches[row, self.column[code]] = count
+        return matches
+
+    def _score(self, matches: np.ndarray, domains: np.ndarray) -> np.ndarray:
+        scores = self.base + matches * KEYWORD_WEIGHT + self.domain_bonus[domains]
+        return np.minimum(scores[:, self.bits], 1.0)
+
+    def score_topics(self, topics: Sequence[Dict]) -> np.ndarray:
+        """
+        Релевантность для результатов QueryExpander.parse_topic
+
+        Returns:
+            (N, len(archetypes)) матрица оценок
+        """
+        hits = [
+            t['keyword_hits'] if 'keyword_hits' in t else analyze_keywords(t['query'])['keyword_hits']
+            for t in topics
+        ]
+        matches = self._keyword_matrix(hits, [t['language'] for t in topics])
+        domains = np.array([self.domain_index[t['domain']] for t in topics], dtype=np.intp)
+        return self._score(matches, domains)
+
+    def score_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """
+        Релевантность для сырых запросов (домен и язык определяются здесь)
+
+        Returns:
+            (N, len(archetypes)) матрица оценок
+        """
+        analyses = [analyze_keywords(q) for q in queries]
+        languages = ['ru' if re.search(r'[а-яёА-ЯЁ]', q) else 'en' for q in queries]
+        matches = self._keyword_matrix([a['keyword_hits'] for a in analyses], languages)
+        domains = np.array([
+            self.domain_index[a['domain'] or DEFAULT_DOMAIN] for a in analyses
+        ], dtype=np.intp)
+        return self._score(matches, domains)
+
+    def rank(self, topic_data: Dict) -> List[Tuple[Archetype, float]]:
+        """Замена QueryExpander.rank_archetypes: архетипы по убыванию оценки"""
+        scores = self.score_topics([topic_data])[0]
+        ranked = [(arch, float(score)) for arch, score in zip(self.archetypes, scores)]
+        ranked.sort(key=lambda x: x[1], reverse=True)
+        return ranked
+
+
+if __name__ == "__main__":
+    # Сравнение с циклом calculate_archetype_relevance (подстроки, как раньше)
+    from .query_expander import QueryExpander
+
+    expander = QueryExpander()
+    scorer = ArchetypeScorer()
+
+    topics = ["Города Европы", "Транспортные системы", "Животные Африки",
+              "Культура Японии", "Renewable energy", "Machine learning models"]
+    words = [kw for arch in ARCHETYPES for kw in arch.keywords_ru + arch.keywords_en]
+    queries = [
+        f"{topics[i % len(topics)]} {words[i % len(words)]} {words[(i * 7) % len(words)]}"
+        for i in range(5000)
+    ]
+
+    start = time.perf_counter()
+    parsed = []
+    for q in queries:
+        topic = expander.parse_topic(q)
+        del topic['keyword_hits']
+        parsed.append(topic)
+    loop_scores = np.array([
+        [expander.calculate_archetype_relevance(arch, t) for arch in ARCHETYPES]
+        for t in parsed
+    ])
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector_scores = scorer.score_queries(queries)
+    vector_time = time.perf_counter() - start
+
+    print(f"Запросов: {len(queries)}")
+    print(f"Цикл:        {loop_time * 1000:.1f} мс")
+    print(f"Векторно:    {vector_time * 1000:.1f} мс (x{loop_time / vector_time:.1f})")
+    print(f"Совпадение:  {np.array_equal(loop_scores, vector_scores)}")
@@ -11,9 +11,14 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from pseudorag.core.query_expander import QueryExpander
+from pseudorag.core.cache import ExpansionCache
 from pseudorag.core.archetypes import ARCHETYPES
 
 
+# Повторные расширения (в т.ч. между запусками) берутся из кэша
+cache = ExpansionCache(QueryExpander())
+
+
 def print_header(text: str):
     """Красивый заголовок"""
     print("\n" + "="*70)
@@ -58,8 +63,6 @@ def demo_query_expansion():
     """Демонстрация расширения запросов"""
     print_header("ДЕМОНСТРАЦИЯ РАСШИРЕНИЯ ЗАПРОСОВ")
 
-    expander = QueryExpander()
-
     test_queries = [
         ("Города Европы", 0.4),
         ("Транспортные системы", 0.35),
@@ -73,7 +76,7 @@ def demo_query_expansion():
         print(f"ЗАПРОС: '{query}'")
         print(f"{'─'*70}\n")
 
-        tree = expander.expand_query(query, depth=1, min_relevance=min_rel)
+        tree = cache.expand_query(query, depth=1, min_relevance=min_rel)
 
         # Сохранение результатов
         safe_name = query.lower().replace(" ", "_")
@@ -114,8 +117,7 @@ def demo_questionnaire_structure():
     """Демонстрация структуры вопросника"""
     print_header("СТРУКТУРА ВОПРОСНИКА")
 
-    expander = QueryExpander()
-    tree = expander.expand_query("Города Европы", depth=1, min_relevance=0.4)
+    tree = cache.expand_query("Города Европы", depth=1, min_relevance=0.4)
 
     # Группировка по архетипам
     by_archetype = {}
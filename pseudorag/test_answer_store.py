@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Тест хранилища ответов: пометка устаревших ответов по источникам и
+фрагментам, выборка ответов с доказательствами
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.answer_store import AnswerStore, FRESH, STALE
+from pseudorag.core.query_expander import Question
+
+
+def make_store() -> AnswerStore:
+    store = AnswerStore(":memory:")
+    questions = [
+        Question(id=f"MSCO.{i}", text=f"Вопрос {i}", archetype_code="MSCO",
+                 priority=5, keywords=[], expected_answer_type="text")
+        for i in range(1, 5)
+    ]
+    store.add_topic("Тема", questions)
+    # MSCO.1 и MSCO.2 - на фрагментах a.md, MSCO.3 - на b.md, MSCO.4 - без доказательств
+    store.put_answer("Тема", "MSCO.1", "Ответ 1", [("a.md#1", "a.md"), ("b.md#1", "b.md")],
+                     {"a.md": "v1", "b.md": "v1"})
+    store.put_answer("Тема", "MSCO.2", "Ответ 2", [("a.md#2", "a.md")], {"a.md": "v1"})
+    store.put_answer("Тема", "MSCO.3", "Ответ 3", [("b.md#1", "b.md")], {"b.md": "v1"})
+    store.put_answer("Тема", "MSCO.4", "Ответ 4")
+    return store
+
+
+def statuses(store: AnswerStore):
+    return {a['question_id']: a['status'] for a in store.answers("Тема")}
+
+
+def test_source_level_staleness():
+    store = make_store()
+    assert store.update_sources({"a.md": "v2", "b.md": "v1"}) == 2
+    assert statuses(store) == {"MSCO.1": STALE, "MSCO.2": STALE, "MSCO.3": FRESH, "MSCO.4": FRESH}
+    assert [q.id for q in store.pending_questions("Тема")] == ["MSCO.1", "MSCO.2"]
+
+
+def test_chunk_level_staleness():
+    store = make_store()
+    # В a.md изменился только фрагмент #2
+    marked = store.update_sources({"a.md": "v2"}, current_chunks={"a.md": ["a.md#1", "a.md#3"]})
+    assert marked == 1
+    assert statuses(store) == {"MSCO.1": FRESH, "MSCO.2": STALE, "MSCO.3": FRESH, "MSCO.4": FRESH}
+
+
+def test_chunk_level_staleness_many_chunks():
+    store = make_store()
+    # Больше фрагментов, чем переменных в одном запросе SQLite
+    kept = ["a.md#1"] + [f"a.md#{i}" for i in range(100, 50000)]
+    assert store.update_sources({"a.md": "v2"}, current_chunks={"a.md": kept}) == 1
+    assert statuses(store)["MSCO.2"] == STALE
+
+
+def test_unchanged_sources_keep_answers():
+    store = make_store()
+    assert store.update_sources({"a.md": "v1", "b.md": "v1"}) == 0
+    assert set(statuses(store).values()) == {FRESH}
+
+
+def test_answers_with_evidence():
+    store = make_store()
+    answers = {a['question_id']: a for a in store.answers("Тема")}
+    assert answers["MSCO.1"]['evidence'] == ["a.md#1", "b.md#1"]
+    assert answers["MSCO.4"]['evidence'] == []
+    assert [a['question_id'] for a in store.answers("Тема", status=FRESH)] == [
+        "MSCO.1", "MSCO.2", "MSCO.3", "MSCO.4"
+    ]
+
+
+if __name__ == "__main__":
+    test_source_level_staleness()
+    test_chunk_level_staleness()
+    test_chunk_level_staleness_many_chunks()
+    test_unchanged_sources_keep_answers()
+    test_answers_with_evidence()
+    print("✨ Хранилище ответов работает")
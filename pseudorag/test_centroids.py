@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Тест оценки по центроидам: абсолютная шкала косинуса, рейтинг без
+равенств, кэш центроидов привязан к модели и размерности
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.centroids import (
+    CentroidScorer, HASHED_MODEL, create_centroid_scorer, hashed_ngram_embed
+)
+
+
+TOPICS = ["Города Европы", "Животные Африки", "Программное обеспечение", "Renewable energy"]
+
+
+def test_rank_follows_similarity():
+    scorer = CentroidScorer(cache_dir=None)
+    similarities = scorer.similarities(TOPICS)
+    scores = scorer.score_queries(TOPICS)
+
+    low, high = scorer.calibration
+    assert [scorer.rank({'query': t})[0][0].code for t in TOPICS[1:3]] == ["MDEF", "ADCO"]
+    # Внутри калибровки приоритет переставляет только почти равные сходства
+    for sim, score in zip(similarities, scores):
+        inside = (sim > low) & (sim < high)
+        pair = inside[:, None] & inside[None, :]
+        inverted = pair & (sim[:, None] - sim[None, :] > 0) & (score[:, None] - score[None, :] < 0)
+        assert (np.abs(sim[:, None] - sim[None, :])[inverted] < 0.01 * (high - low)).all()
+    assert ((scores >= 0) & (scores <= 1)).all()
+    for sim, score in zip(similarities, scores):
+        inside = score[(sim > low) & (sim < high)]
+        assert len(set(np.round(inside, 6))) == len(inside)
+
+
+def test_threshold_filters():
+    # Шкала абсолютная: бессмысленный запрос не проходит порог, тема - частично
+    scorer = CentroidScorer(cache_dir=None)
+    noise, topic = scorer.score_queries(["qwerty zzz", "Животные Африки"])
+    assert (noise < 0.3).all()
+    assert 0 < (topic >= 0.3).sum() < len(topic)
+
+
+def test_unknown_embeddings():
+    with pytest.raises(ValueError):
+        create_centroid_scorer("word2vec")
+    with pytest.raises(ValueError):
+        CentroidScorer(cache_dir=None, calibration=(0.5, 0.5))
+
+
+def test_embed_requires_model_name(tmp_path):
+    with pytest.raises(ValueError):
+        CentroidScorer(embed=hashed_ngram_embed, cache_dir=tmp_path)
+
+
+def test_cache_with_other_dimension_is_rebuilt(tmp_path):
+    CentroidScorer(cache_dir=tmp_path)
+    small = CentroidScorer(embed=lambda texts: hashed_ngram_embed(texts, 256),
+                           model_name=HASHED_MODEL, cache_dir=tmp_path)
+    assert small.centroids.shape[1] == 256
+    assert small.score_queries(TOPICS).shape == (len(TOPICS), len(small.archetypes))
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_rank_follows_similarity()
+    test_threshold_filters()
+    test_unknown_embeddings()
+    test_embed_requires_model_name(Path(tempfile.mkdtemp()))
+    test_cache_with_other_dimension_is_rebuilt(Path(tempfile.mkdtemp()))
+    print("✨ Центроиды работают")
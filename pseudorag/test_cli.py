@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Тест входа потокового CLI: параметры записей приводятся к типам, ошибочные
+строки пропускаются с сообщением
+"""
+
+import io
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.cli import read_topics, run
+
+
+LINES = [
+    '{"topic": "Города Европы", "depth": "2", "min_relevance": "0.5"}',
+    '{"topic": "Животные Африки", "depth": "abc"}',
+    '{"topic": "Культура Японии", "max_interactions": 2.5}',
+    '{"topic": "Языки мира", "depth": true}',
+    '',
+    'Транспортные системы',
+]
+
+
+def test_record_options_are_coerced():
+    errors = io.StringIO()
+    records = list(read_topics(LINES, errors))
+    assert records == [("Города Европы", {'depth': 2, 'min_relevance': 0.5}),
+                       ("Транспортные системы", {})]
+    assert [line.split(":")[0] for line in errors.getvalue().splitlines()] == [
+        "⚠️  Строка 2", "⚠️  Строка 3", "⚠️  Строка 4"
+    ]
+
+
+def test_bad_lines_do_not_stop_the_pool():
+    output = io.StringIO()
+    stats = run(read_topics(LINES, io.StringIO()), output, {'depth': 1}, workers=2, chunksize=1)
+    assert stats['topics'] == 2
+    assert stats['questions'] == len(output.getvalue().splitlines()) > 0
+
+
+if __name__ == "__main__":
+    test_record_options_are_coerced()
+    test_bad_lines_do_not_stop_the_pool()
+    print("✨ Вход CLI проверяется")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Тест компактного хранения: CompactQuestions возвращает те же вопросы,
+что обычное дерево
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.compact import CompactQuestions
+from pseudorag.core.dedup import QuestionPruner
+from pseudorag.core.query_expander import QueryExpander, question_to_dict
+
+
+TOPIC = "Города Европы"
+
+
+def as_dicts(questions):
+    return [question_to_dict(q) for q in questions]
+
+
+def test_compact_tree_matches_full_tree():
+    expander = QueryExpander()
+    full = expander.expand_query(TOPIC, depth=3, verbose=False)
+    compact = expander.expand_query(TOPIC, depth=3, compact=True, verbose=False)
+
+    assert isinstance(compact.questions, CompactQuestions)
+    assert as_dicts(compact.questions) == as_dicts(full.questions)
+    assert [q.to_question() for q in compact.questions] == full.questions
+
+
+def test_questions_off_templates_round_trip():
+    # После удаления дублей ID и тексты перенесённых вопросов не по шаблонам
+    tree = QueryExpander().expand_query(TOPIC, depth=2, verbose=False)
+    pruned, _ = QuestionPruner(threshold=0.4).prune(tree)
+    compact = CompactQuestions(TOPIC, pruned.questions)
+    assert as_dicts(compact) == as_dicts(pruned.questions)
+
+
+if __name__ == "__main__":
+    test_compact_tree_matches_full_tree()
+    test_questions_off_templates_round_trip()
+    print("✨ Компактное дерево совпадает с обычным")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Тест удаления дублей: какие вопросы сливаются и согласованность ID,
+родителей и текстов после переноса подвопросов
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.dedup import QuestionPruner
+from pseudorag.core.query_expander import Question, QueryExpander
+
+
+def question(id: str, text: str, archetype: str, parent: Question = None, aspect: str = "") -> Question:
+    return Question(
+        id=id, text=parent.text + aspect if parent else text, archetype_code=archetype,
+        priority=3, keywords=[], expected_answer_type="text",
+        parent_id=parent.id if parent else None, depth=parent.depth + 1 if parent else 1
+    )
+
+
+def test_merges_duplicates_of_one_archetype():
+    tree = QueryExpander().expand_query("Города Европы", depth=1, verbose=False)
+    _, report = QuestionPruner().prune(tree)
+    text = {q.id: q.text for q in tree.questions}
+    merged = {(text[keeper], text[d]) for keeper, removed in report.merged.items() for d in removed}
+
+    assert ("Какие традиции связаны с Города Европы?", "Какие традиции и обычаи существуют?") in merged
+    # Общий корень, но разный предмет вопроса; разные архетипы не сливаются
+    assert all("транспорт" not in a.lower() for a, _ in merged)
+    assert all("особенности" not in a for a, _ in merged)
+
+
+def test_moved_questions_are_renumbered():
+    a = question("ASCF.1", "Какие традиции связаны с Города Европы?", "ASCF")
+    b = question("ASCF.2", "Какие традиции и обычаи существуют?", "ASCF")
+    a1 = question("ASCF.1.1", "", "MSCO", a, " — сооружения")
+    b1 = question("ASCF.2.1", "", "MSCO", b, " — сооружения")
+    b2 = question("ASCF.2.2", "", "MDEF", b, " — участники")
+    b21 = question("ASCF.2.2.1", "", "MSCO", b2, " — сооружения")
+    # На двух вопросах IDF мал, поэтому порог ниже обычного
+    kept, report = QuestionPruner(threshold=0.1).prune_questions([a, b, a1, b1, b2, b21], "Города Европы")
+
+    assert report.merged == {"ASCF.1": ["ASCF.2"], "ASCF.1.1": ["ASCF.2.1"]}
+    assert [(q.id, q.parent_id, q.text) for q in kept] == [
+        ("ASCF.1", None, a.text),
+        ("ASCF.1.1", "ASCF.1", a1.text),
+        ("ASCF.1.2", "ASCF.1", a.text + " — участники"),
+        ("ASCF.1.2.1", "ASCF.1.2", a.text + " — участники — сооружения"),
+    ]
+
+
+def test_tree_stays_consistent():
+    tree = QueryExpander().expand_query("Транспортные системы", depth=3, verbose=False)
+    pruned, report = QuestionPruner().prune(tree)
+    assert report.removed > 0
+
+    by_id = {q.id: q for q in pruned.questions}
+    assert len(by_id) == len(pruned.questions)
+    for q in pruned.questions:
+        if q.depth > 1 and not q.interaction_type:
+            parent = by_id[q.parent_id]
+            assert q.id.rsplit(".", 1)[0] == parent.id
+            assert q.text.startswith(parent.text)
+            assert q.depth == parent.depth + 1
+
+
+if __name__ == "__main__":
+    test_merges_duplicates_of_one_archetype()
+    test_moved_questions_are_renumbered()
+    test_tree_stays_consistent()
+    print("✨ Дубли удаляются, дерево согласовано")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Тест потокового экспорта: NDJSON (без сжатия и gzip) читается обратно
+в те же вопросы
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.export import read_ndjson
+from pseudorag.core.query_expander import QueryExpander, question_to_dict
+
+
+TOPIC = "Города Европы"
+
+
+def as_dicts(questions):
+    return [question_to_dict(q) for q in questions]
+
+
+def test_ndjson_round_trip(tmp_path):
+    tree = QueryExpander().expand_query(TOPIC, depth=2, compact=True, verbose=False)
+    for name in ("tree.ndjson", "tree.ndjson.gz"):
+        path = tmp_path / name
+        assert tree.to_ndjson(str(path)) == len(tree.questions)
+        header, questions = read_ndjson(str(path))
+        assert header['topic'] == TOPIC
+        assert as_dicts(questions) == as_dicts(tree.questions)
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_ndjson_round_trip(Path(tempfile.mkdtemp()))
+    print("✨ NDJSON читается обратно без потерь")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Тест вопросов о взаимодействиях: упорядоченные пары несимметричной
+матрицы типов и формат вопросов о парах
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.archetypes import ARCHETYPES
+from pseudorag.core.interactions import (
+    INTERACTION_TYPE, INTERACTION_TYPES, UNDIRECTED_TYPES, top_interactions
+)
+from pseudorag.core.query_expander import QueryExpander
+
+
+def test_ordered_pairs():
+    pairs = top_interactions([1.0] * len(ARCHETYPES), 256)
+    index = {arch.code: i for i, arch in enumerate(ARCHETYPES)}
+    found = {(p.source.code, p.target.code): p.type for p in pairs}
+
+    assert all(source != target for source, target in found)
+    for (source, target), kind in found.items():
+        assert kind == INTERACTION_TYPES[INTERACTION_TYPE[index[source], index[target]]]
+        reverse = found.get((target, source))
+        # Обратная пара остаётся, если вопрос о ней другой
+        if reverse is not None:
+            assert kind != reverse or kind not in UNDIRECTED_TYPES
+
+    # Обе стороны каждой несимметричной ячейки
+    for i in range(len(ARCHETYPES)):
+        for j in range(len(ARCHETYPES)):
+            if INTERACTION_TYPE[i, j] != INTERACTION_TYPE[j, i]:
+                assert (ARCHETYPES[i].code, ARCHETYPES[j].code) in found
+
+
+def test_interaction_questions():
+    tree = QueryExpander().expand_query("Города Европы", depth=2, verbose=False)
+    interactions = [q for q in tree.questions if q.interaction_type]
+    assert interactions
+    for q in interactions:
+        assert q.id.isascii()
+        assert q.id == f"{q.archetype_code}-{q.related_archetype}"
+        assert q.depth == 1 and q.parent_id is None
+    assert len({q.id for q in tree.questions}) == len(tree.questions)
+
+
+if __name__ == "__main__":
+    test_ordered_pairs()
+    test_interaction_questions()
+    print("✨ Пары упорядочены, ID вопросов о парах в ASCII")
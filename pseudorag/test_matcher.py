@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Тест автомата ключевых слов: те же совпадения, что проверка
+`keyword in text`, и все вхождения с позициями
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.matcher import KEYWORD_MATCHER, KeywordMatcher, Owner
+
+
+ROOT = Path(__file__).parent.parent
+
+
+def sample_texts(count: int = 300):
+    """Куски документации и склейки ключевых слов со словоформами"""
+    texts = []
+    for path in sorted((ROOT / "docs").glob("*.md"))[:10]:
+        text = path.read_text(encoding='utf-8')
+        texts += [text[i:i + 400] for i in range(0, len(text), 1500)]
+    rng = random.Random(0)
+    patterns = KEYWORD_MATCHER.patterns
+    for _ in range(count):
+        words = rng.sample(patterns, 3)
+        texts.append(f"{words[0].upper()}ский {words[1]}ами и{words[2]}")
+    return texts
+
+
+def test_matches_substring_check():
+    for text in sample_texts():
+        expected = {pid for pid, pattern in enumerate(KEYWORD_MATCHER.patterns) if pattern in text.lower()}
+        assert KEYWORD_MATCHER.matched_patterns(text) == expected
+
+
+def test_overlapping_occurrences():
+    matcher = KeywordMatcher([(p, Owner("archetype", "MSCO", "ru")) for p in ["ab", "bab", "b", "abc"]])
+    text = "xBabcab"
+    expected = sorted(
+        (i + len(p), i, p) for p in matcher.patterns
+        for i in range(len(text)) if text.lower().startswith(p, i)
+    )
+    actual = sorted((m.end, m.start, m.pattern) for m in matcher.find_all(text))
+    assert actual == expected
+    assert matcher.count_owners(text)[Owner("archetype", "MSCO", "ru")] == len(expected)
+
+
+if __name__ == "__main__":
+    test_matches_substring_check()
+    test_overlapping_occurrences()
+    print("✨ Автомат совпадает с поиском подстрок")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Тест векторизованной оценки: ArchetypeScorer даёт те же оценки, что цикл
+calculate_archetype_relevance с поиском подстрок
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pseudorag.core.archetypes import ARCHETYPES, ARCHETYPES_BY_BITS
+from pseudorag.core.query_expander import QueryExpander
+from pseudorag.core.scoring import ArchetypeScorer
+
+
+TOPICS = ["Города Европы", "Транспортные системы", "Животные Африки",
+          "Культура Японии", "Renewable energy", "Machine learning models"]
+
+
+def make_queries(count: int):
+    words = [kw for arch in ARCHETYPES for kw in arch.keywords_ru + arch.keywords_en]
+    return TOPICS + [
+        f"{TOPICS[i % len(TOPICS)]} {words[i % len(words)]} {words[(i * 7) % len(words)]}"
+        for i in range(count)
+    ]
+
+
+def test_scorer_matches_loop():
+    expander = QueryExpander()
+    queries = make_queries(2000)
+
+    loop_scores = []
+    for query in queries:
+        topic = expander.parse_topic(query)
+        del topic['keyword_hits']  # старый путь: подстроки ключевых слов
+        loop_scores.append([expander.calculate_archetype_relevance(arch, topic) for arch in ARCHETYPES])
+
+    vector_scores = ArchetypeScorer().score_queries(queries)
+    assert np.array_equal(np.array(loop_scores), vector_scores)
+
+
+def test_rank_matches_loop():
+    loop = QueryExpander()
+    vector = QueryExpander(scorer='vector')
+    for query in TOPICS:
+        topic = loop.parse_topic(query)
+        expected = [(arch.code, score) for arch, score in loop.rank_archetypes(topic)]
+        actual = [(arch.code, score) for arch, score in vector.rank_archetypes(topic)]
+        assert actual == expected
+
+
+def test_archetype_order():
+    # Таблицы по 4-битным кодам: порядок архетипов меняет только столбцы
+    queries = make_queries(200)
+    scores = ArchetypeScorer().score_queries(queries)
+    by_bits = ArchetypeScorer(ARCHETYPES_BY_BITS).score_queries(queries)
+    order = [ARCHETYPES.index(arch) for arch in ARCHETYPES_BY_BITS]
+    assert np.array_equal(by_bits, scores[:, order])
+
+    subset = ArchetypeScorer(ARCHETYPES[:3]).score_queries(queries)
+    assert np.array_equal(subset, scores[:, :3])
+
+
+if __name__ == "__main__":
+    test_scorer_matches_loop()
+    test_rank_matches_loop()
+    test_archetype_order()
+    print("✨ Оценки совпадают")
@@ -8,6 +8,8 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 import streamlit as st
 from rag.scripts.query_engine import MBTIQueryEngine
+from rag.scripts.chunk_store import doc_snippet
+from rag.config import QUICK_QUERIES
 
 # Page config
 st.set_page_config(
@@ -82,18 +84,7 @@ with st.sidebar:
 
     # Quick queries
     st.header("🚀 Быстрые запросы")
-    quick_queries = [
-        "Что такое INTJ?",
-        "Какие когнитивные функции у ENFP?",
-        "Совместимость INTJ и ENFP",
-        "Что такое соционика?",
-        "Подтипы А и Т",
-        "Теневые функции",
-        "Стили лидерства",
-        "Романтические отношения типов"
-    ]
-
-    for query in quick_queries:
+    for query in QUICK_QUERIES:
         if st.button(query, key=f"quick_{query}", use_container_width=True):
             st.session_state.current_query = query
 
@@ -193,7 +184,7 @@ with tabs[1]:
                     st.markdown(f"**[{j}] {doc.metadata.get('filename', 'Unknown')}**")
                     if doc.metadata.get('title'):
                         st.caption(f"Раздел: {doc.metadata['title']}")
-                    st.text(doc.page_content[:300] + "...")
+                    st.text(doc_snippet(doc, 300))
                     st.markdown("")
 
 # Tab 3: Documents
@@ -9,6 +9,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from rag.scripts.query_engine import MBTIQueryEngine
+from rag.scripts.chunk_store import doc_snippet
 
 
 def main():
@@ -72,7 +73,7 @@ def main():
                 print(f"\n[{i}] {metadata.get('filename', 'Unknown')}")
                 if metadata.get('title'):
                     print(f"    Раздел: {metadata['title']}")
-                print(f"    Фрагмент: {doc.page_content[:200]}...")
+                print(f"    Фрагмент: {doc_snippet(doc, 200)}")
                 print()
 
         return
@@ -111,7 +112,7 @@ def main():
                 for i, doc in enumerate(docs, 1):
                     metadata = doc.metadata
                     print(f"[{i}] {metadata.get('filename', 'Unknown')}")
-                    print(f"    {doc.page_content[:150]}...\n")
+                    print(f"    {doc_snippet(doc, 150)}\n")
 
             print()
 
@@ -30,8 +30,30 @@ EMBEDDING_MODEL = os.getenv(
 )
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
 
+# Embedding backend: "huggingface" (PyTorch), "onnx" (ONNX Runtime)
+# or "hashed" (model-free character n-gram TF-IDF + SVD)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "huggingface")
+ONNX_MODEL_DIR = DATA_DIR / "onnx_model"
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "false").lower() in ("1", "true", "yes")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = runtime default
+HASHED_MODEL_PATH = DATA_DIR / "hashed_embeddings.npz"
+HASHED_FEATURES = int(os.getenv("HASHED_FEATURES", str(2 ** 15)))
+HASHED_DIM = int(os.getenv("HASHED_DIM", "256"))
+
 # ChromaDB Configuration
-COLLECTION_NAME = os.getenv("COLLECTION_NAME", "mbti_docs")
+# Hashed vectors have their own dimension, so they live in their own collection
+COLLECTION_NAME = os.getenv(
+    "COLLECTION_NAME",
+    "mbti_docs_hashed" if EMBEDDING_BACKEND == "hashed" else "mbti_docs"
+)
+
+# Sharded index: "" (one collection), "corpus", "directory" or "hash";
+# SHARD_COUNT is the number of shards for "hash"
+SHARDING = os.getenv("SHARDING", "")
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "4"))
+
+# Portable index snapshot; when set, the query engine maps it instead of Chroma
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "")
 
 # Document Processing
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
@@ -40,12 +62,35 @@ CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
 # Search Configuration
 TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", "5"))
 
+# Minimum archetype score for a chunk to join that archetype's partition
+ARCHETYPE_MIN_SCORE = float(os.getenv("ARCHETYPE_MIN_SCORE", "0.5"))
+
 # Language
 LANGUAGE = os.getenv("LANGUAGE", "russian")
 
 # Supported File Types
 SUPPORTED_EXTENSIONS = [".md", ".txt"]
 
+# Known hot queries (Streamlit sidebar, load testing)
+QUICK_QUERIES = [
+    "Что такое INTJ?",
+    "Какие когнитивные функции у ENFP?",
+    "Совместимость INTJ и ENFP",
+    "Что такое соционика?",
+    "Подтипы А и Т",
+    "Теневые функции",
+    "Стили лидерства",
+    "Романтические отношения типов"
+]
+
+# Warm cache: hot queries whose embeddings and top-k results the indexer
+# precomputes (QUICK_QUERIES plus the query engine's test queries)
+WARM_QUERIES = QUICK_QUERIES + ["Как взаимодействуют INTJ и ENFP?"]
+WARM_CACHE_K = int(os.getenv("WARM_CACHE_K", "10"))
+
+# JSONL log of searched queries for refreshing the warm cache ("" - off)
+QUERY_LOG = os.getenv("QUERY_LOG", "")
+
 # Prompts
 SYSTEM_PROMPT = """Ты - эксперт по типологии личности MBTI и соционике.
 Используй предоставленный контекст из документации для ответа на вопросы пользователя.
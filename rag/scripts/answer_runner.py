@@ -0,0 +1,438 @@
+"""
+Answer Runner for MBTI RAG System
+Answers a PseudoRAG questionnaire through MBTIQueryEngine.ask() in priority
+order under concurrency, token and time budgets, with a checkpoint file
+that lets an interrupted run resume where it stopped
+"""
+import sys
+import json
+import time
+import heapq
+import argparse
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Optional, Iterable
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_community.callbacks import get_openai_callback
+
+from pseudorag.core.query_expander import QueryExpander
+from pseudorag.core.answer_store import AnswerStore, STALE, file_hash
+from pseudorag.core.dedup import QuestionPruner, DEFAULT_THRESHOLD
+from rag.scripts.questionnaire import load_questions, chunk_key
+
+
+def question_score(question, relevance: Optional[Dict[str, float]] = None) -> float:
+    """
+    Scheduling score: priority (1-5) scaled by archetype relevance
+
+    Interaction questions use the more relevant of their two archetypes.
+    Archetypes missing from relevance count as fully relevant.
+    """
+    relevance = relevance or {}
+    weight = relevance.get(question.archetype_code, 1.0)
+    if question.related_archetype:
+        weight = max(weight, relevance.get(question.related_archetype, 1.0))
+    return question.priority / 5.0 * weight
+
+
+def is_rate_limit(error: Exception) -> bool:
+    """True for provider rate-limit errors (HTTP 429)"""
+    return (type(error).__name__ == 'RateLimitError'
+            or getattr(error, 'status_code', None) == 429)
+
+
+def load_checkpoint(path: Path) -> Dict[str, Dict]:
+    """
+    Read answered questions from a checkpoint file
+
+    A line cut short by a crash is ignored; the question is answered again.
+
+    Returns:
+        Question id -> checkpoint record (last record wins)
+    """
+    records = {}
+    if not path.exists():
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['id']] = record
+    return records
+
+
+class AnswerRunner:
+    """Priority-scheduled, resumable questionnaire answering"""
+
+    def __init__(self, engine, checkpoint_path: Path, workers: int = 4,
+                 token_budget: Optional[int] = None, time_budget: Optional[float] = None,
+                 max_retries: int = 5, backoff: float = 2.0,
+                 store: Optional[AnswerStore] = None, topic: Optional[str] = None,
+                 facts: bool = False):
+        """
+        Initialize answer runner
+
+        Args:
+            engine: MBTIQueryEngine
+            checkpoint_path: JSONL file with one record per answered question
+            workers: Concurrent ask() calls
+            token_budget: Stop scheduling after this many LLM tokens
+            time_budget: Stop scheduling after this many seconds
+            max_retries: Rate-limit pauses per question before the run stops
+            backoff: First rate-limit pause in seconds (doubles each time)
+            store: Also save answers with their evidence to this store
+            topic: Topic of the questions in the store
+            facts: Answer from extracted facts (ask_facts) instead of chunks
+        """
+        self.engine = engine
+        self.checkpoint_path = Path(checkpoint_path)
+        self.workers = max(1, workers)
+        self.token_budget = token_budget
+        self.time_budget = time_budget
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.store = store
+        self.topic = topic
+        self.facts = facts
+        self._source_hashes = {}
+
+    def _ask(self, question) -> Dict:
+        """Answer one question and count its tokens (runs in a worker thread)"""
+        start = time.perf_counter()
+        with get_openai_callback() as callback:
+            if self.facts:
+                result = self.engine.ask_facts(question.text, question.expected_answer_type)
+            else:
+                result = self.engine.ask(question.text)
+        return {
+            'id': question.id,
+            'text': question.text,
+            'archetype_code': question.archetype_code,
+            'priority': question.priority,
+            'status': 'done',
+            'answer': result['answer'],
+            'sources': [
+                {
+                    'chunk': chunk_key(doc),
+                    'source': doc.metadata.get('source', ''),
+                    'filename': doc.metadata.get('filename', 'Unknown'),
+                    'title': doc.metadata.get('title', '')
+                }
+                for doc in result['sources']
+            ],
+            'tokens': callback.total_tokens,
+            'cost_usd': callback.total_cost,
+            'time_s': time.perf_counter() - start
+        }
+
+    def _write(self, f, record: Dict):
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+
+    def _save(self, record: Dict):
+        """Put an answer into the store with the hashes of its sources"""
+        for source in record['sources']:
+            path = source['source']
+            if path and path not in self._source_hashes and Path(path).exists():
+                self._source_hashes[path] = file_hash(path)
+        self.store.put_answer(
+            self.topic, record['id'], record['answer'],
+            evidence=[(s['chunk'], s['source']) for s in record['sources']],
+            source_hashes={
+                s['source']: self._source_hashes[s['source']]
+                for s in record['sources'] if s['source'] in self._source_hashes
+            }
+        )
+
+    def _over_budget(self, tokens: int, started: float) -> Optional[str]:
+        if self.token_budget is not None and tokens >= self.token_budget:
+            return 'token_budget'
+        if self.time_budget is not None and time.perf_counter() - started >= self.time_budget:
+            return 'time_budget'
+        return None
+
+    def run(self, questions: Iterable, relevance: Optional[Dict[str, float]] = None,
+            redo: Iterable[str] = (), verbose: bool = True) -> Dict:
+        """
+        Answer questions best-first, skipping those already in the checkpoint
+
+        Questions that failed with an error are retried on the next run.
+        In-flight questions always finish and are checkpointed, so budgets
+        can be overshot by at most `workers` answers.
+
+        Args:
+            questions: Question or QuestionView objects
+            relevance: Archetype code -> relevance for scheduling
+            redo: Question ids to answer again even if checkpointed
+                  (stale answers from the store)
+            verbose: Print progress
+
+        Returns:
+            Run report
+        """
+        questions = list(questions)
+        redo = set(redo)
+        self._source_hashes = {}
+        done = {
+            qid for qid, record in load_checkpoint(self.checkpoint_path).items()
+            if record['status'] == 'done' and qid not in redo
+        }
+
+        queue = [
+            (-question_score(q, relevance), order, q)
+            for order, q in enumerate(questions) if q.id not in done
+        ]
+        heapq.heapify(queue)
+
+        if verbose:
+            print(f"📋 Вопросов: {len(questions)}, уже отвечено: {len(done & {q.id for q in questions})}, "
+                  f"в очереди: {len(queue)}")
+
+        answered = failed = tokens = 0
+        cost = 0.0
+        retries = {}
+        paused_s = 0.0
+        resume_at = 0.0   # no new submissions until then after a rate limit
+        stop_reason = None
+        started = time.perf_counter()
+
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            running = {}
+            while queue or running:
+                if stop_reason is None:
+                    stop_reason = self._over_budget(tokens, started)
+                now = time.perf_counter()
+                paused = stop_reason is None and queue and now < resume_at
+                while stop_reason is None and queue and len(running) < self.workers and not paused:
+                    item = heapq.heappop(queue)
+                    running[executor.submit(self._ask, item[2])] = item
+
+                if not running:
+                    if paused:
+                        # Nothing in flight to collect - wait out the pause
+                        time.sleep(resume_at - now)
+                        continue
+                    break
+
+                # During a pause in-flight questions are still collected
+                finished, _ = wait(running, timeout=resume_at - now if paused else None,
+                                   return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item = running.pop(future)
+                    question = item[2]
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        if is_rate_limit(e):
+                            attempt = retries.get(question.id, 0)
+                            if attempt >= self.max_retries:
+                                stop_reason = stop_reason or 'rate_limit'
+                                heapq.heappush(queue, item)
+                                continue
+                            retries[question.id] = attempt + 1
+                            pause = self.backoff * 2 ** attempt
+                            if verbose:
+                                print(f"⏸️  Лимит запросов, пауза {pause:.0f} с")
+                            now = time.perf_counter()
+                            if now + pause > resume_at:
+                                paused_s += now + pause - max(resume_at, now)
+                                resume_at = now + pause
+                            heapq.heappush(queue, item)
+                            continue
+
+                        failed += 1
+                        self._write(checkpoint, {
+                            'id': question.id,
+                            'text': question.text,
+                            'status': 'error',
+                            'error': f"{type(e).__name__}: {e}"
+                        })
+                        if verbose:
+                            print(f"❌ {question.id}: {e}")
+                        continue
+
+                    self._write(checkpoint, record)
+                    if self.store is not None:
+                        self._save(record)
+                    answered += 1
+                    tokens += record['tokens']
+                    cost += record['cost_usd']
+                    if verbose:
+                        print(f"✅ [{len(done) + answered}/{len(questions)}] {question.id} "
+                              f"({record['tokens']} токенов, {record['time_s']:.1f} с)")
+
+        elapsed = time.perf_counter() - started
+        completed = len(done & {q.id for q in questions}) + answered
+        remaining = len(questions) - completed
+
+        report = {
+            'run_started': datetime.now().isoformat(timespec='seconds'),
+            'questions': len(questions),
+            'answered_before': completed - answered,
+            'answered': answered,
+            'failed': failed,
+            'remaining': remaining,
+            'completion_rate': completed / len(questions) if questions else 1.0,
+            'stop_reason': stop_reason or ('complete' if remaining == 0 else 'errors'),
+            'elapsed_s': elapsed,
+            'paused_s': paused_s,
+            'throughput_qps': answered / elapsed if elapsed > 0 else 0.0,
+            'tokens': tokens,
+            'token_budget': self.token_budget,
+            'token_budget_used': tokens / self.token_budget if self.token_budget else None,
+            'time_budget': self.time_budget,
+            'time_budget_used': elapsed / self.time_budget if self.time_budget else None,
+            'cost_usd': cost,
+            'workers': self.workers
+        }
+
+        runs_path = self.checkpoint_path.with_suffix('.runs.jsonl')
+        with open(runs_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+        return report
+
+
+def print_report(report: Dict):
+    """Print run report"""
+    print("\n" + "=" * 60)
+    print("📊 ОТЧЁТ О ЗАПУСКЕ")
+    print("=" * 60)
+    print(f"Отвечено: {report['answered']} (ранее: {report['answered_before']}), "
+          f"ошибок: {report['failed']}, осталось: {report['remaining']}")
+    print(f"Завершённость: {report['completion_rate']:.1%}")
+    print(f"Остановка: {report['stop_reason']}")
+    print(f"Время: {report['elapsed_s']:.1f} с (пауз {report['paused_s']:.1f} с), "
+          f"{report['throughput_qps']:.2f} вопр/с")
+    tokens = f"Токены: {report['tokens']}"
+    if report['token_budget']:
+        tokens += f" из {report['token_budget']} ({report['token_budget_used']:.0%})"
+    print(tokens + f", ${report['cost_usd']:.4f}")
+    if report['time_budget']:
+        print(f"Бюджет времени: {report['time_budget_used']:.0%}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ответы на вопросник по приоритету с бюджетами и возобновлением"
+    )
+    parser.add_argument(
+        'topic',
+        nargs='?',
+        help='Тема для расширения через PseudoRAG'
+    )
+    parser.add_argument(
+        '--prune',
+        type=float,
+        nargs='?',
+        const=DEFAULT_THRESHOLD,
+        help=f'Слить почти одинаковые вопросы (порог сходства, по умолчанию: {DEFAULT_THRESHOLD})'
+    )
+    parser.add_argument(
+        '--tree',
+        help='Готовый вопросник (.json или .ndjson[.gz])'
+    )
+    parser.add_argument(
+        '--depth',
+        type=int,
+        default=1,
+        help='Глубина расширения темы (по умолчанию: 1)'
+    )
+    parser.add_argument(
+        '--min-relevance',
+        type=float,
+        default=0.3,
+        help='Минимальная релевантность архетипа (по умолчанию: 0.3)'
+    )
+    parser.add_argument(
+        '-c', '--checkpoint',
+        required=True,
+        help='Файл контрольной точки (JSONL); повторный запуск продолжает с него'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='Параллельных запросов к LLM (по умолчанию: 4)'
+    )
+    parser.add_argument(
+        '--token-budget',
+        type=int,
+        help='Максимум токенов LLM за запуск'
+    )
+    parser.add_argument(
+        '--time-budget',
+        type=float,
+        help='Максимум секунд на запуск'
+    )
+    parser.add_argument(
+        '--no-llm',
+        action='store_true',
+        help='Без LLM, только поиск документов'
+    )
+    parser.add_argument(
+        '--facts',
+        action='store_true',
+        help='Отвечать по извлечённым фактам вместо целых фрагментов'
+    )
+    parser.add_argument(
+        '--store',
+        help='Хранилище ответов SQLite; устаревшие ответы отвечаются заново'
+    )
+
+    args = parser.parse_args()
+
+    expander = QueryExpander()
+    if args.tree:
+        questions = load_questions(Path(args.tree))
+        topic = Path(args.tree).stem
+        relevance = None
+    elif args.topic:
+        tree = expander.expand_query(
+            args.topic, depth=args.depth, min_relevance=args.min_relevance, verbose=False
+        )
+        questions = tree.questions
+        topic = args.topic
+        ranked = expander.rank_archetypes(expander.parse_topic(args.topic))
+        relevance = {arch.code: score for arch, score in ranked}
+    else:
+        parser.error("укажите тему или --tree")
+
+    if args.prune is not None:
+        questions, prune_report = QuestionPruner(args.prune).prune_questions(questions, topic)
+        print(f"✂️  {prune_report.summary()}")
+
+    from rag.scripts.query_engine import MBTIQueryEngine
+    engine = MBTIQueryEngine(use_llm=not args.no_llm)
+
+    store = None
+    redo = []
+    if args.store:
+        store = AnswerStore(args.store)
+        store.add_topic(topic, questions)
+        # Only answers whose chunks are gone from the current index go stale
+        marked = store.refresh_sources(current_chunks=engine.chunk_keys())
+        if marked:
+            print(f"♻️  Источники изменились: устарело ответов: {marked}")
+        redo = [a['question_id'] for a in store.answers(topic, status=STALE)]
+
+    runner = AnswerRunner(
+        engine, Path(args.checkpoint), workers=args.workers,
+        token_budget=args.token_budget, time_budget=args.time_budget,
+        store=store, topic=topic, facts=args.facts
+    )
+    report = runner.run(questions, relevance=relevance, redo=redo)
+    engine.close()
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
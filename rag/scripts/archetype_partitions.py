@@ -0,0 +1,157 @@
+"""
+Archetype Partitions for MBTI RAG System
+Tags every chunk with relevance scores for the 16 PseudoRAG archetypes
+(keyword hits from KEYWORD_MATCHER, smoothed along the archetype axes),
+so questionnaire retrieval can scan only the chunks of a question's
+archetypes instead of the whole collection
+"""
+import sys
+from pathlib import Path
+from typing import List, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from rag.config import ARCHETYPE_MIN_SCORE
+from pseudorag.core.archetypes import ARCHETYPES, archetype_bits
+from pseudorag.core.matcher import KEYWORD_MATCHER
+
+
+SCORE_PREFIX = "arch_"
+TAGGED_KEY = "archetype_tagged"
+
+KEYWORD_WEIGHT = 0.6  # own keyword hits relative to the chunk's top archetype
+AXIS_WEIGHT = 0.4     # share of hits on the archetype's side of each axis
+
+CODES = [arch.code for arch in ARCHETYPES]
+_COLUMN = {code: i for i, code in enumerate(CODES)}
+# (16, 4) axis letters as bits: M/A, S/D, E/C, O/F
+_AXIS_BITS = np.array(
+    [[(archetype_bits(arch) >> shift) & 1 for shift in (3, 2, 1, 0)] for arch in ARCHETYPES],
+    dtype=np.float64
+)
+
+
+def archetype_scores(text: str) -> Optional[np.ndarray]:
+    """
+    Relevance of a chunk to each archetype
+
+    Score = 0.6 x keyword hits / hits of the chunk's top archetype +
+    0.4 x mean share of all hits that fall on the archetype's side of
+    each of the four axes. An archetype without its own keywords still
+    scores on the axes, but stays below the default partition threshold.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        (16,) scores in ARCHETYPES order, or None when the chunk has no
+        archetype keywords at all
+    """
+    hits = np.zeros(len(CODES), dtype=np.float64)
+    for owner, count in KEYWORD_MATCHER.count_owners(text).items():
+        if owner.kind == "archetype":
+            hits[_COLUMN[owner.name]] += count
+
+    total = hits.sum()
+    if total == 0:
+        return None
+
+    upper_share = hits @ _AXIS_BITS / total
+    axis = np.where(_AXIS_BITS == 1, upper_share, 1 - upper_share).mean(axis=1)
+    return KEYWORD_WEIGHT * hits / hits.max() + AXIS_WEIGHT * axis
+
+
+def tag_chunks(chunks: Iterable) -> int:
+    """
+    Store archetype scores in chunk metadata
+
+    Tagged chunks get one "arch_<CODE>" float per archetype; chunks
+    without archetype keywords get only archetype_tagged=False and are
+    part of every partition.
+
+    Args:
+        chunks: langchain Documents, modified in place
+
+    Returns:
+        Number of tagged chunks
+    """
+    tagged = 0
+    for chunk in chunks:
+        scores = archetype_scores(chunk.page_content)
+        chunk.metadata[TAGGED_KEY] = scores is not None
+        if scores is None:
+            continue
+        for code, score in zip(CODES, scores):
+            chunk.metadata[SCORE_PREFIX + code] = round(float(score), 3)
+        tagged += 1
+    return tagged
+
+
+def has_archetype_tags(metadatas: Sequence[Optional[Dict]]) -> bool:
+    """Whether an index was built with archetype tags"""
+    return any(TAGGED_KEY in (meta or {}) for meta in metadatas)
+
+
+def score_matrix(metadatas: Sequence[Optional[Dict]]) -> np.ndarray:
+    """(count, 16) archetype scores from chunk metadata; untagged rows are -1"""
+    scores = np.full((len(metadatas), len(CODES)), -1.0, dtype=np.float32)
+    for row, meta in enumerate(metadatas):
+        meta = meta or {}
+        if meta.get(TAGGED_KEY):
+            scores[row] = [meta.get(SCORE_PREFIX + code, 0.0) for code in CODES]
+    return scores
+
+
+def partition_rows(scores: np.ndarray, codes: Iterable[str],
+                   min_score: float = ARCHETYPE_MIN_SCORE) -> np.ndarray:
+    """
+    Rows in the union of the archetype partitions
+
+    Args:
+        scores: Matrix from score_matrix()
+        codes: Archetype codes
+        min_score: Partition threshold
+
+    Returns:
+        Sorted row indices, untagged rows included
+    """
+    columns = [_COLUMN[code] for code in codes if code in _COLUMN]
+    if not columns:
+        return np.arange(len(scores))
+    selected = (scores[:, columns] >= min_score).any(axis=1) | (scores[:, 0] < 0)
+    return np.flatnonzero(selected)
+
+
+def partition_filter(codes: Iterable[str], min_score: float = ARCHETYPE_MIN_SCORE) -> Optional[Dict]:
+    """
+    Chroma where-filter equivalent of partition_rows()
+
+    Returns:
+        Filter dict, or None for no restriction
+    """
+    clauses = [
+        {SCORE_PREFIX + code: {"$gte": min_score}} for code in dict.fromkeys(codes) if code in _COLUMN
+    ]
+    if not clauses:
+        return None
+    return {"$or": clauses + [{TAGGED_KEY: False}]}
+
+
+def partition_sizes(metadatas: Sequence[Optional[Dict]],
+                    min_score: float = ARCHETYPE_MIN_SCORE) -> Dict[str, int]:
+    """Chunks per archetype partition (without untagged chunks), plus 'untagged'"""
+    scores = score_matrix(metadatas)
+    sizes = {code: int((scores[:, i] >= min_score).sum()) for i, code in enumerate(CODES)}
+    sizes['untagged'] = int((scores[:, 0] < 0).sum())
+    return sizes
+
+
+def question_scope(question) -> List[str]:
+    """Archetypes whose partitions a question searches (both for interactions)"""
+    codes = [question.archetype_code]
+    related = getattr(question, 'related_archetype', None)
+    if related and related not in codes:
+        codes.append(related)
+    return codes
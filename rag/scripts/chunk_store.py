@@ -0,0 +1,201 @@
+"""
+Chunk Text Store for MBTI RAG System
+Keeps all chunk texts in one UTF-8 blob with an offset table,
+so readers can memory-map it instead of holding Python strings
+"""
+import sys
+import mmap
+import hashlib
+from pathlib import Path
+from typing import Iterable, Dict, Optional
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from rag.config import DATA_DIR
+
+
+TEXTS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+FINGERPRINT_FILE = "fingerprint"
+
+# Per-collection stores written by the indexer
+CHUNK_STORE_DIR = DATA_DIR / "chunk_texts"
+ROW_KEY = "chunk_row"  # chunk metadata: row in the collection's store
+CHUNK_ID_KEY = "chunk_id"  # chunk metadata: content hash, stable across rebuilds
+SNIPPET_LENGTH = 200
+
+
+def chunk_digest(text: str) -> str:
+    """Content hash of a chunk text (questionnaire.chunk_key suffix)"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def collection_store_dir(collection_name: str) -> Path:
+    """Chunk store directory of a Chroma collection"""
+    return CHUNK_STORE_DIR / collection_name
+
+
+def write_chunk_texts(texts: Iterable[str], directory: Path) -> int:
+    """
+    Write chunk texts as a UTF-8 blob plus uint64 offset table
+
+    Also stores the content fingerprint of the texts (hash of their
+    chunk_digest values in order), so readers can tell two stores of the
+    same size apart without reading them.
+
+    Args:
+        texts: Chunk texts in index order
+        directory: Target directory
+
+    Returns:
+        Number of chunks written
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    offsets = [0]
+    fingerprint = hashlib.sha256()
+    with open(directory / TEXTS_FILE, 'wb') as f:
+        for text in texts:
+            data = text.encode('utf-8')
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+            fingerprint.update(chunk_digest(text).encode('ascii'))
+
+    np.save(directory / OFFSETS_FILE, np.asarray(offsets, dtype=np.uint64))
+    (directory / FINGERPRINT_FILE).write_text(fingerprint.hexdigest()[:16], encoding='ascii')
+    return len(offsets) - 1
+
+
+class ChunkTextStore:
+    """Read-only view of chunk texts over a byte buffer and offset table"""
+
+    def __init__(self, blob, offsets: np.ndarray, file=None,
+                 fingerprint: Optional[str] = None):
+        """
+        Args:
+            blob: Bytes-like buffer with all texts (usually an mmap)
+            offsets: uint64 array of n + 1 byte offsets into blob
+            file: Open file backing the buffer, closed by close()
+            fingerprint: Content fingerprint stored by write_chunk_texts()
+        """
+        self._blob = blob
+        self.offsets = offsets
+        self._file = file
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def open(cls, directory: Path) -> "ChunkTextStore":
+        """Memory-map a store written by write_chunk_texts()"""
+        directory = Path(directory)
+        offsets = np.load(directory / OFFSETS_FILE, mmap_mode='r')
+
+        file = open(directory / TEXTS_FILE, 'rb')
+        if offsets[-1] > 0:
+            blob = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # mmap cannot map an empty file
+            blob = b""
+        fingerprint_path = directory / FINGERPRINT_FILE
+        # Stores written before fingerprints were recorded have none
+        fingerprint = fingerprint_path.read_text(encoding='ascii') if fingerprint_path.exists() else None
+        return cls(blob, offsets, file, fingerprint)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        """Undecoded bytes of chunk i"""
+        return bytes(self._blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def text(self, i: int) -> str:
+        """Full text of chunk i"""
+        return self.raw(i).decode('utf-8')
+
+    def snippet(self, i: int, length: int = SNIPPET_LENGTH) -> str:
+        """
+        First length characters of chunk i, with "..." when cut
+
+        Decodes at most 4 bytes per character instead of the whole chunk.
+        """
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        data = bytes(self._blob[start:min(end, start + 4 * length + 4)])
+        # A multi-byte character cut at the end is dropped
+        text = data.decode('utf-8', errors='ignore')
+        return text[:length] + "..." if len(text) > length else text
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def open_collection_store(collection_name: str, count: int) -> Optional[ChunkTextStore]:
+    """
+    Chunk store of a collection, if the indexer wrote one for it
+
+    Args:
+        collection_name: Chroma collection name
+        count: Chunks in the collection; a store of another size is stale
+
+    Returns:
+        Mapped store or None
+    """
+    directory = collection_store_dir(collection_name)
+    if not (directory / OFFSETS_FILE).exists():
+        return None
+    store = ChunkTextStore.open(directory)
+    if len(store) != count:
+        store.close()
+        return None
+    return store
+
+
+class LazyDocument:
+    """
+    Search result that keeps its text in the chunk store
+
+    Has the page_content and metadata of a langchain Document, but the
+    text is decoded from the mapped blob on every access instead of being
+    held, so kept results (history, caches) cost a row number and a
+    reference to shared metadata. Metadata is shared - do not modify it.
+    """
+
+    __slots__ = ('store', 'row', 'metadata')
+
+    def __init__(self, store: ChunkTextStore, row: int, metadata: Dict):
+        self.store = store
+        self.row = row
+        self.metadata = metadata
+
+    @property
+    def page_content(self) -> str:
+        return self.store.text(self.row)
+
+    def snippet(self, length: int = SNIPPET_LENGTH) -> str:
+        """Beginning of the text without decoding the whole chunk"""
+        return self.store.snippet(self.row, length)
+
+    def to_document(self):
+        """Materialize a langchain Document (for chains and other processes)"""
+        from langchain.schema import Document
+        return Document(page_content=self.page_content, metadata=dict(self.metadata))
+
+    def __repr__(self) -> str:
+        return f"LazyDocument(row={self.row}, metadata={self.metadata!r})"
+
+
+def doc_snippet(doc, length: int = SNIPPET_LENGTH) -> str:
+    """Display snippet of a Document or LazyDocument"""
+    if isinstance(doc, LazyDocument):
+        return doc.snippet(length)
+    text = doc.page_content
+    return text[:length] + "..." if len(text) > length else text
+
+
+def as_document(doc):
+    """langchain Document for a Document or LazyDocument"""
+    return doc.to_document() if isinstance(doc, LazyDocument) else doc
@@ -0,0 +1,70 @@
+"""
+Embedding Backends for MBTI RAG System
+Creates the encoder selected by EMBEDDING_BACKEND in config
+"""
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from rag.config import (
+    DOCS_DIR, TYPES_DIR, EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_THREADS
+)
+
+
+EMBEDDING_BACKENDS = ["huggingface", "onnx", "hashed"]
+
+
+def create_embeddings(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS):
+    """
+    Create the embedding function for indexing and search
+
+    Args:
+        backend: "huggingface" (PyTorch), "onnx" (ONNX Runtime) or
+                 "hashed" (model-free n-gram TF-IDF + SVD)
+        threads: Intra-op CPU threads (0 = runtime default)
+
+    Returns:
+        langchain Embeddings instance producing normalized vectors
+    """
+    if backend == "onnx":
+        from rag.scripts.onnx_embeddings import ONNXEmbeddings
+        return ONNXEmbeddings(threads=threads)
+
+    if backend == "hashed":
+        from rag.scripts.hashed_embeddings import HashedNgramEmbeddings
+        return HashedNgramEmbeddings()
+
+    if backend != "huggingface":
+        raise ValueError(
+            f"Неизвестный EMBEDDING_BACKEND: {backend} "
+            f"(доступны: {', '.join(EMBEDDING_BACKENDS)})"
+        )
+
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+def sample_corpus(limit: int) -> List[str]:
+    """Documentation paragraphs used to compare encoders"""
+    texts = []
+    for directory in (DOCS_DIR, TYPES_DIR):
+        for path in sorted(directory.glob("*.md")):
+            content = path.read_text(encoding='utf-8')
+            for paragraph in content.split("\n\n"):
+                paragraph = paragraph.strip()
+                if len(paragraph) >= 100:
+                    texts.append(paragraph[:1000])
+                if len(texts) >= limit:
+                    return texts
+    return texts
@@ -0,0 +1,381 @@
+"""
+Fact Extraction for MBTI RAG System
+Stage 4 of docs/53: rule-based extraction of candidate facts (numbers,
+named entities, list items, table rows, sentences) from retrieved chunks,
+so answers are generated from compact fact sets instead of whole chunks
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Optional, Sequence, Set, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from pseudorag.core.query_expander import bounded_map
+
+
+# Weight of each fact kind for an expected answer type
+KIND_WEIGHTS = {
+    'list': {'list_item': 1.0, 'table_row': 0.9, 'entity': 0.7, 'sentence': 0.4, 'number': 0.3},
+    'number': {'number': 1.0, 'table_row': 0.8, 'sentence': 0.4, 'list_item': 0.4, 'entity': 0.2},
+    'text': {'sentence': 1.0, 'list_item': 0.7, 'table_row': 0.6, 'entity': 0.3, 'number': 0.3},
+    'boolean': {'sentence': 1.0, 'list_item': 0.5, 'table_row': 0.5, 'entity': 0.2, 'number': 0.2},
+}
+
+MAX_FACTS = 20
+MAX_FACT_CHARS = 240
+MIN_SENTENCE_CHARS = 20  # shorter lines are usually chunk-boundary fragments
+CHARS_PER_TOKEN = 4  # rough estimate for prompt size reports
+
+_LIST_ITEM = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+(.+)$')
+_TABLE_SEPARATOR = re.compile(r'^\|?[\s:|-]+\|?$')
+_HEADING = re.compile(r'^(#{1,6})\s+(.+)$')
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+_NUMBER = re.compile(r'(?<![\w.,])[-+]?\d+(?:[.,]\d+)?(?:\s?%)?(?![\w])')
+_ENTITY_PATTERNS = [
+    re.compile(r'\b[EI][NS][TF][JP](?:-[AT])?\b'),                  # MBTI types
+    re.compile(r'\b[MA][SD][EC][OF]\b'),                             # archetype codes
+    re.compile(r'\b[NSTF][ie]\b'),                                   # cognitive functions
+    re.compile(r'«([^»]{2,60})»'),                                   # quoted names
+]
+_CAPITALIZED = re.compile(r'\b[A-ZА-ЯЁ][a-zа-яё]+(?:[\s-]+[A-ZА-ЯЁ][a-zа-яё]+)*')
+_MARKUP = re.compile(r'\*\*|__|`|\[([^\]]*)\]\([^)]*\)')
+_WORD = re.compile(r'[a-zа-яё0-9]{4,}')
+_ALNUM = re.compile(r'\w')
+
+
+@dataclass
+class Fact:
+    """Candidate fact from a chunk"""
+    kind: str                         # number, entity, list_item, table_row, sentence
+    text: str                         # fact as shown in the prompt
+    value: Optional[str]              # extracted number or entity
+    chunk: str                        # chunk key (questionnaire.chunk_key)
+    section: str                      # nearest markdown heading
+    score: float = 0.0
+
+
+def _clean(text: str) -> str:
+    """Strip inline markdown"""
+    return _MARKUP.sub(lambda m: m.group(1) or "", text).strip()
+
+
+def _clip(text: str) -> str:
+    return text if len(text) <= MAX_FACT_CHARS else text[:MAX_FACT_CHARS - 1] + "…"
+
+
+def _stems(text: str) -> set:
+    """Crude stems (first 5 letters of longer words) for overlap scoring"""
+    return {word[:5] for word in _WORD.findall(text.lower())}
+
+
+def _entities(sentence: str) -> Iterator[str]:
+    for pattern in _ENTITY_PATTERNS:
+        for match in pattern.finditer(sentence):
+            yield match.group(match.lastindex or 0)
+    for match in _CAPITALIZED.finditer(sentence):
+        # A single capitalized word opening the sentence is not a name
+        if match.start() == 0 and " " not in match.group(0):
+            continue
+        yield match.group(0)
+
+
+def _pairs(header: List[str], cells: List[str], keep: Iterable[int]) -> str:
+    return "; ".join(
+        f"{header[i]}: {cells[i]}" if i < len(header) and header[i] and header[i] != "#" else cells[i]
+        for i in keep if i < len(cells) and cells[i]
+    )
+
+
+def _table_rows(header: List[str], rows: List[List[str]], terms: Optional[Set[str]]) -> List[str]:
+    """
+    Table rows as "header: value" pairs
+
+    With question stems, a table is narrowed to what the question asks:
+    rows with a matching cell (all rows when none match but a column
+    header does), and in them the row label (first cell) and the matching
+    columns and cells. A row matched by its label alone is kept whole;
+    a table without matches gives nothing.
+    """
+    if terms is None:
+        return [_pairs(header, cells, range(len(cells))) for cells in rows]
+
+    columns = {i for i, h in enumerate(header) if terms & _stems(h)}
+    matches = [{i for i, c in enumerate(cells) if terms & _stems(c)} for cells in rows]
+    if any(matches):
+        selected = [(cells, values) for cells, values in zip(rows, matches) if values]
+    elif columns:
+        selected = [(cells, set()) for cells in rows]
+    else:
+        return []
+
+    result = []
+    for cells, values in selected:
+        keep = {0} | columns | values
+        result.append(_pairs(header, cells, sorted(keep) if keep != {0} else range(len(cells))))
+    return result
+
+
+def parse_chunk(chunk_key: str, text: str, terms: Optional[Set[str]] = None) -> List[Fact]:
+    """
+    Extract all candidate facts from one markdown chunk
+
+    Args:
+        chunk_key: Chunk identifier stored with every fact
+        text: Chunk text
+        terms: Question stems (_stems); tables are then narrowed to the
+               rows and cells matching the question
+
+    Returns:
+        Unscored facts in document order
+    """
+    facts = []
+    section = ""
+    header = None
+    table = []
+    in_code = False
+
+    def end_table():
+        if not table:
+            return
+        for row in _table_rows(header, table, terms):
+            if row:
+                facts.append(Fact('table_row', _clip(row), None, chunk_key, section))
+        table.clear()
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if line.startswith("```"):
+            in_code = not in_code
+            continue
+        if in_code or not line or line == "---":
+            end_table()
+            header = None
+            continue
+
+        heading = _HEADING.match(line)
+        if heading:
+            end_table()
+            section = _clean(heading.group(2))
+            header = None
+            continue
+
+        if line.startswith("|"):
+            cells = [_clean(c) for c in line.strip("|").split("|")]
+            if _TABLE_SEPARATOR.match(line):
+                continue
+            if header is None:
+                header = cells
+            else:
+                table.append(cells)
+            continue
+        end_table()
+        header = None
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            content = _clean(item.group(1))
+            if not _ALNUM.search(content):
+                continue
+            facts.append(Fact('list_item', _clip(content), None, chunk_key, section))
+            sentences = [content]
+        else:
+            sentences = [
+                s for s in _SENTENCE_END.split(_clean(line)) if len(s) >= MIN_SENTENCE_CHARS
+            ]
+            for sentence in sentences:
+                facts.append(Fact('sentence', _clip(sentence), None, chunk_key, section))
+
+        for sentence in sentences:
+            for number in _NUMBER.findall(sentence):
+                facts.append(Fact('number', _clip(sentence), number.strip(), chunk_key, section))
+            for entity in _entities(sentence):
+                facts.append(Fact('entity', entity, entity, chunk_key, section))
+
+    end_table()
+    return facts
+
+
+def extract_facts(question: str, answer_type: str,
+                  chunks: Sequence[Tuple[str, str]],
+                  max_facts: int = MAX_FACTS) -> List[Fact]:
+    """
+    Best facts for a question from its ranked evidence chunks
+
+    Score = kind weight for the answer type x (0.5 + share of question
+    stems found in the fact and its section) x retrieval rank decay.
+    Table rows are narrowed to the rows and cells matching the question.
+    Duplicate texts keep the best-scored copy.
+
+    Args:
+        question: Question text
+        answer_type: Question.expected_answer_type
+        chunks: (chunk_key, text) pairs, best first
+        max_facts: Facts to keep
+
+    Returns:
+        Facts by descending score
+    """
+    weights = KIND_WEIGHTS.get(answer_type, KIND_WEIGHTS['text'])
+    terms = _stems(question)
+
+    best = {}
+    for rank, (key, text) in enumerate(chunks):
+        decay = 1.0 / (1.0 + 0.1 * rank)
+        for fact in parse_chunk(key, text, terms):
+            overlap = len(terms & _stems(f"{fact.text} {fact.section}")) / len(terms) if terms else 0.0
+            fact.score = weights[fact.kind] * (0.5 + overlap) * decay
+            dedup = (fact.kind, fact.text.lower())
+            if dedup not in best or best[dedup].score < fact.score:
+                best[dedup] = fact
+
+    facts = sorted(best.values(), key=lambda f: f.score, reverse=True)
+    return facts[:max_facts]
+
+
+def format_facts(facts: Iterable[Fact]) -> str:
+    """
+    Compact prompt context from facts
+
+    Entities are collapsed into one line; other facts keep their section.
+    """
+    lines = []
+    entities = []
+    for fact in facts:
+        if fact.kind == 'entity':
+            entities.append(fact.text)
+        elif fact.section:
+            lines.append(f"- {fact.text} [{fact.section}]")
+        else:
+            lines.append(f"- {fact.text}")
+    if entities:
+        lines.append("- Упоминаются: " + ", ".join(entities))
+    return "\n".join(lines)
+
+
+def _fact_set(item: Dict) -> Dict:
+    """Extract facts for one question"""
+    chunks = item['chunks']
+    facts = extract_facts(item['text'], item['answer_type'], chunks, item['max_facts'])
+    context = format_facts(facts)
+    return {
+        'id': item['id'],
+        'answer_type': item['answer_type'],
+        'facts': [asdict(f) for f in facts],
+        'context': context,
+        'chunk_chars': sum(len(text) for _, text in chunks),
+        'fact_chars': len(context)
+    }
+
+
+def _fact_sets(items: List[Dict]) -> List[Dict]:
+    """Extract facts for a batch of questions (runs in a pool process)"""
+    return [_fact_set(item) for item in items]
+
+
+def iter_fact_sets(items: Iterable[Dict], workers: Optional[int] = None,
+                   chunksize: int = 16) -> Iterator[Dict]:
+    """
+    Streaming fact extraction over a process pool
+
+    Input is read batch by batch with at most two batches per process in
+    flight (bounded_map), so memory stays bounded for any input length.
+
+    Args:
+        items: Dicts {id, text, answer_type, chunks: [(key, text)], max_facts}
+        workers: Pool processes (None - CPU count, 1 - in this process)
+        chunksize: Questions per pool task
+
+    Yields:
+        Fact sets in input order as they are ready
+    """
+    if workers == 1:
+        yield from map(_fact_set, items)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for fact_sets in bounded_map(executor, _fact_sets, items,
+                                     chunksize, 2 * (workers or os.cpu_count() or 1)):
+            yield from fact_sets
+
+
+def evidence_items(evidence: Dict, max_facts: int = MAX_FACTS) -> Iterator[Dict]:
+    """Pipeline input from questionnaire.retrieve_evidence() output"""
+    chunks = evidence['chunks']
+    for question_id, question in evidence['questions'].items():
+        yield {
+            'id': question_id,
+            'text': question['text'],
+            'answer_type': question.get('expected_answer_type', 'text'),
+            'chunks': [(e['chunk'], chunks[e['chunk']]['text']) for e in question['evidence']],
+            'max_facts': max_facts
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Извлечение фактов из найденных фрагментов (этап 4)"
+    )
+    parser.add_argument(
+        'evidence',
+        help='Доказательства вопросника (JSON от questionnaire.py)'
+    )
+    parser.add_argument(
+        '-n', '--max-facts',
+        type=int,
+        default=MAX_FACTS,
+        help=f'Фактов на вопрос (по умолчанию: {MAX_FACTS})'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Процессов (по умолчанию: число CPU)'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Сохранить факты в NDJSON файл'
+    )
+
+    args = parser.parse_args()
+
+    with open(args.evidence, 'r', encoding='utf-8') as f:
+        evidence = json.load(f)
+
+    print(f"\n🔬 Извлечение фактов для {len(evidence['questions'])} вопросов...")
+    start = time.perf_counter()
+    out = open(args.output, 'w', encoding='utf-8') if args.output else None
+    questions = facts_total = chunk_chars = fact_chars = 0
+    try:
+        for fact_set in iter_fact_sets(evidence_items(evidence, args.max_facts), workers=args.workers):
+            questions += 1
+            facts_total += len(fact_set['facts'])
+            chunk_chars += fact_set['chunk_chars']
+            fact_chars += fact_set['fact_chars']
+            if out:
+                out.write(json.dumps(fact_set, ensure_ascii=False) + "\n")
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - start
+
+    print("\n" + "=" * 60)
+    print("📊 ФАКТЫ")
+    print("=" * 60)
+    print(f"Вопросов: {questions}, фактов: {facts_total}")
+    print(f"Контекст: {chunk_chars // CHARS_PER_TOKEN} → {fact_chars // CHARS_PER_TOKEN} токенов "
+          f"(~{fact_chars / chunk_chars:.0%})" if chunk_chars else "Контекст: пусто")
+    print(f"Время: {elapsed:.2f} с")
+    print("=" * 60)
+
+    if args.output:
+        print(f"\n📁 Факты сохранены: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Model-Free Hashed N-gram Embeddings for MBTI RAG System
+Character n-gram TF-IDF vectors (hashing trick) reduced with truncated
+SVD, fitted on the corpus itself and stored as one small projection matrix
+"""
+import re
+import sys
+import time
+import zlib
+import argparse
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain.schema.embeddings import Embeddings
+
+from rag.config import HASHED_MODEL_PATH, HASHED_FEATURES, HASHED_DIM, QUICK_QUERIES
+
+
+NGRAM_RANGE = (3, 5)
+
+# A sparse row: (feature indices, weights)
+SparseRow = Tuple[np.ndarray, np.ndarray]
+
+
+def _hashed_counts(text: str, n_features: int, ngram_range: Tuple[int, int]) -> SparseRow:
+    """Hashed character n-gram counts of one text"""
+    text = " " + re.sub(r"\s+", " ", text.lower()).strip() + " "
+    counts: Dict[int, int] = {}
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(text) - n + 1):
+            # crc32 is stable across processes, unlike hash()
+            bucket = zlib.crc32(text[i:i + n].encode('utf-8')) % n_features
+            counts[bucket] = counts.get(bucket, 0) + 1
+
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return indices, values
+
+
+def _randomized_svd(rows: List[SparseRow], n_features: int, dim: int,
+                    oversample: int = 10, iterations: int = 2,
+                    seed: int = 0) -> np.ndarray:
+    """
+    Top right singular vectors of a sparse row matrix
+
+    Works row by row, so the dense (n_docs x n_features) matrix is never
+    materialized.
+
+    Returns:
+        (dim, n_features) component matrix
+    """
+    rng = np.random.default_rng(seed)
+    width = min(dim + oversample, len(rows))
+
+    def matmul(right: np.ndarray) -> np.ndarray:
+        # X @ right, right: (n_features, width)
+        return np.stack([values @ right[indices] for indices, values in rows])
+
+    def rmatmul(left: np.ndarray) -> np.ndarray:
+        # X.T @ left, left: (n_docs, width)
+        result = np.zeros((n_features, left.shape[1]), dtype=np.float32)
+        for (indices, values), coeffs in zip(rows, left):
+            result[indices] += values[:, None] * coeffs[None, :]
+        return result
+
+    basis, _ = np.linalg.qr(matmul(rng.standard_normal((n_features, width)).astype(np.float32)))
+    for _ in range(iterations):
+        basis, _ = np.linalg.qr(matmul(rmatmul(basis)))
+
+    small = rmatmul(basis).T  # (width, n_features) = basis.T @ X
+    _, _, vt = np.linalg.svd(small, full_matrices=False)
+    return vt[:dim].astype(np.float32)
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """Normalized LSA embeddings over hashed character n-grams"""
+
+    def __init__(self, model_path: Path = HASHED_MODEL_PATH,
+                 projection: Optional[np.ndarray] = None,
+                 ngram_range: Tuple[int, int] = NGRAM_RANGE):
+        """
+        Load a fitted model
+
+        Args:
+            model_path: .npz file written by fit()
+            projection: Pre-computed (n_features, dim) matrix instead of a file
+            ngram_range: Character n-gram sizes
+        """
+        if projection is None:
+            model_path = Path(model_path)
+            if not model_path.exists():
+                raise FileNotFoundError(
+                    f"Модель не найдена: {model_path}. "
+                    f"Запустите индексацию с EMBEDDING_BACKEND=hashed"
+                )
+            with np.load(model_path) as data:
+                projection = data['projection']
+                ngram_range = tuple(int(n) for n in data['ngram_range'])
+
+        # IDF weights are folded into the projection rows
+        self.projection = np.ascontiguousarray(projection, dtype=np.float32)
+        self.n_features, self.dim = self.projection.shape
+        self.ngram_range = ngram_range
+
+    @classmethod
+    def fit(cls, texts: List[str], dim: int = HASHED_DIM,
+            n_features: int = HASHED_FEATURES,
+            model_path: Optional[Path] = HASHED_MODEL_PATH,
+            ngram_range: Tuple[int, int] = NGRAM_RANGE) -> "HashedNgramEmbeddings":
+        """
+        Fit IDF weights and SVD components on a corpus
+
+        Args:
+            texts: Corpus texts (the indexed chunks)
+            dim: Output dimension
+            n_features: Number of hash buckets
+            model_path: Where to save the model (None = don't save)
+            ngram_range: Character n-gram sizes
+
+        Returns:
+            Fitted embeddings
+        """
+        rows = [_hashed_counts(text, n_features, ngram_range) for text in texts]
+
+        document_frequency = np.zeros(n_features, dtype=np.float32)
+        for indices, _ in rows:
+            document_frequency[indices] += 1
+        idf = np.log((1 + len(rows)) / (1 + document_frequency)) + 1
+
+        weighted = []
+        for indices, values in rows:
+            weights = (1 + np.log(values)) * idf[indices]
+            weights /= max(np.linalg.norm(weights), 1e-12)
+            weighted.append((indices, weights))
+
+        dim = min(dim, len(rows))
+        components = _randomized_svd(weighted, n_features, dim)
+        projection = idf[:, None] * components.T
+
+        if model_path is not None:
+            model_path = Path(model_path)
+            model_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(model_path, projection=projection, ngram_range=np.array(ngram_range))
+
+        return cls(projection=projection, ngram_range=ngram_range)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into a (n, dim) float32 matrix"""
+        result = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            indices, counts = _hashed_counts(text, self.n_features, self.ngram_range)
+            if len(indices):
+                result[row] = (1 + np.log(counts)) @ self.projection[indices]
+
+        norms = np.linalg.norm(result, axis=1, keepdims=True)
+        return result / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+def recall_report(corpus_size: int = 500, k: int = 5) -> Dict:
+    """
+    Compare hashed retrieval with the mpnet encoder
+
+    mpnet top-k over documentation paragraphs is the reference; the
+    report gives recall@k of the hashed model plus startup and latency.
+    """
+    from rag.scripts.embeddings import create_embeddings, sample_corpus
+    from rag.scripts.loadtest import synthetic_queries
+
+    corpus = sample_corpus(corpus_size)
+    queries = list(QUICK_QUERIES) + synthetic_queries(40)
+
+    start = time.perf_counter()
+    if HASHED_MODEL_PATH.exists():
+        hashed = HashedNgramEmbeddings()
+    else:
+        hashed = HashedNgramEmbeddings.fit(corpus, model_path=None)
+    hashed_startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = create_embeddings("huggingface")
+    reference_startup = time.perf_counter() - start
+
+    ref_docs = np.asarray(reference.embed_documents(corpus), dtype=np.float32)
+    hashed_docs = hashed.encode(corpus)
+
+    start = time.perf_counter()
+    ref_queries = np.asarray([reference.embed_query(q) for q in queries], dtype=np.float32)
+    ref_latency = (time.perf_counter() - start) / len(queries)
+
+    start = time.perf_counter()
+    hashed_queries = np.asarray([hashed.embed_query(q) for q in queries], dtype=np.float32)
+    hashed_latency = (time.perf_counter() - start) / len(queries)
+
+    recalls = []
+    for rq, hq in zip(ref_queries, hashed_queries):
+        ref_top = set(np.argsort(-(ref_docs @ rq))[:k])
+        hashed_top = set(np.argsort(-(hashed_docs @ hq))[:k])
+        recalls.append(len(ref_top & hashed_top) / k)
+
+    return {
+        'corpus_size': len(corpus),
+        'queries': len(queries),
+        'k': k,
+        'recall_at_k': float(np.mean(recalls)),
+        'hashed_dim': hashed.dim,
+        'hashed_projection_mb': hashed.projection.nbytes / 2 ** 20,
+        'startup_s': {'hashed': hashed_startup, 'mpnet': reference_startup},
+        'query_latency_ms': {'hashed': hashed_latency * 1000, 'mpnet': ref_latency * 1000}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Лёгкие эмбеддинги без модели: n-граммы + TF-IDF + SVD"
+    )
+    parser.add_argument(
+        '--compare',
+        action='store_true',
+        help='Сравнить полноту поиска с mpnet'
+    )
+    parser.add_argument(
+        '-k', '--top-k',
+        type=int,
+        default=5,
+        help='Глубина сравнения top-k (по умолчанию: 5)'
+    )
+
+    args = parser.parse_args()
+
+    if not args.compare:
+        parser.print_help()
+        return
+
+    report = recall_report(k=args.top_k)
+
+    print("\n" + "=" * 60)
+    print("📊 СРАВНЕНИЕ HASHED И MPNET")
+    print("=" * 60)
+    print(f"Фрагментов: {report['corpus_size']}, запросов: {report['queries']}")
+    print(f"Recall@{report['k']}: {report['recall_at_k']:.1%}")
+    print(f"Размер проекции: {report['hashed_projection_mb']:.1f} МБ ({report['hashed_dim']} измерений)")
+    print(f"Запуск: hashed {report['startup_s']['hashed']:.2f} с, "
+          f"mpnet {report['startup_s']['mpnet']:.2f} с")
+    print(f"Запрос: hashed {report['query_latency_ms']['hashed']:.1f} мс, "
+          f"mpnet {report['query_latency_ms']['mpnet']:.1f} мс")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
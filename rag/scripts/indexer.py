@@ -3,8 +3,11 @@ Document Indexer for MBTI RAG System
 Loads, chunks, and indexes all documentation into ChromaDB
 """
 import sys
+import time
+import shutil
+import argparse
 from pathlib import Path
-from typing import List
+from typing import List, Dict, Optional, Sequence
 from tqdm import tqdm
 
 # Add parent directory to path
@@ -12,29 +15,71 @@ sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
 
 from rag.config import (
     DOCS_DIR, TYPES_DIR, CHROMA_DIR, COLLECTION_NAME,
-    CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL
+    CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL, EMBEDDING_BACKEND,
+    HASHED_MODEL_PATH, ARCHETYPE_MIN_SCORE, SHARDING, SHARD_COUNT, WARM_QUERIES
 )
+from rag.scripts.embeddings import create_embeddings
+from rag.scripts.hashed_embeddings import HashedNgramEmbeddings
+from rag.scripts.archetype_partitions import tag_chunks, partition_sizes
+from rag.scripts.shards import (
+    STRATEGIES, MANIFEST_PATH, shard_of, shard_collection, load_manifest, save_manifest
+)
+from rag.scripts.chunk_store import (
+    ROW_KEY, CHUNK_ID_KEY, chunk_digest, collection_store_dir, write_chunk_texts
+)
+from rag.scripts.warm_cache import WARM_CACHE_PATH, RECENT_QUERIES, build_warm_cache, collect_hot_queries
+from rag.scripts.query_engine import MBTIQueryEngine
+
+
+def drop_collection(name: str):
+    """Delete a Chroma collection and its chunk text store"""
+    Chroma(collection_name=name, persist_directory=str(CHROMA_DIR)).delete_collection()
+    shutil.rmtree(collection_store_dir(name), ignore_errors=True)
 
 
 class MBTIDocumentIndexer:
     """Indexes MBTI documentation into vector database"""
 
-    def __init__(self):
+    def __init__(self, sharding: str = SHARDING, shard_count: int = SHARD_COUNT,
+                 rebuild: Optional[Sequence[str]] = None,
+                 warm_queries: Optional[Sequence[str]] = WARM_QUERIES):
+        """
+        Args:
+            sharding: "" for one collection, or a shards.STRATEGIES entry
+            shard_count: Number of shards for the "hash" strategy
+            rebuild: Rebuild only these shards of an existing sharded index
+            warm_queries: Hot queries to precompute after the build
+                          (None or empty - no warm cache)
+        """
         print("🚀 Инициализация индексатора MBTI документации...")
 
+        if sharding and sharding not in STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия шардирования: {sharding}")
+        if rebuild and not sharding:
+            raise ValueError("Пересборка отдельных шардов требует шардирования")
+        self.sharding = sharding
+        self.shard_count = shard_count
+        self.rebuild = set(rebuild) if rebuild else None
+        self.warm_queries = list(warm_queries or [])
+
         # Initialize embeddings
-        print(f"📦 Загрузка embedding модели: {EMBEDDING_MODEL}")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        if EMBEDDING_BACKEND == "hashed":
+            # Fitted on the chunks themselves in create_vectorstore(); a model
+            # fitted on a few shards would not match the vectors of the others
+            if rebuild and not HASHED_MODEL_PATH.exists():
+                raise ValueError(
+                    f"Нет модели hashed n-грамм ({HASHED_MODEL_PATH}) - нужна полная индексация"
+                )
+            print("📦 Embedding: hashed n-граммы (обучение на корпусе)")
+            self.embeddings = None
+        else:
+            print(f"📦 Загрузка embedding модели: {EMBEDDING_MODEL} ({EMBEDDING_BACKEND})")
+            self.embeddings = create_embeddings()
 
         # Initialize text splitter
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -90,6 +135,14 @@ class MBTIDocumentIndexer:
             if lines and lines[0].startswith('#'):
                 doc.metadata['title'] = lines[0].strip('#').strip()
 
+            if self.sharding:
+                doc.metadata['shard'] = shard_of(doc.metadata, self.sharding, self.shard_count)
+
+        if self.rebuild:
+            all_docs = [doc for doc in all_docs if doc.metadata['shard'] in self.rebuild]
+            print(f"  ♻️  Пересборка шардов {', '.join(sorted(self.rebuild))}: "
+                  f"{len(all_docs)} документов")
+
         self.documents = all_docs
         print(f"\n✅ Всего загружено: {len(all_docs)} документов")
         return all_docs
@@ -107,23 +160,149 @@ class MBTIDocumentIndexer:
         print(f"✅ Создано {len(chunks)} фрагментов")
         return chunks
 
-    def create_vectorstore(self) -> Chroma:
-        """Create and populate vector store"""
+    def tag_archetypes(self) -> dict:
+        """Tag chunks with archetype scores for partitioned search"""
+        print("\n🏷️  Разметка фрагментов по архетипам...")
+
+        tagged = tag_chunks(self.chunks)
+        sizes = partition_sizes([chunk.metadata for chunk in self.chunks], ARCHETYPE_MIN_SCORE)
+        untagged = sizes.pop('untagged')
+
+        print(f"  ✓ Размечено {tagged}, без ключевых слов архетипов: {untagged}")
+        for code, size in sorted(sizes.items(), key=lambda item: -item[1]):
+            print(f"    {code}: {size} ({size / max(len(self.chunks), 1):.0%})")
+        return sizes
+
+    def create_vectorstore(self):
+        """Create and populate vector store (a dict of shards when sharded)"""
         print("\n🔍 Создание векторной базы данных...")
         print(f"  📍 Локация: {CHROMA_DIR}")
         print(f"  📦 Коллекция: {COLLECTION_NAME}")
 
-        # Create vector store
+        if self.embeddings is None:
+            if self.rebuild:
+                # Other shards were encoded with the existing model
+                self.embeddings = HashedNgramEmbeddings()
+            else:
+                print("  🔢 Обучение hashed n-gram модели...")
+                self.embeddings = HashedNgramEmbeddings.fit(
+                    [chunk.page_content for chunk in self.chunks]
+                )
+                print(f"  ✓ Модель сохранена: {HASHED_MODEL_PATH}")
+
+        if self.sharding:
+            return self.create_shards()
+
+        # Create vector store (from scratch - from_documents appends)
+        Chroma(collection_name=COLLECTION_NAME, persist_directory=str(CHROMA_DIR)).delete_collection()
+        vectorstore = self.write_collection(self.chunks, COLLECTION_NAME)
+        manifest = load_manifest()
+        if manifest is not None:
+            # The query engine would otherwise keep searching the old shards
+            for entry in manifest['shards'].values():
+                drop_collection(entry['collection'])
+            MANIFEST_PATH.unlink()
+
+        print("✅ Векторная база создана и сохранена")
+        return vectorstore
+
+    def write_collection(self, chunks: List[Document], name: str) -> Chroma:
+        """
+        Write chunks into a Chroma collection and its chunk text store
+
+        Every chunk gets its row in the store as metadata, so the query
+        engine can map results to the texts instead of loading them from
+        Chroma, and its content hash, so chunk keys need no text.
+        """
+        for row, chunk in enumerate(chunks):
+            chunk.metadata[ROW_KEY] = row
+            chunk.metadata[CHUNK_ID_KEY] = chunk_digest(chunk.page_content)
         vectorstore = Chroma.from_documents(
-            documents=self.chunks,
+            documents=chunks,
             embedding=self.embeddings,
-            collection_name=COLLECTION_NAME,
+            collection_name=name,
             persist_directory=str(CHROMA_DIR)
         )
-
-        print("✅ Векторная база создана и сохранена")
+        write_chunk_texts((chunk.page_content for chunk in chunks), collection_store_dir(name))
         return vectorstore
 
+    def create_shards(self) -> Dict[str, Chroma]:
+        """
+        Write chunks into one collection per shard
+
+        A full build replaces all shards (and drops shards of an older
+        layout); with rebuild only the listed shards are replaced and the
+        others keep their collections untouched.
+        """
+        groups: Dict[str, List[Document]] = {}
+        for chunk in self.chunks:
+            groups.setdefault(chunk.metadata['shard'], []).append(chunk)
+
+        manifest = load_manifest()
+        layout = {'strategy': self.sharding, 'count': self.shard_count}
+        if self.rebuild:
+            # The shard count only matters for the "hash" strategy
+            keys = layout if self.sharding == "hash" else ['strategy']
+            if manifest is None or any(manifest.get(key) != layout[key] for key in keys):
+                raise ValueError(
+                    "Шарды собраны с другой стратегией или не собраны - нужна полная индексация"
+                )
+            targets = sorted(self.rebuild)
+        else:
+            old_shards = manifest['shards'] if manifest else {}
+            for shard, entry in old_shards.items():
+                if shard not in groups:
+                    drop_collection(entry['collection'])
+            manifest = {**layout, 'shards': {}}
+            targets = sorted(groups)
+
+        stores = {}
+        for shard in targets:
+            name = shard_collection(shard)
+            Chroma(collection_name=name, persist_directory=str(CHROMA_DIR)).delete_collection()
+            manifest['shards'].pop(shard, None)
+
+            chunks = groups.get(shard, [])
+            if not chunks:
+                shutil.rmtree(collection_store_dir(name), ignore_errors=True)
+                print(f"  🗑️  Шард {shard}: пуст, удалён")
+                continue
+
+            start = time.perf_counter()
+            stores[shard] = self.write_collection(chunks, name)
+            manifest['shards'][shard] = {
+                'collection': name,
+                'chunks': len(chunks),
+                'sources': len({chunk.metadata['source'] for chunk in chunks}),
+                'built': time.strftime("%Y-%m-%dT%H:%M:%S")
+            }
+            print(f"  📦 Шард {shard}: {len(chunks)} фрагментов → {name} "
+                  f"({time.perf_counter() - start:.1f} с)")
+
+        save_manifest(manifest)
+        print(f"✅ Шардов: {len(manifest['shards'])}, манифест: {MANIFEST_PATH}")
+        return stores
+
+    def warm_cache(self):
+        """
+        Precompute embeddings and top-k results of the hot queries
+
+        Runs over the whole finished index (all shards, also after a
+        partial rebuild). Without hot queries an old cache is removed,
+        since it no longer matches the index.
+        """
+        if not self.warm_queries:
+            if WARM_CACHE_PATH.exists():
+                WARM_CACHE_PATH.unlink()
+            return None
+
+        print(f"\n🔥 Прогрев популярных запросов: {len(self.warm_queries)}")
+        engine = MBTIQueryEngine(use_llm=False, snapshot_path=None, embeddings=self.embeddings)
+        summary = build_warm_cache(engine, self.warm_queries)
+        engine.close()
+        print(f"  ✓ k={summary['k']}, {summary['time_s']:.1f} с → {WARM_CACHE_PATH}")
+        return summary
+
     def index_all(self):
         """Complete indexing pipeline"""
         print("=" * 60)
@@ -133,16 +312,22 @@ class MBTIDocumentIndexer:
         # Load documents
         self.load_documents()
 
-        if not self.documents:
+        if not self.documents and not self.rebuild:
             print("❌ Документы не найдены!")
             return
 
         # Chunk documents
         self.chunk_documents()
 
+        # Archetype partitions
+        self.tag_archetypes()
+
         # Create vector store
         vectorstore = self.create_vectorstore()
 
+        # Warm cache for hot queries
+        self.warm_cache()
+
         # Print statistics
         print("\n" + "=" * 60)
         print("📊 СТАТИСТИКА ИНДЕКСАЦИИ")
@@ -153,6 +338,8 @@ class MBTIDocumentIndexer:
         print(f"Перекрытие: {CHUNK_OVERLAP} символов")
         print(f"Embedding модель: {EMBEDDING_MODEL}")
         print(f"Векторная БД: {CHROMA_DIR}")
+        if self.sharding:
+            print(f"Шардирование: {self.sharding} ({len(vectorstore)} шардов собрано)")
         print("=" * 60)
         print("\n✨ Индексация завершена успешно!")
 
@@ -165,13 +352,59 @@ class MBTIDocumentIndexer:
             'total_chunks': len(self.chunks),
             'chunk_size': CHUNK_SIZE,
             'chunk_overlap': CHUNK_OVERLAP,
-            'embedding_model': EMBEDDING_MODEL
+            'embedding_model': EMBEDDING_MODEL,
+            'embedding_backend': EMBEDDING_BACKEND,
+            'sharding': self.sharding or None
         }
 
 
 def main():
     """Main indexing function"""
-    indexer = MBTIDocumentIndexer()
+    parser = argparse.ArgumentParser(description="Индексация документации MBTI")
+    parser.add_argument(
+        '--sharding',
+        choices=STRATEGIES,
+        default=SHARDING or None,
+        help='Разбить индекс на шарды: по корпусу, каталогу или хэшу файла'
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        default=SHARD_COUNT,
+        help=f'Число шардов для --sharding hash (по умолчанию: {SHARD_COUNT})'
+    )
+    parser.add_argument(
+        '--rebuild',
+        nargs='+',
+        metavar='SHARD',
+        help='Пересобрать только эти шарды (остальные не трогаются)'
+    )
+    parser.add_argument(
+        '--hot-queries',
+        metavar='FILE',
+        help='Популярные запросы для прогрева (строки или JSONL); по умолчанию WARM_QUERIES'
+    )
+    parser.add_argument(
+        '--hot-from-log',
+        type=int,
+        default=0,
+        metavar='N',
+        help=f'Добавить N самых частых из последних {RECENT_QUERIES} запросов лога QUERY_LOG'
+    )
+    parser.add_argument(
+        '--no-warm-cache',
+        action='store_true',
+        help='Не прогревать кэш популярных запросов'
+    )
+    args = parser.parse_args()
+
+    warm_queries = None if args.no_warm_cache else collect_hot_queries(
+        args.hot_queries, args.hot_from_log
+    )
+    indexer = MBTIDocumentIndexer(
+        sharding=args.sharding or "", shard_count=args.shards, rebuild=args.rebuild,
+        warm_queries=warm_queries
+    )
     indexer.index_all()
 
 
@@ -0,0 +1,339 @@
+"""
+Load Testing Tool for MBTI RAG System
+Replays a query log (or a synthetic query mix) against the query engine
+and reports throughput, latency percentiles and error rates as JSON
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from typing import List, Dict, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from rag.config import QUICK_QUERIES, TOP_K_RESULTS, EMBEDDING_MODEL, EMBEDDING_BACKEND
+
+
+MBTI_TYPES = [
+    "INTJ", "INTP", "ENTJ", "ENTP", "INFJ", "INFP", "ENFJ", "ENFP",
+    "ISTJ", "ISFJ", "ESTJ", "ESFJ", "ISTP", "ISFP", "ESTP", "ESFP"
+]
+
+# Templates for synthetic queries with type codes
+TYPE_QUERY_TEMPLATES = [
+    "Что такое {a}?",
+    "Какие когнитивные функции у {a}?",
+    "Сильные стороны {a}",
+    "Карьера для {a}",
+    "Как {a} проявляется в стрессе?",
+    "Совместимость {a} и {b}",
+    "Конфликты между {a} и {b}"
+]
+
+
+def load_queries(path: str) -> List[str]:
+    """
+    Load queries from a log file
+
+    Args:
+        path: Plain text file (one query per line) or JSONL
+              with a "query" field per line
+
+    Returns:
+        List of queries in file order
+    """
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                query = record.get('query', '').strip()
+            else:
+                query = line
+            if query:
+                queries.append(query)
+    return queries
+
+
+def synthetic_queries(count: int, seed: int = 0) -> List[str]:
+    """
+    Build a synthetic query mix from quick queries and type-code templates
+
+    Args:
+        count: Number of queries to generate
+        seed: Random seed (the mix is reproducible)
+
+    Returns:
+        List of queries
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        if rng.random() < 0.3:
+            queries.append(rng.choice(QUICK_QUERIES))
+        else:
+            a, b = rng.sample(MBTI_TYPES, 2)
+            queries.append(rng.choice(TYPE_QUERY_TEMPLATES).format(a=a, b=b))
+    return queries
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentile with linear interpolation over pre-sorted values"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * p / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    frac = pos - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * frac
+
+
+def make_engine_target(engine, mode: str, k: int) -> Callable[[str], object]:
+    """
+    Wrap an in-process engine into a single-query callable
+
+    Args:
+        engine: MBTIQueryEngine instance
+        mode: "search" or "ask"
+        k: Number of results for search
+    """
+    if mode == "ask":
+        return engine.ask
+    return lambda query: engine.search(query, k=k)
+
+
+def run_load(target: Callable[[str], object], queries: List[str],
+             concurrency: int = 1, rate: Optional[float] = None,
+             duration: Optional[float] = None) -> Dict:
+    """
+    Replay queries against a target and collect latency statistics
+
+    Args:
+        target: Callable executing one query
+        queries: Queries to replay (cycled when duration is set)
+        concurrency: Number of concurrent client threads
+        rate: Target request rate (req/s); None = closed loop, each
+              thread sends the next query as soon as the previous finishes
+        duration: Stop after this many seconds instead of after one pass
+
+    Returns:
+        Dictionary with throughput, latency percentiles (ms) and errors
+    """
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+    counter = iter(range(sys.maxsize))
+    total = len(queries)
+
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def next_index() -> Optional[int]:
+        with lock:
+            i = next(counter)
+        if deadline is None and i >= total:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        return i
+
+    def execute(query: str, scheduled: float):
+        try:
+            target(query)
+            error = None
+        except Exception as e:
+            error = type(e).__name__
+        # Latency is measured from the scheduled send time, so a saturated
+        # engine is not hidden by queueing in open-loop mode
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+            else:
+                latencies.append(elapsed)
+
+    if rate:
+        # Open loop: dispatcher sends at a fixed rate, workers execute
+        interval = 1.0 / rate
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                i = next_index()
+                if i is None:
+                    break
+                scheduled = start + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(execute, queries[i % total], scheduled)
+    else:
+        # Closed loop: each client thread sends back-to-back
+        def client():
+            while True:
+                i = next_index()
+                if i is None:
+                    break
+                execute(queries[i % total], time.perf_counter())
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    wall = time.perf_counter() - start
+    latencies.sort()
+    error_count = sum(errors.values())
+    requests = len(latencies) + error_count
+
+    return {
+        'requests': requests,
+        'errors': error_count,
+        'error_rate': error_count / requests if requests else 0.0,
+        'error_types': errors,
+        'wall_time_s': wall,
+        'throughput_rps': len(latencies) / wall if wall > 0 else 0.0,
+        'latency_ms': {
+            'mean': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'max': latencies[-1] * 1000 if latencies else 0.0
+        }
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочное тестирование поискового движка MBTI RAG"
+    )
+    parser.add_argument(
+        '--queries',
+        help='Файл с запросами (строки или JSONL с полем "query")'
+    )
+    parser.add_argument(
+        '--synthetic',
+        type=int,
+        default=200,
+        help='Количество синтетических запросов, если файл не указан (по умолчанию: 200)'
+    )
+    parser.add_argument(
+        '--mode',
+        choices=['search', 'ask'],
+        default='search',
+        help='Нагружаемый метод движка (по умолчанию: search)'
+    )
+    parser.add_argument(
+        '-c', '--concurrency',
+        type=_int_list,
+        default=[1],
+        help='Число параллельных клиентов, можно списком: 1,2,4,8'
+    )
+    parser.add_argument(
+        '-k', '--top-k',
+        type=_int_list,
+        default=[TOP_K_RESULTS],
+        help=f'Количество результатов поиска, можно списком (по умолчанию: {TOP_K_RESULTS})'
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        help='Целевая частота запросов в секунду (открытый цикл)'
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        help='Длительность каждого прогона в секундах (запросы повторяются по кругу)'
+    )
+    parser.add_argument(
+        '--warmup',
+        type=int,
+        default=3,
+        help='Количество прогревочных запросов перед замером (по умолчанию: 3)'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Нагружать пул процессов из N воркеров вместо движка в процессе (только search)'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Сохранить результаты в JSON файл'
+    )
+
+    args = parser.parse_args()
+
+    if args.queries:
+        queries = load_queries(args.queries)
+    else:
+        queries = synthetic_queries(args.synthetic)
+
+    if not queries:
+        print("❌ Нет запросов для воспроизведения")
+        return
+
+    if args.workers:
+        from rag.scripts.worker_pool import MBTIWorkerPool
+        engine = MBTIWorkerPool(workers=args.workers)
+        args.mode = 'search'
+    else:
+        from rag.scripts.query_engine import MBTIQueryEngine
+        engine = MBTIQueryEngine(use_llm=(args.mode == 'ask'))
+
+    runs = []
+    for k in args.top_k:
+        target = make_engine_target(engine, args.mode, k)
+        for query in queries[:args.warmup]:
+            target(query)
+
+        for concurrency in args.concurrency:
+            print(f"🚀 Прогон: mode={args.mode}, k={k}, concurrency={concurrency}")
+            stats = run_load(
+                target, queries,
+                concurrency=concurrency,
+                rate=args.rate,
+                duration=args.duration
+            )
+            latency = stats['latency_ms']
+            print(f"   {stats['throughput_rps']:.1f} req/s | "
+                  f"p50 {latency['p50']:.1f} ms | p95 {latency['p95']:.1f} ms | "
+                  f"p99 {latency['p99']:.1f} ms | ошибок: {stats['errors']}")
+
+            runs.append({
+                'mode': args.mode,
+                'workers': args.workers,
+                'k': k,
+                'concurrency': concurrency,
+                'rate': args.rate,
+                **stats
+            })
+    engine.close()
+
+    report = {
+        'timestamp': time.time(),
+        'embedding_model': EMBEDDING_MODEL,
+        'embedding_backend': EMBEDDING_BACKEND,
+        'queries': len(queries),
+        'runs': runs
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📁 Результаты сохранены: {args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
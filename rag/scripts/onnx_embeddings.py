@@ -0,0 +1,338 @@
+"""
+ONNX Runtime Embedding Backend for MBTI RAG System
+Exports EMBEDDING_MODEL to an optimized ONNX graph (optionally with
+dynamic int8 weight quantization) and serves it without PyTorch
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import List, Dict
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain.schema.embeddings import Embeddings
+
+from rag.config import (
+    EMBEDDING_MODEL, ONNX_MODEL_DIR, ONNX_QUANTIZE,
+    EMBEDDING_THREADS, QUICK_QUERIES
+)
+from rag.scripts.embeddings import create_embeddings, sample_corpus
+
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+INFO_FILE = "export_info.json"
+
+
+def export_onnx_model(model_name: str = EMBEDDING_MODEL,
+                      output_dir: Path = ONNX_MODEL_DIR,
+                      quantize: bool = True) -> Path:
+    """
+    Export a sentence-transformers model to ONNX
+
+    The model is loaded from the local Hugging Face cache only, so the
+    export never touches the network.
+
+    Args:
+        model_name: sentence-transformers model name
+        output_dir: Target directory
+        quantize: Also write a dynamically int8-quantized copy
+
+    Returns:
+        Output directory
+    """
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    print(f"📦 Загрузка модели из локального кэша: {model_name}")
+    st_model = SentenceTransformer(model_name, device='cpu')
+    transformer = st_model[0]
+    pooling = st_model[1]
+    tokenizer = transformer.tokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer.save_pretrained(str(output_dir))
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+    encoder = _Encoder(transformer.auto_model).eval()
+    sample = tokenizer(["Что такое INTJ?"], return_tensors='pt')
+
+    print("🔧 Экспорт в ONNX...")
+    model_path = output_dir / MODEL_FILE
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder,
+            (sample['input_ids'], sample['attention_mask']),
+            str(model_path),
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'last_hidden_state': {0: 'batch', 1: 'sequence'}
+            },
+            opset_version=14
+        )
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print("🔧 Динамическая int8 квантизация весов...")
+        quantize_dynamic(
+            str(model_path),
+            str(output_dir / QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+
+    with open(output_dir / INFO_FILE, 'w', encoding='utf-8') as f:
+        json.dump({
+            'model_name': model_name,
+            'max_length': st_model.max_seq_length,
+            'pooling': 'cls' if pooling.pooling_mode_cls_token else 'mean',
+            'pad_token': tokenizer.pad_token,
+            'pad_token_id': tokenizer.pad_token_id,
+            'quantized': quantize
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ Модель экспортирована: {output_dir}")
+    return output_dir
+
+
+class ONNXEmbeddings(Embeddings):
+    """Normalized sentence embeddings computed with ONNX Runtime"""
+
+    def __init__(self, model_dir: Path = ONNX_MODEL_DIR,
+                 quantized: bool = ONNX_QUANTIZE,
+                 threads: int = EMBEDDING_THREADS,
+                 batch_size: int = 32):
+        """
+        Load an exported model
+
+        Args:
+            model_dir: Directory written by export_onnx_model
+            quantized: Use the int8-quantized graph
+            threads: Intra-op threads (0 = runtime default)
+            batch_size: Texts per inference call
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        info_path = model_dir / INFO_FILE
+        if not info_path.exists():
+            raise FileNotFoundError(
+                f"ONNX модель не найдена в {model_dir}. "
+                f"Запустите: python scripts/onnx_embeddings.py --export"
+            )
+
+        with open(info_path, 'r', encoding='utf-8') as f:
+            self.info = json.load(f)
+
+        if self.info['model_name'] != EMBEDDING_MODEL:
+            print(f"⚠️  ONNX модель экспортирована из {self.info['model_name']}, "
+                  f"а EMBEDDING_MODEL = {EMBEDDING_MODEL}")
+
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        if not (model_dir / model_file).exists():
+            raise FileNotFoundError(f"Файл модели не найден: {model_dir / model_file}")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            str(model_dir / model_file),
+            options,
+            providers=['CPUExecutionProvider']
+        )
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.info['max_length'])
+        self.tokenizer.enable_padding(
+            pad_id=self.info['pad_token_id'],
+            pad_token=self.info['pad_token']
+        )
+
+        self.quantized = quantized
+        self.batch_size = batch_size
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        hidden = self.session.run(
+            None,
+            {'input_ids': input_ids, 'attention_mask': attention_mask}
+        )[0]
+
+        if self.info['pooling'] == 'cls':
+            vectors = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into a (n, dim) float32 matrix"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Batch texts of similar length together to minimize padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        result = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors = self._encode_batch([texts[i] for i in batch])
+            for i, vector in zip(batch, vectors):
+                result[i] = vector
+        return np.asarray(result, dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode_batch([text])[0].tolist()
+
+
+def parity_report(quantized: bool = ONNX_QUANTIZE, corpus_size: int = 300,
+                  k: int = 5) -> Dict:
+    """
+    Compare the ONNX encoder with the PyTorch encoder
+
+    Args:
+        quantized: Check the int8-quantized graph
+        corpus_size: Number of documentation paragraphs to encode
+        k: Depth for top-k overlap
+
+    Returns:
+        Dictionary with cosine agreement, top-k overlap and speed
+    """
+    corpus = sample_corpus(corpus_size)
+    queries = list(QUICK_QUERIES)
+
+    torch_encoder = create_embeddings("huggingface")
+    onnx_encoder = ONNXEmbeddings(quantized=quantized)
+
+    report = {'quantized': quantized, 'corpus_size': len(corpus), 'queries': len(queries), 'k': k}
+    vectors = {}
+
+    for name, encoder in (('pytorch', torch_encoder), ('onnx', onnx_encoder)):
+        start = time.perf_counter()
+        docs = np.asarray(encoder.embed_documents(corpus), dtype=np.float32)
+        batch_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        query_vectors = np.asarray([encoder.embed_query(q) for q in queries], dtype=np.float32)
+        query_time = time.perf_counter() - start
+
+        vectors[name] = (docs, query_vectors)
+        report[name] = {
+            'docs_per_s': len(corpus) / batch_time,
+            'query_latency_ms': query_time / len(queries) * 1000
+        }
+
+    torch_docs, torch_queries = vectors['pytorch']
+    onnx_docs, onnx_queries = vectors['onnx']
+
+    cosines = np.concatenate([
+        (torch_docs * onnx_docs).sum(axis=1),
+        (torch_queries * onnx_queries).sum(axis=1)
+    ])
+
+    overlaps = []
+    for tq, oq in zip(torch_queries, onnx_queries):
+        torch_top = set(np.argsort(-(torch_docs @ tq))[:k])
+        onnx_top = set(np.argsort(-(onnx_docs @ oq))[:k])
+        overlaps.append(len(torch_top & onnx_top) / k)
+
+    report['cosine_mean'] = float(cosines.mean())
+    report['cosine_min'] = float(cosines.min())
+    report['topk_overlap'] = float(np.mean(overlaps))
+    report['query_speedup'] = (
+        report['pytorch']['query_latency_ms'] / report['onnx']['query_latency_ms']
+    )
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="ONNX Runtime бэкенд для embedding модели"
+    )
+    parser.add_argument(
+        '--export',
+        action='store_true',
+        help='Экспортировать EMBEDDING_MODEL из локального кэша в ONNX'
+    )
+    parser.add_argument(
+        '--no-quantize',
+        action='store_true',
+        help='Не создавать int8-квантизованную копию при экспорте'
+    )
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help='Сравнить с PyTorch: косинусное сходство, пересечение top-k, скорость'
+    )
+    parser.add_argument(
+        '--quantized',
+        action=argparse.BooleanOptionalAction,
+        default=ONNX_QUANTIZE,
+        help='Проверять int8-квантизованную модель (по умолчанию: ONNX_QUANTIZE)'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Сохранить отчёт проверки в JSON файл'
+    )
+
+    args = parser.parse_args()
+
+    if args.export:
+        export_onnx_model(quantize=not args.no_quantize)
+
+    if args.check:
+        report = parity_report(quantized=args.quantized)
+
+        print("\n" + "=" * 60)
+        print("📊 СРАВНЕНИЕ ONNX И PYTORCH")
+        print("=" * 60)
+        print(f"Квантизация int8: {'да' if report['quantized'] else 'нет'}")
+        print(f"Косинус (среднее / минимум): {report['cosine_mean']:.4f} / {report['cosine_min']:.4f}")
+        print(f"Пересечение top-{report['k']}: {report['topk_overlap']:.1%}")
+        for name in ('pytorch', 'onnx'):
+            print(f"{name:8}: {report[name]['query_latency_ms']:.1f} мс/запрос, "
+                  f"{report[name]['docs_per_s']:.1f} док/с")
+        print(f"Ускорение запроса: x{report['query_speedup']:.2f}")
+        print("=" * 60)
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"\n📁 Отчёт сохранён: {args.output}")
+
+    if not args.export and not args.check:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
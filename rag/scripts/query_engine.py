@@ -4,53 +4,111 @@ Handles search and answer generation
 """
 import sys
 from pathlib import Path
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable, Optional, Sequence
+
+import numpy as np
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_community.chat_models import ChatOpenAI
 from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
 from langchain.schema import Document
 
 from rag.config import (
-    CHROMA_DIR, COLLECTION_NAME, EMBEDDING_MODEL,
-    TOP_K_RESULTS, QA_PROMPT_TEMPLATE, OPENAI_API_KEY
+    CHROMA_DIR, COLLECTION_NAME, EMBEDDING_MODEL, EMBEDDING_BACKEND,
+    TOP_K_RESULTS, QA_PROMPT_TEMPLATE, OPENAI_API_KEY, SNAPSHOT_PATH,
+    ARCHETYPE_MIN_SCORE, QUERY_LOG
+)
+from rag.scripts.embeddings import create_embeddings
+from rag.scripts.snapshot import SnapshotIndex
+from rag.scripts.facts import MAX_FACTS, extract_facts, format_facts
+from rag.scripts.questionnaire import chunk_key
+from rag.scripts.archetype_partitions import (
+    has_archetype_tags, partition_filter, partition_rows, score_matrix
+)
+from rag.scripts.shards import load_manifest, merge_top_k
+from rag.scripts.chunk_store import (
+    ROW_KEY, CHUNK_ID_KEY, LazyDocument, open_collection_store, doc_snippet, as_document
 )
+from rag.scripts.warm_cache import WarmCache, QueryLog
 
 
 class MBTIQueryEngine:
     """Query engine for MBTI documentation"""
 
-    def __init__(self, use_llm: bool = True):
+    def __init__(self, use_llm: bool = True, snapshot_path: Optional[str] = SNAPSHOT_PATH,
+                 embeddings=None):
         """
         Initialize query engine
 
         Args:
             use_llm: Whether to use LLM for answer generation
                     If False, only returns retrieved documents
+            snapshot_path: Memory-map this index snapshot instead of
+                    opening the Chroma collection (or its shards)
+            embeddings: Reuse this embeddings object (e.g. the indexer's)
         """
         print("🔍 Инициализация поискового движка...")
 
         # Load embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL,
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        self.embeddings = embeddings or create_embeddings()
+
+        # Load index: a mapped snapshot, the Chroma shards listed in the
+        # indexer's manifest or a single Chroma collection
+        self.snapshot = None
+        self.vectorstore = None
+        self.vectorstores = []
+        self.shards = {}
+        self._shard_pool = None
+        self._texts = []
+        manifest = None if snapshot_path else load_manifest()
+        if snapshot_path:
+            print(f"  📦 Снапшот индекса: {snapshot_path}")
+            self.snapshot = SnapshotIndex(Path(snapshot_path))
+            self.has_partitions = self.snapshot.has_partitions
+        else:
+            if manifest:
+                print(f"  🧩 Шардов: {len(manifest['shards'])} ({manifest['strategy']})")
+                for shard, entry in sorted(manifest['shards'].items()):
+                    self.shards[shard] = Chroma(
+                        collection_name=entry['collection'],
+                        embedding_function=self.embeddings,
+                        persist_directory=str(CHROMA_DIR)
+                    )
+                self.vectorstores = list(self.shards.values())
+                self._shard_pool = ThreadPoolExecutor(max_workers=max(len(self.vectorstores), 1))
+            else:
+                self.vectorstore = Chroma(
+                    collection_name=COLLECTION_NAME,
+                    embedding_function=self.embeddings,
+                    persist_directory=str(CHROMA_DIR)
+                )
+                self.vectorstores = [self.vectorstore]
+            self._sizes = [store._collection.count() for store in self.vectorstores]
+            # Chunk texts mapped from the indexer's stores (None - texts come from Chroma)
+            self._texts = [
+                open_collection_store(store._collection.name, size)
+                for store, size in zip(self.vectorstores, self._sizes)
+            ]
+            self.has_partitions = any(
+                has_archetype_tags(store._collection.get(limit=1, include=['metadatas'])['metadatas'])
+                for store in self.vectorstores
+            )
 
-        # Load vector store
-        self.vectorstore = Chroma(
-            collection_name=COLLECTION_NAME,
-            embedding_function=self.embeddings,
-            persist_directory=str(CHROMA_DIR)
-        )
+        # Hot queries precomputed at index build time
+        self.warm = WarmCache.load(self)
+        if self.warm:
+            print(f"  🔥 Прогретых запросов: {len(self.warm)}")
+        self.query_log = QueryLog(QUERY_LOG) if QUERY_LOG else None
 
         self.use_llm = use_llm
         self.llm = None
         self.qa_chain = None
+        self.stuff_chain = None
 
         if use_llm and OPENAI_API_KEY:
             print("  🤖 Инициализация LLM...")
@@ -66,44 +124,229 @@ class MBTIQueryEngine:
                 input_variables=["context", "question"]
             )
 
-            self.qa_chain = RetrievalQA.from_chain_type(
+            if self.vectorstore is not None:
+                self.qa_chain = RetrievalQA.from_chain_type(
+                    llm=self.llm,
+                    chain_type="stuff",
+                    retriever=self.vectorstore.as_retriever(
+                        search_kwargs={"k": TOP_K_RESULTS}
+                    ),
+                    return_source_documents=True,
+                    chain_type_kwargs={"prompt": prompt}
+                )
+
+            # Snapshot mode and fact-based answers: retrieval is done by search()
+            self.stuff_chain = load_qa_chain(
                 llm=self.llm,
                 chain_type="stuff",
-                retriever=self.vectorstore.as_retriever(
-                    search_kwargs={"k": TOP_K_RESULTS}
-                ),
-                return_source_documents=True,
-                chain_type_kwargs={"prompt": prompt}
+                prompt=prompt
             )
 
         print("✅ Движок готов к работе")
 
-    def search(self, query: str, k: int = TOP_K_RESULTS) -> List[Document]:
+    def _where(self, archetypes: Optional[Sequence[str]]) -> Optional[Dict]:
+        """Chroma filter for archetype-scoped search (None - whole collection)"""
+        if not archetypes or not self.has_partitions:
+            return None
+        return partition_filter(archetypes, ARCHETYPE_MIN_SCORE)
+
+    def _rows(self, archetypes: Optional[Sequence[str]]):
+        """Snapshot rows for archetype-scoped search (None - whole index)"""
+        return self.snapshot.partition(archetypes, ARCHETYPE_MIN_SCORE) if archetypes else None
+
+    def partition_share(self, archetypes: Optional[Sequence[str]]) -> float:
+        """
+        Share of the index scanned by a search scoped to these archetypes
+
+        Returns:
+            1.0 for unscoped searches and indexes without archetype tags
+        """
+        scope = tuple(archetypes or ())
+        return self.partition_shares([scope])[scope]
+
+    def partition_shares(self, scopes: Iterable[Sequence[str]]) -> Dict[tuple, float]:
+        """
+        partition_share() for many archetype scopes at once
+
+        Chroma metadata is read in one pass for all scopes instead of one
+        filtered query per scope.
+
+        Returns:
+            Share per scope (as a tuple of codes)
+        """
+        scopes = [tuple(scope) for scope in scopes]
+        if self.snapshot is not None:
+            total = len(self.snapshot)
+            shares = {}
+            for scope in scopes:
+                rows = self._rows(scope)
+                shares[scope] = len(rows) / total if rows is not None and total else 1.0
+            return shares
+
+        total = sum(self._sizes)
+        if not self.has_partitions or not total or not any(scopes):
+            return dict.fromkeys(scopes, 1.0)
+        scores = score_matrix([
+            metadata
+            for store in self.vectorstores
+            for metadata in store._collection.get(include=['metadatas'])['metadatas']
+        ])
+        return {
+            scope: len(partition_rows(scores, scope, ARCHETYPE_MIN_SCORE)) / total if scope else 1.0
+            for scope in scopes
+        }
+
+    def _query_vectors(self, queries: List[str]) -> np.ndarray:
+        """Query embeddings, precomputed ones from the warm cache"""
+        vectors = [self.warm.vector(query) if self.warm else None for query in queries]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.embeddings.embed_documents([queries[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _fan_out(self, func) -> List:
+        """Run func(store, size, texts) on every collection, shards in parallel"""
+        if self._shard_pool is None:
+            return list(map(func, self.vectorstores, self._sizes, self._texts))
+        return list(self._shard_pool.map(func, self.vectorstores, self._sizes, self._texts))
+
+    def _query_collections(self, vectors: np.ndarray, k: int,
+                           where: Optional[Dict] = None) -> List[List[tuple]]:
+        """
+        Nearest chunks for query vectors over all collections
+
+        Every shard returns its own top k; the lists are merged per query
+        on a heap, so the result equals a search over one big collection.
+        Collections with a chunk store return LazyDocument results and
+        Chroma does not send the texts at all.
+
+        Returns:
+            One list of (document, distance) tuples per query
+        """
+        def query(store, size, texts):
+            if size == 0:
+                return [[] for _ in range(len(vectors))]
+            results = store._collection.query(
+                query_embeddings=vectors.tolist(),
+                n_results=min(k, size),
+                where=where,
+                include=['metadatas', 'distances'] if texts else ['documents', 'metadatas', 'distances']
+            )
+            if texts:
+                return [
+                    [
+                        (LazyDocument(texts, metadata[ROW_KEY], metadata), distance)
+                        for metadata, distance in zip(metadatas, distances)
+                    ]
+                    for metadatas, distances in zip(results['metadatas'], results['distances'])
+                ]
+            return [
+                [
+                    (Document(page_content=text, metadata=metadata or {}), distance)
+                    for text, metadata, distance in zip(texts, metadatas, distances)
+                ]
+                for texts, metadatas, distances in zip(
+                    results['documents'], results['metadatas'], results['distances']
+                )
+            ]
+
+        per_shard = self._fan_out(query)
+        return [
+            merge_top_k([hits[i] for hits in per_shard], k) for i in range(len(vectors))
+        ]
+
+    def search(self, query: str, k: int = TOP_K_RESULTS,
+               archetypes: Optional[Sequence[str]] = None) -> List[Document]:
         """
         Search for relevant documents
 
         Args:
             query: Search query
             k: Number of results to return
+            archetypes: Search only the partitions of these archetype codes
 
         Returns:
             List of relevant documents
         """
-        results = self.vectorstore.similarity_search(query, k=k)
-        return results
+        return [doc for doc, _ in self.search_with_score(query, k=k, archetypes=archetypes)]
 
-    def search_with_score(self, query: str, k: int = TOP_K_RESULTS) -> List[tuple]:
+    def search_with_score(self, query: str, k: int = TOP_K_RESULTS,
+                          archetypes: Optional[Sequence[str]] = None) -> List[tuple]:
         """
         Search with similarity scores
 
         Args:
             query: Search query
             k: Number of results
+            archetypes: Search only the partitions of these archetype codes
 
         Returns:
             List of (document, score) tuples
         """
-        results = self.vectorstore.similarity_search_with_score(query, k=k)
+        if self.query_log is not None:
+            self.query_log.append(query)
+
+        hits = self.warm.lookup(query, k) if self.warm and not archetypes else None
+        if hits is not None:
+            return hits
+
+        cached = self.warm.vector(query) if self.warm else None
+        vector = cached if cached is not None else self.embeddings.embed_query(query)
+
+        if self.snapshot is not None:
+            # Squared L2 distance between normalized vectors, the same
+            # score Chroma reports (lower is better)
+            return [
+                (self.snapshot.lazy_document(row), 2.0 - 2.0 * similarity)
+                for row, similarity in self.snapshot.search_vector(vector, k, rows=self._rows(archetypes))
+            ]
+
+        vector = np.asarray([vector], dtype=np.float32)
+        return self._query_collections(vector, k, self._where(archetypes))[0]
+
+    def search_batch(self, queries: List[str], k: int = TOP_K_RESULTS,
+                     archetypes: Optional[Sequence[str]] = None) -> List[List[tuple]]:
+        """
+        Search many queries at once
+
+        Queries are encoded in one embed_documents() call and looked up
+        with one batched index query instead of a search per query; hot
+        queries come from the warm cache. Batches are not written to the
+        query log.
+
+        Args:
+            queries: Search queries
+            k: Number of results per query
+            archetypes: Search only the partitions of these archetype codes
+                    (the same scope for the whole batch)
+
+        Returns:
+            One list of (document, score) tuples per query, same scores
+            as search_with_score()
+        """
+        if not queries:
+            return []
+
+        results = [
+            self.warm.lookup(query, k) if self.warm and not archetypes else None for query in queries
+        ]
+        todo = [i for i, hits in enumerate(results) if hits is None]
+        if not todo:
+            return results
+        vectors = self._query_vectors([queries[i] for i in todo])
+
+        if self.snapshot is not None:
+            found = [
+                [(self.snapshot.lazy_document(row), 2.0 - 2.0 * similarity) for row, similarity in hits]
+                for hits in self.snapshot.search_vectors(vectors, k, rows=self._rows(archetypes))
+            ]
+        else:
+            found = self._query_collections(vectors, k, self._where(archetypes))
+
+        for i, hits in zip(todo, found):
+            results[i] = hits
         return results
 
     def ask(self, question: str) -> Dict:
@@ -123,6 +366,16 @@ class MBTIQueryEngine:
                 'answer': result['result'],
                 'sources': result['source_documents']
             }
+        elif self.use_llm and self.stuff_chain:
+            docs = self.search(question)
+            result = self.stuff_chain({
+                "input_documents": [as_document(doc) for doc in docs],
+                "question": question
+            })
+            return {
+                'answer': result['output_text'],
+                'sources': docs
+            }
         else:
             # Just return relevant documents
             docs = self.search(question)
@@ -131,6 +384,41 @@ class MBTIQueryEngine:
                 'sources': docs
             }
 
+    def ask_facts(self, question: str, answer_type: str = "text",
+                  max_facts: int = MAX_FACTS) -> Dict:
+        """
+        Ask a question with extracted facts instead of whole chunks as context
+
+        Args:
+            question: Question to ask
+            answer_type: Expected answer type (Question.expected_answer_type)
+            max_facts: Facts passed to the LLM
+
+        Returns:
+            Dictionary with answer, source documents and facts
+        """
+        docs = self.search(question)
+        facts = extract_facts(
+            question, answer_type,
+            [(chunk_key(doc), doc.page_content) for doc in docs], max_facts
+        )
+        context = format_facts(facts)
+
+        if self.use_llm and self.stuff_chain:
+            result = self.stuff_chain({
+                "input_documents": [Document(page_content=context, metadata={})],
+                "question": question
+            })
+            answer = result['output_text']
+        else:
+            answer = "LLM не настроен. Показаны извлечённые факты.\n\n" + context
+
+        return {
+            'answer': answer,
+            'sources': docs,
+            'facts': facts
+        }
+
     def format_answer(self, result: Dict) -> str:
         """
         Format answer with sources
@@ -162,25 +450,79 @@ class MBTIQueryEngine:
                 if title and title != 'No title':
                     output.append(f"    Раздел: {title}")
 
-                # Show snippet
-                content = doc.page_content[:200]
-                if len(doc.page_content) > 200:
-                    content += "..."
-                output.append(f"    Фрагмент: {content}")
+                # Show snippet (decodes only its bytes for lazy results)
+                output.append(f"    Фрагмент: {doc_snippet(doc, 200)}")
 
         output.append("=" * 60)
         return "\n".join(output)
 
+    def chunk_keys(self) -> Dict[str, List[str]]:
+        """
+        Keys (questionnaire.chunk_key) of all indexed chunks by source file
+
+        Used for chunk-level staleness of stored answers. Texts are read
+        only for indexes built without content hashes in the metadata.
+        """
+        if self.snapshot is not None:
+            docs = [self.snapshot.lazy_document(row) for row in range(len(self.snapshot))]
+        else:
+            docs = []
+            for store in self.vectorstores:
+                metadatas = store._collection.get(include=['metadatas'])['metadatas']
+                if all(CHUNK_ID_KEY in (metadata or {}) for metadata in metadatas):
+                    docs += [Document(page_content="", metadata=metadata) for metadata in metadatas]
+                    continue
+                data = store._collection.get(include=['documents', 'metadatas'])
+                docs += [
+                    Document(page_content=text, metadata=metadata or {})
+                    for text, metadata in zip(data['documents'], data['metadatas'])
+                ]
+
+        by_source = {}
+        for doc in docs:
+            source = doc.metadata.get('source', doc.metadata.get('filename', ''))
+            by_source.setdefault(source, []).append(chunk_key(doc))
+        return by_source
+
     def get_collection_stats(self) -> Dict:
         """Get statistics about the vector store"""
-        collection = self.vectorstore._collection
-        count = collection.count()
+        if self.snapshot is not None:
+            count = len(self.snapshot)
+            collection_name = self.snapshot.build.get('collection_name', COLLECTION_NAME)
+        else:
+            count = sum(self._sizes)
+            collection_name = COLLECTION_NAME
 
-        return {
+        stats = {
             'total_documents': count,
-            'collection_name': COLLECTION_NAME,
-            'embedding_model': EMBEDDING_MODEL
+            'collection_name': collection_name,
+            'embedding_model': EMBEDDING_MODEL,
+            'embedding_backend': EMBEDDING_BACKEND
         }
+        if self.shards:
+            stats['shards'] = dict(zip(self.shards, self._sizes))
+        stats['warm_queries'] = len(self.warm) if self.warm else 0
+        return stats
+
+    def close(self):
+        """
+        Release the engine's files and threads
+
+        Closes the query log, stops the shard search threads and unmaps
+        the snapshot and chunk stores. Results from a snapshot stay
+        valid (see SnapshotIndex.close); LazyDocument results over the
+        chunk stores must not be read after close.
+        """
+        if self.query_log is not None:
+            self.query_log.close()
+        if self._shard_pool is not None:
+            self._shard_pool.shutdown()
+            self._shard_pool = None
+        if self.snapshot is not None:
+            self.snapshot.close()
+        for texts in self._texts:
+            if texts is not None:
+                texts.close()
 
 
 def main():
@@ -209,7 +551,7 @@ def main():
         for i, doc in enumerate(results, 1):
             metadata = doc.metadata
             print(f"\n[{i}] {metadata.get('filename', 'Unknown')}")
-            print(f"    {doc.page_content[:150]}...")
+            print(f"    {doc_snippet(doc, 150)}")
 
 
 if __name__ == "__main__":
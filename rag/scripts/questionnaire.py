@@ -0,0 +1,261 @@
+"""
+Questionnaire Retrieval for MBTI RAG System
+Level 2 -> Level 3: pulls evidence for every question of a PseudoRAG
+question tree from the index in bulk, batched passes
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterable
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from rag.config import TOP_K_RESULTS
+from rag.scripts.archetype_partitions import question_scope
+from rag.scripts.chunk_store import CHUNK_ID_KEY, chunk_digest
+from pseudorag.core.query_expander import QueryExpander, Question
+from pseudorag.core.export import read_ndjson
+from pseudorag.core.dedup import QuestionPruner, DEFAULT_THRESHOLD
+
+
+def load_questions(path: Path) -> List[Question]:
+    """
+    Load questions saved by QuestionTree.to_json or to_ndjson
+
+    Args:
+        path: .json, .ndjson, .ndjson.gz or .ndjson.zst file
+
+    Returns:
+        List of questions
+    """
+    path = Path(path)
+    if path.suffix == ".json":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return [Question(**q) for q in data['questions']]
+
+    _, questions = read_ndjson(str(path))
+    return list(questions)
+
+
+def chunk_key(doc) -> str:
+    """
+    Stable id of a retrieved chunk: source file plus content hash
+
+    The hash comes from the chunk metadata written by the indexer, so
+    LazyDocument results are keyed without decoding their text; it is
+    computed from the text only for indexes built without it.
+    """
+    source = doc.metadata.get('source', doc.metadata.get('filename', ''))
+    digest = doc.metadata.get(CHUNK_ID_KEY) or chunk_digest(doc.page_content)
+    return f"{source}#{digest}"
+
+
+def retrieve_evidence(engine, questions: Iterable, k: int = TOP_K_RESULTS,
+                      batch_size: int = 64, workers: int = 4,
+                      partitioned: bool = True) -> Dict:
+    """
+    Retrieve ranked evidence for every question
+
+    Question texts are split into batches searched with
+    engine.search_batch() on parallel threads (encoding and index lookups
+    release the GIL). With partitioned=True questions are grouped by
+    archetype and each group searches only its archetype partitions
+    (both archetypes for interaction questions). Chunks shared between
+    questions are stored once.
+
+    Args:
+        engine: MBTIQueryEngine
+        questions: Question or QuestionView objects
+        k: Evidence chunks per question
+        batch_size: Questions per encoding batch
+        workers: Parallel batches
+        partitioned: Search archetype partitions instead of the whole index
+
+    Returns:
+        Dictionary with 'questions' (id -> question fields and ranked
+        evidence), 'chunks' (key -> text, metadata, number of questions)
+        and 'stats'
+    """
+    questions = list(questions)
+
+    # Batches never mix scopes: one search_batch() call has one filter
+    groups: Dict[tuple, List[int]] = {}
+    for i, question in enumerate(questions):
+        scope = tuple(question_scope(question)) if partitioned else ()
+        groups.setdefault(scope, []).append(i)
+    batches = [
+        (scope, members[j:j + batch_size])
+        for scope, members in groups.items()
+        for j in range(0, len(members), batch_size)
+    ]
+    shares = engine.partition_shares(groups)
+
+    def search(batch):
+        scope, members = batch
+        return engine.search_batch([questions[i].text for i in members], k=k, archetypes=scope)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        batch_results = list(executor.map(search, batches))
+    search_time = time.perf_counter() - start
+
+    results = [None] * len(questions)
+    for (_, members), hits_list in zip(batches, batch_results):
+        for i, hits in zip(members, hits_list):
+            results[i] = hits
+    scanned = sum(shares[scope] * len(members) for scope, members in groups.items())
+
+    chunks = {}
+    by_question = {}
+    total_hits = 0
+    for question, hits in zip(questions, results):
+        evidence = []
+        for rank, (doc, score) in enumerate(hits, 1):
+            key = chunk_key(doc)
+            if key not in chunks:
+                chunks[key] = {
+                    'text': doc.page_content,
+                    'metadata': doc.metadata,
+                    'questions': 0
+                }
+            chunks[key]['questions'] += 1
+            evidence.append({'chunk': key, 'score': float(score), 'rank': rank})
+            total_hits += 1
+
+        by_question[question.id] = {
+            'text': question.text,
+            'archetype_code': question.archetype_code,
+            'priority': question.priority,
+            'expected_answer_type': question.expected_answer_type,
+            'evidence': evidence
+        }
+
+    return {
+        'k': k,
+        'questions': by_question,
+        'chunks': chunks,
+        'stats': {
+            'questions': len(questions),
+            'batches': len(batches),
+            'scanned_share': scanned / len(questions) if questions else 0.0,
+            'evidence': total_hits,
+            'unique_chunks': len(chunks),
+            'dedup_ratio': (1 - len(chunks) / total_hits) if total_hits else 0.0,
+            'search_time_s': search_time,
+            'questions_per_s': len(questions) / search_time if search_time > 0 else 0.0
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Поиск доказательств для всех вопросов вопросника (Уровень 2 → 3)"
+    )
+    parser.add_argument(
+        'topic',
+        nargs='?',
+        help='Тема для расширения через PseudoRAG'
+    )
+    parser.add_argument(
+        '--prune',
+        type=float,
+        nargs='?',
+        const=DEFAULT_THRESHOLD,
+        help=f'Слить почти одинаковые вопросы (порог сходства, по умолчанию: {DEFAULT_THRESHOLD})'
+    )
+    parser.add_argument(
+        '--tree',
+        help='Готовый вопросник (.json или .ndjson[.gz])'
+    )
+    parser.add_argument(
+        '--depth',
+        type=int,
+        default=1,
+        help='Глубина расширения темы (по умолчанию: 1)'
+    )
+    parser.add_argument(
+        '--min-relevance',
+        type=float,
+        default=0.3,
+        help='Минимальная релевантность архетипа (по умолчанию: 0.3)'
+    )
+    parser.add_argument(
+        '-k', '--top-k',
+        type=int,
+        default=TOP_K_RESULTS,
+        help=f'Фрагментов на вопрос (по умолчанию: {TOP_K_RESULTS})'
+    )
+    parser.add_argument(
+        '-b', '--batch-size',
+        type=int,
+        default=64,
+        help='Вопросов в одном пакете кодирования (по умолчанию: 64)'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='Параллельных пакетов (по умолчанию: 4)'
+    )
+    parser.add_argument(
+        '--no-partitions',
+        action='store_true',
+        help='Искать по всему индексу, а не по разделам архетипов вопроса'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Сохранить доказательства в JSON файл'
+    )
+
+    args = parser.parse_args()
+
+    if args.tree:
+        questions = load_questions(Path(args.tree))
+        topic = Path(args.tree).stem
+    elif args.topic:
+        tree = QueryExpander().expand_query(
+            args.topic, depth=args.depth, min_relevance=args.min_relevance, verbose=False
+        )
+        questions = tree.questions
+        topic = args.topic
+    else:
+        parser.error("укажите тему или --tree")
+
+    if args.prune is not None:
+        questions, prune_report = QuestionPruner(args.prune).prune_questions(questions, topic)
+        print(f"✂️  {prune_report.summary()}")
+
+    from rag.scripts.query_engine import MBTIQueryEngine
+    engine = MBTIQueryEngine(use_llm=False)
+
+    print(f"\n🧲 Поиск доказательств для {len(questions)} вопросов...")
+    result = retrieve_evidence(
+        engine, questions, k=args.top_k,
+        batch_size=args.batch_size, workers=args.workers,
+        partitioned=not args.no_partitions
+    )
+    result['topic'] = topic
+    stats = result['stats']
+
+    print("\n" + "=" * 60)
+    print("📊 ДОКАЗАТЕЛЬСТВА")
+    print("=" * 60)
+    print(f"Вопросов: {stats['questions']} ({stats['batches']} пакетов)")
+    print(f"Просмотрено индекса на вопрос: {stats['scanned_share']:.0%}")
+    print(f"Найдено фрагментов: {stats['evidence']}, уникальных: {stats['unique_chunks']} "
+          f"(дубликатов {stats['dedup_ratio']:.1%})")
+    print(f"Время поиска: {stats['search_time_s']:.2f} с ({stats['questions_per_s']:.1f} вопр/с)")
+    print("=" * 60)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n📁 Доказательства сохранены: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Sharded Collections for MBTI RAG System
+Splits the index into several Chroma collections (by corpus, source
+directory or source hash) that are built and rebuilt independently and
+searched in parallel, with per-shard top-k lists merged on a heap
+"""
+import re
+import sys
+import json
+import heapq
+import zlib
+from pathlib import Path
+from itertools import islice
+from operator import itemgetter
+from typing import List, Dict, Iterable, Optional, Sequence, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from rag.config import ROOT_DIR, DATA_DIR, COLLECTION_NAME
+
+
+STRATEGIES = ("corpus", "directory", "hash")
+MANIFEST_PATH = DATA_DIR / f"{COLLECTION_NAME}.shards.json"
+
+
+def _relative_source(metadata: Dict) -> Path:
+    source = Path(metadata.get('source', ''))
+    try:
+        return source.resolve().relative_to(ROOT_DIR.resolve())
+    except ValueError:
+        return source
+
+
+def shard_of(metadata: Dict, strategy: str, count: int = 1) -> str:
+    """
+    Shard of a document or chunk
+
+    All chunks of one source file land in the same shard, so a changed
+    file only touches one shard.
+
+    Args:
+        metadata: Document metadata with 'source'
+        strategy: "corpus" (top-level directory: docs, types, ...),
+                  "directory" (source directory) or "hash" (source path)
+        count: Number of shards for "hash"
+
+    Returns:
+        Shard name
+    """
+    source = _relative_source(metadata)
+    if strategy == "corpus":
+        return source.parts[0] if len(source.parts) > 1 else "root"
+    if strategy == "directory":
+        return "_".join(source.parent.parts) or "root"
+    if strategy == "hash":
+        # crc32 is stable across processes, unlike hash()
+        return f"{zlib.crc32(source.as_posix().encode('utf-8')) % count:02d}"
+    raise ValueError(f"Неизвестная стратегия шардирования: {strategy}")
+
+
+def shard_collection(shard: str, prefix: str = COLLECTION_NAME) -> str:
+    """Chroma collection name of a shard (letters, digits, '.', '_', '-')"""
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', f"{prefix}__{shard}")[:63]
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> Optional[Dict]:
+    """
+    Shard manifest written by the indexer
+
+    Returns:
+        {'strategy', 'count', 'shards': {name: {'collection', 'chunks',
+        'sources', 'built'}}} or None for a single-collection index
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: Dict, path: Path = MANIFEST_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    tmp_path.replace(path)
+
+
+def merge_top_k(results: Iterable[Sequence[Tuple]], k: int) -> List[Tuple]:
+    """
+    Merge per-shard (document, distance) lists into the global top k
+
+    Every list is already sorted by distance, so a k-way heap merge
+    stops after k items instead of sorting everything.
+    """
+    return list(islice(heapq.merge(*results, key=itemgetter(1)), k))
+
+
+def collection_data(vectorstores: Sequence) -> Dict:
+    """
+    Contents of one or several Chroma collections as a single collection
+
+    Returns:
+        Dict with 'ids', 'embeddings', 'documents' and 'metadatas' lists
+    """
+    merged = {'ids': [], 'embeddings': [], 'documents': [], 'metadatas': []}
+    for vectorstore in vectorstores:
+        data = vectorstore._collection.get(
+            include=['embeddings', 'documents', 'metadatas']
+        )
+        for key in merged:
+            merged[key].extend(data[key])
+    return merged
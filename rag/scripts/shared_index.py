@@ -0,0 +1,212 @@
+"""
+Shared Read-Only Index for MBTI RAG System
+Exports a Chroma collection into memory-mappable files so that many
+processes can search the same index without copying it
+"""
+import sys
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Tuple, Optional, Sequence
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain.schema import Document
+
+from rag.config import DATA_DIR, COLLECTION_NAME, EMBEDDING_MODEL, ARCHETYPE_MIN_SCORE
+from rag.scripts.chunk_store import write_chunk_texts, ChunkTextStore, LazyDocument
+from rag.scripts.shards import collection_data
+from rag.scripts.archetype_partitions import has_archetype_tags, score_matrix, partition_rows
+
+
+SHARED_INDEX_DIR = DATA_DIR / "shared_index"
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+PARTITION_CACHE_SIZE = 16  # gathered partition embeddings kept for reuse
+
+
+def export_shared_index(vectorstore, directory: Path = SHARED_INDEX_DIR) -> int:
+    """
+    Export a Chroma vector store into a shared index directory
+
+    Args:
+        vectorstore: langchain Chroma instance, or a list of shard
+                    instances exported as one index
+        directory: Target directory
+
+    Returns:
+        Number of exported chunks
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    stores = vectorstore if isinstance(vectorstore, (list, tuple)) else [vectorstore]
+    data = collection_data(stores)
+
+    embeddings = np.asarray(data['embeddings'], dtype=np.float32)
+    np.save(directory / EMBEDDINGS_FILE, np.ascontiguousarray(embeddings))
+    write_chunk_texts(data['documents'], directory)
+
+    with open(directory / METADATA_FILE, 'w', encoding='utf-8') as f:
+        json.dump({
+            'collection_name': COLLECTION_NAME,
+            'embedding_model': EMBEDDING_MODEL,
+            'ids': data['ids'],
+            'metadatas': data['metadatas']
+        }, f, ensure_ascii=False)
+
+    return len(data['ids'])
+
+
+class SharedIndex:
+    """
+    Memory-mapped, read-only index with exact cosine search
+
+    Embeddings are stored normalized, so the dot product is the cosine
+    similarity. Pages are shared between all processes mapping the files.
+    """
+
+    def __init__(self, directory: Path = SHARED_INDEX_DIR):
+        directory = Path(directory)
+        self.embeddings = np.load(directory / EMBEDDINGS_FILE, mmap_mode='r')
+        self.texts = ChunkTextStore.open(directory)
+
+        with open(directory / METADATA_FILE, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.ids = meta['ids']
+        self.metadatas = meta['metadatas']
+        self.embedding_model = meta.get('embedding_model', EMBEDDING_MODEL)
+        self._init_partitions()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _init_partitions(self):
+        """Archetype partitions are built on first use from chunk metadata"""
+        self.has_partitions = has_archetype_tags(self.metadatas)
+        self._archetype_scores = None
+        self._partitions = {}
+        # LRU of id(rows) -> (rows, embeddings[rows]); holding rows keeps the id unique
+        self._partition_embeddings = OrderedDict()
+        self._partition_lock = threading.Lock()
+
+    def partition(self, codes: Sequence[str],
+                  min_score: float = ARCHETYPE_MIN_SCORE) -> Optional[np.ndarray]:
+        """
+        Rows of the given archetype partitions
+
+        Args:
+            codes: Archetype codes
+            min_score: Partition threshold
+
+        Returns:
+            Sorted row indices, or None (whole index) for untagged indexes
+        """
+        if not codes or not self.has_partitions:
+            return None
+
+        key = (tuple(sorted(set(codes))), min_score)
+        if key not in self._partitions:
+            if self._archetype_scores is None:
+                self._archetype_scores = score_matrix(self.metadatas)
+            self._partitions[key] = partition_rows(self._archetype_scores, key[0], min_score)
+        return self._partitions[key]
+
+    def _candidates(self, rows: Optional[np.ndarray]):
+        """
+        Embeddings to scan and their row ids (None - all rows)
+
+        Gathering a partition copies its rows out of the mapped file, so
+        the copies of recently searched partitions are kept.
+        """
+        if rows is None:
+            return self.embeddings, None
+
+        with self._partition_lock:
+            cached = self._partition_embeddings.get(id(rows))
+            if cached is not None and cached[0] is rows:
+                self._partition_embeddings.move_to_end(id(rows))
+                return cached[1], rows
+
+        embeddings = np.ascontiguousarray(self.embeddings[rows])
+        with self._partition_lock:
+            self._partition_embeddings[id(rows)] = (rows, embeddings)
+            while len(self._partition_embeddings) > PARTITION_CACHE_SIZE:
+                self._partition_embeddings.popitem(last=False)
+        return embeddings, rows
+
+    def search_vector(self, vector, k: int,
+                      rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Find the k nearest chunks for a query vector
+
+        Args:
+            vector: Normalized query embedding
+            k: Number of results
+            rows: Scan only these rows (e.g. partition()); fewer than k
+                  rows give fewer results
+
+        Returns:
+            List of (row, similarity) tuples, best first
+        """
+        embeddings, rows = self._candidates(rows)
+        if len(embeddings) == 0:
+            return []
+
+        scores = embeddings @ np.asarray(vector, dtype=np.float32)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = top if rows is None else rows[top]
+        return [(int(i), float(s)) for i, s in zip(ids, scores[top])]
+
+    def search_vectors(self, vectors, k: int, block: int = 256,
+                       rows: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Batched search_vector: one matrix product per block of queries
+
+        Args:
+            vectors: (n, dim) normalized query embeddings
+            k: Number of results per query
+            block: Queries per matrix product (bounds the score matrix)
+            rows: Scan only these rows, as in search_vector()
+
+        Returns:
+            One list of (row, similarity) tuples per query, best first
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        embeddings, rows = self._candidates(rows)
+        if len(embeddings) == 0:
+            return [[] for _ in range(len(vectors))]
+
+        k = min(k, len(embeddings))
+        results = []
+        for start in range(0, len(vectors), block):
+            scores = vectors[start:start + block] @ embeddings.T
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            if rows is not None:
+                top = rows[top]
+            for ids, sims in zip(top, top_scores):
+                results.append([(int(i), float(s)) for i, s in zip(ids, sims)])
+        return results
+
+    def lazy_document(self, row: int) -> LazyDocument:
+        """Result for a row whose text stays in the mapped store"""
+        return LazyDocument(self.texts, row, self.metadatas[row] or {})
+
+    def document(self, row: int):
+        """Build a langchain Document for a row"""
+        return Document(
+            page_content=self.texts.text(row),
+            metadata=dict(self.metadatas[row] or {})
+        )
+
+    def close(self):
+        self.texts.close()
@@ -0,0 +1,360 @@
+"""
+Portable Index Snapshots for MBTI RAG System
+Packs a collection into one versioned, checksummed file that the query
+engine can memory-map directly
+
+File layout (all sections 64-byte aligned):
+    magic "MBTISNAP" | version u16 | reserved u16 | header length u32
+    header (JSON: counts, section offsets, build info, checksum)
+    embeddings   float32 [count x dim], normalized
+    offsets      uint64  [count + 1], byte offsets into texts
+    texts        UTF-8 blob of all chunk texts
+    metadata     JSON: ids and metadatas
+"""
+import sys
+import json
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+from pathlib import Path
+from typing import List, Dict, Optional
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from rag.config import (
+    DOCS_DIR, TYPES_DIR, DATA_DIR, CHROMA_DIR, COLLECTION_NAME,
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, CHUNK_SIZE, CHUNK_OVERLAP
+)
+from rag.scripts.chunk_store import ROW_KEY, ChunkTextStore, collection_store_dir, write_chunk_texts
+from rag.scripts.shared_index import SharedIndex
+from rag.scripts.shards import collection_data
+
+
+MAGIC = b"MBTISNAP"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sHHI")
+ALIGNMENT = 64
+
+DEFAULT_SNAPSHOT_PATH = DATA_DIR / f"{COLLECTION_NAME}.snap"
+
+
+def _padding(position: int) -> int:
+    return (-position) % ALIGNMENT
+
+
+def corpus_hash(directories=(DOCS_DIR, TYPES_DIR)) -> str:
+    """SHA-256 over relative paths and contents of all source documents"""
+    digest = hashlib.sha256()
+    for directory in directories:
+        for path in sorted(Path(directory).glob("**/*.md")):
+            digest.update(str(path.relative_to(directory.parent)).encode('utf-8'))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def write_snapshot(path: Path, ids: List[str], embeddings: np.ndarray,
+                   texts: List[str], metadatas: List[Dict],
+                   build_info: Optional[Dict] = None) -> Dict:
+    """
+    Write a snapshot file
+
+    Args:
+        path: Output file
+        ids: Chunk ids
+        embeddings: (count, dim) normalized embeddings
+        texts: Chunk texts
+        metadatas: Chunk metadata dicts
+        build_info: Model, chunking and corpus information
+
+    Returns:
+        Header dictionary that was written
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    count = len(ids)
+    dim = embeddings.shape[1] if count else 0
+
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    if count:
+        offsets[1:] = np.cumsum([len(data) for data in encoded])
+
+    payloads = [
+        ('embeddings', embeddings.tobytes()),
+        ('offsets', offsets.tobytes()),
+        ('texts', b"".join(encoded)),
+        ('metadata', json.dumps(
+            {'ids': ids, 'metadatas': metadatas}, ensure_ascii=False
+        ).encode('utf-8'))
+    ]
+
+    # Section offsets are relative to the start of the data area
+    sections = {}
+    position = 0
+    for name, data in payloads:
+        sections[name] = {'offset': position, 'length': len(data)}
+        position += len(data) + _padding(len(data))
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'count': count,
+        'dim': dim,
+        'dtype': 'float32',
+        'sections': sections,
+        'build': build_info or {}
+    }
+
+    checksum = hashlib.sha256()
+    for _, data in payloads:
+        checksum.update(data)
+        checksum.update(b"\0" * _padding(len(data)))
+    header['checksum'] = {'algorithm': 'sha256', 'value': checksum.hexdigest()}
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_bytes += b" " * _padding(PREAMBLE.size + len(header_bytes))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(header_bytes)))
+        f.write(header_bytes)
+        for _, data in payloads:
+            f.write(data)
+            f.write(b"\0" * _padding(len(data)))
+    tmp_path.replace(path)
+
+    return header
+
+
+def read_header(path: Path) -> Dict:
+    """
+    Read and validate the snapshot header
+
+    Returns:
+        Header dictionary with an extra 'data_offset' key
+    """
+    with open(path, 'rb') as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) < PREAMBLE.size:
+            raise ValueError(f"Файл слишком короткий для снапшота: {path}")
+        magic, version, _, header_length = PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f"Не снапшот индекса MBTI: {path}")
+        if version > FORMAT_VERSION:
+            raise ValueError(
+                f"Версия снапшота {version} новее поддерживаемой {FORMAT_VERSION}"
+            )
+        header = json.loads(f.read(header_length).decode('utf-8'))
+
+    header['data_offset'] = PREAMBLE.size + header_length
+    return header
+
+
+def verify_snapshot(path: Path) -> bool:
+    """Check the stored checksum against the file contents"""
+    header = read_header(path)
+    checksum = hashlib.new(header['checksum']['algorithm'])
+    with open(path, 'rb') as f:
+        f.seek(header['data_offset'])
+        for block in iter(lambda: f.read(1 << 20), b""):
+            checksum.update(block)
+    return checksum.hexdigest() == header['checksum']['value']
+
+
+def export_snapshot(vectorstore, path: Path = DEFAULT_SNAPSHOT_PATH) -> Dict:
+    """
+    Pack a Chroma collection into a snapshot file
+
+    Args:
+        vectorstore: langchain Chroma instance, or a list of shard
+                    instances packed into one snapshot
+        path: Output file
+
+    Returns:
+        Written header
+    """
+    stores = vectorstore if isinstance(vectorstore, (list, tuple)) else [vectorstore]
+    data = collection_data(stores)
+    build_info = {
+        'collection_name': stores[0]._collection.name if len(stores) == 1 else COLLECTION_NAME,
+        'embedding_model': EMBEDDING_MODEL,
+        'embedding_backend': EMBEDDING_BACKEND,
+        'chunk_size': CHUNK_SIZE,
+        'chunk_overlap': CHUNK_OVERLAP,
+        'corpus_hash': corpus_hash(),
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+    return write_snapshot(
+        path, data['ids'], np.asarray(data['embeddings'], dtype=np.float32),
+        data['documents'], data['metadatas'], build_info
+    )
+
+
+def import_snapshot(path: Path, collection_name: Optional[str] = None,
+                    persist_directory: Path = CHROMA_DIR,
+                    batch_size: int = 1000) -> int:
+    """
+    Restore a snapshot into a Chroma collection
+
+    Stored embeddings are reused, so no encoding happens on import. The
+    collection is replaced, and for the default persist directory its
+    chunk text store is rewritten in snapshot row order, so an old store
+    of the same size can never pair rows with the wrong texts.
+
+    Returns:
+        Number of imported chunks
+    """
+    from langchain_community.vectorstores import Chroma
+
+    index = SnapshotIndex(path)
+    collection_name = collection_name or index.build.get('collection_name', COLLECTION_NAME)
+    Chroma(collection_name=collection_name, persist_directory=str(persist_directory)).delete_collection()
+    vectorstore = Chroma(
+        collection_name=collection_name,
+        persist_directory=str(persist_directory)
+    )
+
+    for start in range(0, len(index), batch_size):
+        rows = range(start, min(start + batch_size, len(index)))
+        vectorstore._collection.add(
+            ids=[index.ids[i] for i in rows],
+            embeddings=index.embeddings[start:rows.stop].tolist(),
+            documents=[index.texts.text(i) for i in rows],
+            # Rows of a sharded export restart per shard - renumber them
+            metadatas=[{**(index.metadatas[i] or {}), ROW_KEY: i} for i in rows]
+        )
+
+    if Path(persist_directory).resolve() == CHROMA_DIR.resolve():
+        write_chunk_texts(
+            (index.texts.text(i) for i in range(len(index))), collection_store_dir(collection_name)
+        )
+
+    count = len(index)
+    index.close()
+    return count
+
+
+class SnapshotIndex(SharedIndex):
+    """SharedIndex backed by a single memory-mapped snapshot file"""
+
+    def __init__(self, path: Path = DEFAULT_SNAPSHOT_PATH, verify: bool = False):
+        """
+        Map a snapshot
+
+        Args:
+            path: Snapshot file
+            verify: Check the checksum before use (reads the whole file)
+        """
+        path = Path(path)
+        header = read_header(path)
+        if verify and not verify_snapshot(path):
+            raise ValueError(f"Контрольная сумма снапшота не совпадает: {path}")
+
+        self.header = header
+        self.build = header.get('build', {})
+        self.embedding_model = self.build.get('embedding_model', EMBEDDING_MODEL)
+
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        def section(name: str) -> memoryview:
+            info = header['sections'][name]
+            start = header['data_offset'] + info['offset']
+            return view[start:start + info['length']]
+
+        count, dim = header['count'], header['dim']
+        self.embeddings = np.frombuffer(
+            section('embeddings'), dtype=np.float32
+        ).reshape(count, dim)
+        offsets = np.frombuffer(section('offsets'), dtype=np.uint64)
+        self.texts = ChunkTextStore(section('texts'), offsets)
+
+        meta = json.loads(bytes(section('metadata')).decode('utf-8'))
+        self.ids = meta['ids']
+        self.metadatas = meta['metadatas']
+        self._init_partitions()
+
+    def close(self):
+        """
+        Unmap the snapshot
+
+        Drops the index's own arrays and cached partitions, which hold
+        buffer exports of the mmap. Arrays and LazyDocument results that
+        callers still keep stay valid: they hold the mapping alive, and it
+        is unmapped when the last of them is released.
+        """
+        self.embeddings = None
+        self.texts = None
+        self._partition_embeddings.clear()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # Exports outlive the index; the mmap closes with the last of them
+        self._mmap = None
+        self._file.close()
+
+
+def open_index(path: Path) -> SharedIndex:
+    """Open a snapshot file or a shared index directory"""
+    path = Path(path)
+    if path.is_dir():
+        return SharedIndex(path)
+    return SnapshotIndex(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Снапшоты индекса: экспорт, импорт и проверка"
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Упаковать коллекцию в снапшот')
+    export_parser.add_argument('path', nargs='?', default=str(DEFAULT_SNAPSHOT_PATH))
+
+    import_parser = subparsers.add_parser('import', help='Восстановить коллекцию из снапшота')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--collection', help='Имя коллекции (по умолчанию: из снапшота)')
+
+    verify_parser = subparsers.add_parser('verify', help='Проверить контрольную сумму')
+    verify_parser.add_argument('path')
+
+    info_parser = subparsers.add_parser('info', help='Показать заголовок снапшота')
+    info_parser.add_argument('path')
+
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        from rag.scripts.query_engine import MBTIQueryEngine
+        engine = MBTIQueryEngine(use_llm=False, snapshot_path=None)
+        header = export_snapshot(engine.vectorstores, Path(args.path))
+        engine.close()
+        print(f"✅ Снапшот записан: {args.path}")
+        print(f"   Фрагментов: {header['count']}, размерность: {header['dim']}")
+        print(f"   SHA-256: {header['checksum']['value']}")
+
+    elif args.command == 'import':
+        count = import_snapshot(Path(args.path), collection_name=args.collection)
+        print(f"✅ Импортировано {count} фрагментов в {CHROMA_DIR}")
+
+    elif args.command == 'verify':
+        if verify_snapshot(Path(args.path)):
+            print("✅ Контрольная сумма совпадает")
+        else:
+            print("❌ Контрольная сумма не совпадает")
+            sys.exit(1)
+
+    elif args.command == 'info':
+        header = read_header(Path(args.path))
+        print(json.dumps(
+            {key: value for key, value in header.items() if key != 'sections'},
+            ensure_ascii=False, indent=2
+        ))
+
+
+if __name__ == "__main__":
+    main()
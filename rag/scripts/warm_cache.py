@@ -0,0 +1,305 @@
+"""
+Warm Query Cache for MBTI RAG System
+Precomputes embeddings and top-k results of known hot queries at index
+build time and stores them next to the index, so the query engine serves
+them without encoding or searching right after startup. Hot queries come
+from config (WARM_QUERIES), a query file or the most frequent recently
+logged queries
+"""
+import sys
+import json
+import hashlib
+import time
+import argparse
+import threading
+from collections import Counter, deque
+from pathlib import Path
+from typing import List, Dict, Optional, Sequence
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from rag.config import (
+    DATA_DIR, COLLECTION_NAME, EMBEDDING_MODEL, EMBEDDING_BACKEND,
+    WARM_QUERIES, WARM_CACHE_K, QUERY_LOG
+)
+from rag.scripts.chunk_store import ROW_KEY, LazyDocument
+from rag.scripts.loadtest import load_queries
+
+
+WARM_CACHE_PATH = DATA_DIR / f"{COLLECTION_NAME}.warm.json"
+RECENT_QUERIES = 10000  # log records considered by frequent_queries()
+
+
+def normalize_query(query: str) -> str:
+    """Cache key of a query: collapsed whitespace"""
+    return " ".join(query.split())
+
+
+class QueryLog:
+    """
+    Append-only JSONL log of searched queries (loadtest.load_queries format)
+
+    One line-buffered handle stays open, so a search costs a single write
+    instead of opening and closing the file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def append(self, query: str):
+        line = json.dumps({'query': query, 'time': round(time.time(), 3)}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def frequent_queries(path: Path, top: int, recent: int = RECENT_QUERIES) -> List[str]:
+    """
+    Most frequent queries among the last records of a query log
+
+    Args:
+        path: Log file (plain lines or JSONL with a "query" field)
+        top: Number of queries to return
+        recent: Only the last this many records count
+
+    Returns:
+        Queries by descending frequency (ties in first-seen order)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = deque(f, maxlen=recent)
+    counts = Counter()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        query = json.loads(line).get('query', '') if line.startswith('{') else line
+        if query.strip():
+            counts[normalize_query(query)] += 1
+    return [query for query, _ in counts.most_common(top)]
+
+
+def collect_hot_queries(path: Optional[str] = None, from_log: int = 0,
+                        log_path: Optional[str] = QUERY_LOG,
+                        recent: int = RECENT_QUERIES) -> List[str]:
+    """
+    Hot query list for the warm cache
+
+    Args:
+        path: Query file (lines or JSONL); WARM_QUERIES when not given
+        from_log: Add this many most frequent recently logged queries
+        log_path: Query log (QUERY_LOG by default)
+        recent: Log records considered
+
+    Returns:
+        Unique normalized queries
+    """
+    queries = load_queries(path) if path else list(WARM_QUERIES)
+    if from_log:
+        if log_path and Path(log_path).exists():
+            queries += frequent_queries(log_path, from_log, recent)
+        else:
+            print(f"⚠️  Лог запросов не найден: {log_path or '(QUERY_LOG не задан)'}")
+    return list(dict.fromkeys(normalize_query(q) for q in queries if q.strip()))
+
+
+def _collections(engine) -> List[list]:
+    return [[store._collection.name, size] for store, size in zip(engine.vectorstores, engine._sizes)]
+
+
+def index_fingerprint(engine) -> Optional[str]:
+    """
+    Content fingerprint of the engine's collections
+
+    Combines the fingerprints the indexer stored with the chunk stores
+    (write_chunk_texts), so a reindex that keeps the collection sizes
+    still changes it while checking it reads no chunk metadata. None when
+    a collection has no chunk store or its store has no fingerprint.
+    """
+    digest = hashlib.sha256()
+    for store, texts in zip(engine.vectorstores, engine._texts):
+        if texts is None or texts.fingerprint is None:
+            return None
+        digest.update(store._collection.name.encode('utf-8'))
+        digest.update(texts.fingerprint.encode('ascii'))
+    return digest.hexdigest()[:16]
+
+
+def build_warm_cache(engine, queries: Sequence[str], k: int = WARM_CACHE_K,
+                     path: Path = WARM_CACHE_PATH) -> Dict:
+    """
+    Precompute and save embeddings and top-k results of hot queries
+
+    Results are stored as (collection, metadata, distance) and resolved
+    to LazyDocument views of the chunk stores on load, so they are only
+    precomputed for Chroma indexes with chunk stores; otherwise only the
+    embeddings are kept.
+
+    Args:
+        engine: MBTIQueryEngine over the freshly built index
+        queries: Hot queries
+        k: Results per query; the engine serves searches with k up to this
+        path: Cache file
+
+    Returns:
+        Summary {'queries', 'k', 'results', 'time_s'}
+    """
+    start = time.perf_counter()
+    queries = list(dict.fromkeys(normalize_query(q) for q in queries if q.strip()))
+    vectors = np.asarray(engine.embeddings.embed_documents(queries), dtype=np.float32) if queries else []
+
+    with_results = engine.snapshot is None and all(texts is not None for texts in engine._texts)
+    hits = engine._query_collections(vectors, k) if with_results and queries else None
+    stores = {id(texts): i for i, texts in enumerate(engine._texts)} if with_results else {}
+
+    entries = {}
+    for i, query in enumerate(queries):
+        entries[query] = {'embedding': vectors[i].tolist()}
+        if hits is not None:
+            entries[query]['results'] = [
+                [stores[id(doc.store)], doc.metadata, float(distance)] for doc, distance in hits[i]
+            ]
+
+    cache = {
+        'embedding_model': EMBEDDING_MODEL,
+        'embedding_backend': EMBEDDING_BACKEND,
+        'k': k,
+        'collections': _collections(engine) if with_results else None,
+        'fingerprint': index_fingerprint(engine) if with_results else None,
+        'built': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'queries': entries
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    tmp_path.replace(path)
+
+    return {
+        'queries': len(entries),
+        'k': k,
+        'results': hits is not None,
+        'time_s': time.perf_counter() - start
+    }
+
+
+class WarmCache:
+    """Precomputed query vectors and results loaded by the query engine"""
+
+    def __init__(self, data: Dict, stores: Optional[Sequence] = None):
+        """
+        Args:
+            data: Contents of the cache file
+            stores: Chunk stores of the engine's collections; None - the
+                    cached results do not match the index, keep only vectors
+        """
+        self.k = data['k']
+        self.vectors = {
+            query: np.asarray(entry['embedding'], dtype=np.float32)
+            for query, entry in data['queries'].items()
+        }
+        self.results = {}
+        if stores is not None:
+            for query, entry in data['queries'].items():
+                if 'results' in entry:
+                    self.results[query] = [
+                        (LazyDocument(stores[i], metadata[ROW_KEY], metadata), distance)
+                        for i, metadata, distance in entry['results']
+                    ]
+
+    @classmethod
+    def load(cls, engine, path: Path = WARM_CACHE_PATH) -> Optional["WarmCache"]:
+        """
+        Cache for an engine, or None when missing or built for another model
+
+        Results are used only if the engine's collections, their sizes
+        and content (index_fingerprint) are those the cache was built on
+        and all have chunk stores.
+        """
+        path = Path(path)
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if (data.get('embedding_model'), data.get('embedding_backend')) != (EMBEDDING_MODEL, EMBEDDING_BACKEND):
+            return None
+
+        stores = None
+        if (engine.snapshot is None and data.get('collections') == _collections(engine)
+                and all(texts is not None for texts in engine._texts)
+                and data.get('fingerprint') is not None
+                and data['fingerprint'] == index_fingerprint(engine)):
+            stores = engine._texts
+        return cls(data, stores)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def vector(self, query: str) -> Optional[np.ndarray]:
+        """Precomputed embedding of a query"""
+        return self.vectors.get(normalize_query(query))
+
+    def lookup(self, query: str, k: int) -> Optional[List[tuple]]:
+        """Precomputed top k (document, distance) of a query, if k is covered"""
+        if k > self.k:
+            return None
+        hits = self.results.get(normalize_query(query))
+        return hits[:k] if hits is not None else None
+
+
+def main():
+    """Refresh the warm cache of an existing index"""
+    parser = argparse.ArgumentParser(description="Прогрев кэша популярных запросов")
+    parser.add_argument(
+        '--queries',
+        help='Файл запросов (строки или JSONL с полем "query"); по умолчанию WARM_QUERIES'
+    )
+    parser.add_argument(
+        '--from-log',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Добавить N самых частых недавних запросов из лога'
+    )
+    parser.add_argument(
+        '--log',
+        default=QUERY_LOG,
+        help='Лог запросов (по умолчанию: QUERY_LOG)'
+    )
+    parser.add_argument(
+        '--recent',
+        type=int,
+        default=RECENT_QUERIES,
+        help=f'Учитывать последние N записей лога (по умолчанию: {RECENT_QUERIES})'
+    )
+    parser.add_argument(
+        '-k',
+        type=int,
+        default=WARM_CACHE_K,
+        help=f'Результатов на запрос (по умолчанию: {WARM_CACHE_K})'
+    )
+    args = parser.parse_args()
+
+    from rag.scripts.query_engine import MBTIQueryEngine
+
+    queries = collect_hot_queries(args.queries, args.from_log, args.log, args.recent)
+    engine = MBTIQueryEngine(use_llm=False, snapshot_path=None)
+    summary = build_warm_cache(engine, queries, args.k)
+    engine.close()
+    print(f"🔥 Прогрето запросов: {summary['queries']} (k={summary['k']}, "
+          f"{summary['time_s']:.1f} с) → {WARM_CACHE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Multi-Process Query Worker Pool for MBTI RAG System
+Pre-forks N workers, each with its own encoder, over one shared
+memory-mapped read-only index
+"""
+import os
+import sys
+import argparse
+import multiprocessing
+from pathlib import Path
+from typing import List, Iterable, Iterator, Optional
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from langchain.schema import Document
+
+from rag.config import TOP_K_RESULTS, SNAPSHOT_PATH
+from rag.scripts.embeddings import create_embeddings
+from rag.scripts.shared_index import SHARED_INDEX_DIR, export_shared_index
+from rag.scripts.snapshot import open_index
+
+
+# Per-process state, set up once by the pool initializer
+_worker_embeddings = None
+_worker_index = None
+
+
+def _init_worker(index_path: str, threads: int):
+    """Load the encoder and map the shared index inside a worker"""
+    global _worker_embeddings, _worker_index
+
+    _worker_embeddings = create_embeddings(threads=threads)
+    _worker_index = open_index(Path(index_path))
+
+
+def _search(args) -> List[tuple]:
+    query, k = args
+    vector = _worker_embeddings.embed_query(query)
+    # Squared L2 distance between normalized vectors, as MBTIQueryEngine
+    # reports it (lower is better)
+    return [
+        (_worker_index.document(row), 2.0 - 2.0 * similarity)
+        for row, similarity in _worker_index.search_vector(vector, k)
+    ]
+
+
+class MBTIWorkerPool:
+    """Dispatcher fanning search requests out to pre-forked workers"""
+
+    def __init__(self, workers: Optional[int] = None,
+                 index_path: Path = Path(SNAPSHOT_PATH) if SNAPSHOT_PATH else SHARED_INDEX_DIR,
+                 threads_per_worker: int = 1):
+        """
+        Start the worker pool
+
+        Args:
+            workers: Number of worker processes (default: CPU count)
+            index_path: Snapshot file or shared index directory
+            threads_per_worker: Encoder intra-op threads in each worker
+        """
+        self.workers = workers or os.cpu_count() or 1
+        print(f"🔍 Запуск пула из {self.workers} процессов...")
+
+        # Fork keeps startup cheap; workers load the encoder themselves
+        # after the fork, so no runtime thread state is inherited
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        self.pool = context.Pool(
+            processes=self.workers,
+            initializer=_init_worker,
+            initargs=(str(index_path), threads_per_worker)
+        )
+
+        print("✅ Пул готов к работе")
+
+    def search_with_score(self, query: str, k: int = TOP_K_RESULTS) -> List[tuple]:
+        """
+        Search on one of the workers
+
+        Returns:
+            List of (document, distance) tuples, same scores as
+            MBTIQueryEngine.search_with_score()
+        """
+        return self.pool.apply(_search, ((query, k),))
+
+    def search(self, query: str, k: int = TOP_K_RESULTS) -> List[Document]:
+        """Search on one of the workers"""
+        return [doc for doc, _ in self.search_with_score(query, k)]
+
+    def search_many(self, queries: Iterable[str], k: int = TOP_K_RESULTS,
+                    chunksize: int = 4) -> Iterator[List[tuple]]:
+        """
+        Search many queries across all workers
+
+        Returns:
+            Iterator of (document, distance) lists in input order
+        """
+        return self.pool.imap(_search, ((q, k) for q in queries), chunksize=chunksize)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Пул процессов для поиска по общему индексу"
+    )
+    parser.add_argument(
+        '--export',
+        action='store_true',
+        help='Экспортировать коллекцию Chroma в общий индекс и выйти'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help='Количество процессов (по умолчанию: число ядер)'
+    )
+    parser.add_argument(
+        'queries',
+        nargs='*',
+        help='Запросы для поиска'
+    )
+
+    args = parser.parse_args()
+
+    if args.export:
+        from rag.scripts.query_engine import MBTIQueryEngine
+        engine = MBTIQueryEngine(use_llm=False, snapshot_path=None)
+        count = export_shared_index(engine.vectorstores)
+        engine.close()
+        print(f"✅ Экспортировано {count} фрагментов в {SHARED_INDEX_DIR}")
+        return
+
+    with MBTIWorkerPool(workers=args.workers) as pool:
+        for query, results in zip(args.queries, pool.search_many(args.queries, k=3)):
+            print(f"\n🔍 Поиск: {query}")
+            print("-" * 60)
+            for i, (doc, score) in enumerate(results, 1):
+                print(f"\n[{i}] {doc.metadata.get('filename', 'Unknown')} ({score:.3f})")
+                print(f"    {doc.page_content[:150]}...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Snapshot tests: checksum verification, round-trip of vectors, texts and
+metadata, scoped search and closing with results still held
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("langchain")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rag.scripts.snapshot import SnapshotIndex, read_header, verify_snapshot, write_snapshot
+
+
+TEXTS = ["Интровертная интуиция INTJ", "Экстравертное мышление ENTJ", "Пустой фрагмент", "Ni-Te"]
+
+
+def make_snapshot(path: Path) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(len(TEXTS), 8)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    metadatas = [{'source': f"docs/{i}.md", 'chunk_row': i} for i in range(len(TEXTS))]
+    write_snapshot(path, [f"id{i}" for i in range(len(TEXTS))], embeddings, TEXTS, metadatas,
+                   {'embedding_model': 'test'})
+    return embeddings
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "index.snap"
+    embeddings = make_snapshot(path)
+    assert verify_snapshot(path)
+
+    index = SnapshotIndex(path, verify=True)
+    assert len(index) == len(TEXTS)
+    assert np.array_equal(index.embeddings, embeddings)
+    assert [index.texts.text(row) for row in range(len(TEXTS))] == TEXTS
+    assert index.metadatas[2] == {'source': "docs/2.md", 'chunk_row': 2}
+    assert index.search_vector(embeddings[3], 1) == [(3, pytest.approx(1.0))]
+    index.close()
+
+
+def test_corruption_is_detected(tmp_path):
+    path = tmp_path / "index.snap"
+    make_snapshot(path)
+    data = bytearray(path.read_bytes())
+    data[read_header(path)['data_offset'] + 5] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    assert not verify_snapshot(path)
+    with pytest.raises(ValueError):
+        SnapshotIndex(path, verify=True)
+
+
+def test_scoped_search_stays_in_rows(tmp_path):
+    path = tmp_path / "index.snap"
+    embeddings = make_snapshot(path)
+    index = SnapshotIndex(path)
+    rows = np.array([1, 2])
+    assert {row for row, _ in index.search_vector(embeddings[0], 3, rows=rows)} == {1, 2}
+    assert index.search_vector(embeddings[0], 3, rows=np.array([], dtype=np.int64)) == []
+    index.close()
+
+
+def test_close_with_results_held(tmp_path):
+    path = tmp_path / "index.snap"
+    make_snapshot(path)
+    index = SnapshotIndex(path)
+    document = index.lazy_document(0)
+    index.search_vector(index.embeddings[0], 2, rows=np.array([0, 1]))
+    index.close()
+    assert document.page_content == TEXTS[0]
+
+
+if __name__ == "__main__":
+    import tempfile
+    for test in (test_round_trip, test_corruption_is_detected,
+                 test_scoped_search_stays_in_rows, test_close_with_results_held):
+        test(Path(tempfile.mkdtemp()))
+    print("✨ Snapshot OK")